@@ -1,114 +1,43 @@
 import os
 import sys
 import django
-from mutagen import File
-from mutagen.id3 import ID3, TIT2, TPE1, TALB
 
 # 初始化 Django 环境
 sys.path.append(os.path.dirname(os.path.abspath(__file__)))
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'music_platform.settings')
 django.setup()
 
-from music.models import Music
+from music.importer import import_folder, SUPPORTED_FORMATS  # noqa: F401
+from music.metadata import get_music_metadata  # noqa: F401
 
 # 配置项
 MUSIC_FOLDER = r'D:\music'  # 你的音乐文件夹路径
-SUPPORTED_FORMATS = ['.mp3', '.wav', '.flac', '.ogg', '.m4a']
-
-def get_music_metadata(file_path):
-    try:
-        audio = File(file_path, easy=True)
-        if not audio:
-            audio = ID3(file_path)
-
-        metadata = {
-            'name': os.path.splitext(os.path.basename(file_path))[0],
-            'singer': '未知歌手',
-            'album': '未知专辑'
-        }
-
-        if isinstance(audio, ID3):
-            if TIT2 in audio:
-                metadata['name'] = audio[TIT2].text[0]
-            if TPE1 in audio:
-                metadata['singer'] = audio[TPE1].text[0]
-            if TALB in audio:
-                metadata['album'] = audio[TALB].text[0]
-        elif audio:
-            if 'title' in audio:
-                metadata['name'] = audio['title'][0]
-            if 'artist' in audio:
-                metadata['singer'] = audio['artist'][0]
-            if 'album' in audio:
-                metadata['album'] = audio['album'][0]
-
-        for key in metadata:
-            metadata[key] = metadata[key].strip().replace('/', '-').replace('\\', '-')
-
-        return metadata
-
-    except Exception as e:
-        print(f"解析文件 {file_path} 元数据失败：{str(e)}")
-        return {
-            'name': os.path.splitext(os.path.basename(file_path))[0],
-            'singer': '未知歌手',
-            'album': '未知专辑'
-        }
+WORKERS = os.cpu_count() or 1  # 解析标签的进程数
+BATCH_SIZE = 500  # 每批写入数据库的条数
+INCREMENTAL = True  # 增量导入：只解析新增或变化的文件，False 时全部重新解析
 
 def import_music_to_mysql():
     if not os.path.exists(MUSIC_FOLDER):
         print(f"错误：音乐文件夹 {MUSIC_FOLDER} 不存在！")
         return
 
-    total = 0
-    imported = 0
-    skipped = 0
-    failed = 0
-
-    for root, dirs, files in os.walk(MUSIC_FOLDER):
-        for file in files:
-            total += 1
-            file_path = os.path.join(root, file)
-            file_ext = os.path.splitext(file)[1].lower()
-
-            if file_ext not in SUPPORTED_FORMATS:
-                skipped += 1
-                print(f"跳过非音频文件：{file}")
-                continue
-
-            try:
-                metadata = get_music_metadata(file_path)
-                name = metadata['name']
-                singer = metadata['singer']
-                album = metadata['album']
-
-                # 检查是否已存在
-                if Music.objects.filter(name=name, singer=singer).exists():
-                    skipped += 1
-                    print(f"跳过已存在的音乐：{singer} - {name}")
-                    continue
-
-                # 只写入数据库，不保存文件
-                music = Music(
-                    name=name,
-                    singer=singer,
-                    album=album,
-                    file_path=file_path  # 把文件路径也存进去
-                )
-                music.save()
-
-                imported += 1
-                print(f"成功导入：{singer} - {name}")
+    def progress(stats):
+        print(f"已解析 {stats.processed} 个文件，导入 {stats.imported} 首，"
+              f"跳过 {stats.skipped} 个（{stats.rate:.1f} 文件/秒）")
 
-            except Exception as e:
-                failed += 1
-                print(f"导入失败 {file}:{str(e)}")
+    # 标签解析在进程池中并行执行，按批次 bulk_create 写入数据库
+    stats = import_folder(MUSIC_FOLDER, workers=WORKERS, batch_size=BATCH_SIZE, progress=progress,
+                          incremental=INCREMENTAL)
 
     print("\n===== 导入完成 =====")
-    print(f"总计文件：{total}")
-    print(f"成功导入：{imported}")
-    print(f"跳过文件：{skipped}")
-    print(f"导入失败：{failed}")
+    print(f"总计文件：{stats.total}")
+    print(f"成功导入：{stats.imported}")
+    print(f"更新记录：{stats.updated}")
+    print(f"未变化：{stats.unchanged}")
+    print(f"文件已消失：{stats.missing}")
+    print(f"跳过文件：{stats.skipped}")
+    print(f"导入失败：{stats.failed}")
+    print(f"耗时：{stats.elapsed:.1f} 秒（{stats.rate:.1f} 文件/秒）")
 
 if __name__ == '__main__':
     print(f"开始导入音乐元数据到 MySQL,源目录:{MUSIC_FOLDER}")
@@ -0,0 +1,276 @@
+# music/benchmark.py
+"""
+性能基准测试：生成合成曲库，测量列表页、音频播放、导入和路径修复的性能
+由 run_benchmarks 命令调用，结果为 {指标名: {'value', 'unit', 'better'}}，可写成 JSON 与上一次对比
+"""
+import os
+import platform
+import random
+import statistics
+import time
+import tracemalloc
+from datetime import timedelta
+from io import StringIO
+import django
+from django.core.cache import cache
+from django.core.management import call_command
+from django.test import Client, override_settings
+from django.urls import reverse
+from django.utils import timezone
+from mutagen.id3 import ID3, TALB, TIT2, TPE1
+from .models import Music
+from .pagecache import get_page_cache
+from .pagination import encode_cursor
+from .utils import ResolvedFile, path_cache
+
+# MPEG-1 Layer III、128kbps、44.1kHz 的一帧（帧头 + 静音数据），417 字节
+MP3_FRAME = b'\xff\xfb\x90\x00' + b'\x00' * 413
+
+
+def write_mp3(path, size, title, singer, album, marker=b''):
+    """
+    写一个带 ID3 标签、由静音帧组成的 MP3 文件，总大小约为 size 字节
+    marker 写入第一帧的数据部分，使各文件的音频内容（指纹）互不相同
+    """
+    remaining = max(size // len(MP3_FRAME), 1)
+    with open(path, 'wb') as fh:
+        if marker:
+            fh.write(MP3_FRAME[:4] + marker[:len(MP3_FRAME) - 4].ljust(len(MP3_FRAME) - 4, b'\0'))
+            remaining -= 1
+        while remaining > 0:
+            count = min(remaining, 1024)
+            fh.write(MP3_FRAME * count)
+            remaining -= count
+    tags = ID3()
+    tags.add(TIT2(encoding=3, text=title))
+    tags.add(TPE1(encoding=3, text=singer))
+    tags.add(TALB(encoding=3, text=album))
+    tags.save(path)
+
+
+def generate_library(root, tracks, files, file_size, broken_ratio=0.1, seed=0):
+    """
+    在 root 下生成合成曲库：files 个真实的 MP3 文件 + tracks 条 Music 记录
+    - 记录轮流指向这些文件，添加时间依次递减
+    - broken_ratio 比例的记录只保存文件名（相对路径），用于测试 fix_file_paths
+    - 其余记录写入文件信息（相当于已经校验过）
+    返回文件路径列表
+    """
+    rnd = random.Random(seed)
+    os.makedirs(root, exist_ok=True)
+    paths = []
+    for i in range(files):
+        path = os.path.join(root, f'歌手{i % 50}-歌曲{i}.mp3')
+        write_mp3(path, file_size, f'歌曲{i}', f'歌手{i % 50}', f'专辑{i % 20}', marker=path.encode())
+        paths.append(path)
+    facts = {path: ResolvedFile(path, os.path.getsize(path), os.path.getmtime(path)) for path in paths}
+
+    now = timezone.now()
+    batch = []
+    for i in range(tracks):
+        path = paths[i % files]
+        broken = rnd.random() < broken_ratio
+        music = Music(
+            name=f'歌曲{i}',
+            singer=f'歌手{i % 500}',
+            album=f'专辑{i % 2000}',
+            file_path=os.path.basename(path) if broken else path,
+            created_at=now - timedelta(seconds=i),
+        )
+        if not broken:
+            music.set_file_facts(facts[path], now)
+        batch.append(music)
+        if len(batch) >= 1000:
+            Music.objects.bulk_create(batch)
+            batch = []
+    Music.objects.bulk_create(batch)
+    return paths
+
+
+def _ms(seconds):
+    return round(seconds * 1000, 3)
+
+
+def _metric(value, unit, better):
+    return {'value': round(value, 3), 'unit': unit, 'better': better}
+
+
+def _latency(results, name, func, repeat):
+    """执行 repeat 次，记录 p50 / p95 延迟（毫秒）"""
+    samples = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        func()
+        samples.append(time.perf_counter() - started)
+    samples.sort()
+    results[f'{name}.p50_ms'] = _metric(_ms(statistics.median(samples)), 'ms', 'lower')
+    results[f'{name}.p95_ms'] = _metric(_ms(samples[min(int(len(samples) * 0.95), len(samples) - 1)]), 'ms', 'lower')
+
+
+def _get(client, url, **headers):
+    response = client.get(url, **headers)
+    if response.status_code >= 400:
+        raise RuntimeError(f'{url} -> {response.status_code}')
+    return response
+
+
+def _consume(response):
+    """
+    读完响应体，返回字节数
+    读完后测试客户端会关闭流式响应（不触发 close_old_connections）；这里不能再调用 response.close()，
+    它会关闭数据库连接，在测试的事务中运行时后续查询会出错
+    """
+    total = 0
+    if response.streaming:
+        for chunk in response.streaming_content:
+            total += len(chunk)
+    else:
+        total = len(response.content)
+    return total
+
+
+def bench_music_list(results, repeat):
+    """列表页：第一页和最后一页（游标 / 页码），分别在无页面缓存和缓存命中时测量"""
+    client = Client()
+    url = reverse('music_list')
+    total = Music.objects.count()
+    last_start = max((total - 1) // 50 * 50, 0)
+    anchor = Music.objects.order_by('-created_at', '-id')[max(last_start - 1, 0)]
+    pages = {
+        'shallow': url,
+        'deep_cursor': f'{url}?cursor={encode_cursor(anchor)}&p={last_start // 50 + 1}',
+        'deep_offset': f'{url}?page={last_start // 50 + 1}',
+    }
+    for label, page_url in pages.items():
+        # 有效期为 0 时不会写入新的缓存，先清掉之前写入的整页和行片段
+        get_page_cache().clear()
+        with override_settings(MUSIC_PAGE_CACHE_TIMEOUT=0):
+            _latency(results, f'music_list.{label}.uncached', lambda: _get(client, page_url), repeat)
+        _get(client, page_url)
+        _latency(results, f'music_list.{label}.cached', lambda: _get(client, page_url), repeat)
+
+
+def bench_play_music(results, repeat, range_size=256 * 1024, seed=0):
+    """播放：完整文件的吞吐量和内存峰值、随机 Range 请求的吞吐量"""
+    client = Client()
+    music = Music.objects.filter(file_available=True).order_by('id').first()
+    url = reverse('play_music', args=[music.id])
+    file_size = music.size_bytes
+
+    tracemalloc.start()
+    try:
+        started = time.perf_counter()
+        sent = sum(_consume(_get(client, url)) for _ in range(repeat))
+        elapsed = time.perf_counter() - started
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    results['play_music.full.mb_per_s'] = _metric(sent / 1048576 / elapsed, 'MB/s', 'higher')
+    results['play_music.full.peak_kb'] = _metric(peak / 1024, 'KB', 'lower')
+
+    rnd = random.Random(seed)
+    length = min(range_size, file_size)
+    requests = repeat * 10
+    tracemalloc.start()
+    try:
+        started = time.perf_counter()
+        sent = 0
+        for _ in range(requests):
+            start = rnd.randrange(0, file_size - length + 1)
+            sent += _consume(_get(client, url, HTTP_RANGE=f'bytes={start}-{start + length - 1}'))
+        elapsed = time.perf_counter() - started
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    results['play_music.range.requests_per_s'] = _metric(requests / elapsed, 'req/s', 'higher')
+    results['play_music.range.mb_per_s'] = _metric(sent / 1048576 / elapsed, 'MB/s', 'higher')
+    results['play_music.range.peak_kb'] = _metric(peak / 1024, 'KB', 'lower')
+
+
+def bench_import(results, folder, files, file_size=64 * 1024, workers=1):
+    """import_music_files：首次全量导入和无变化时增量导入的速率（文件/秒）"""
+    os.makedirs(folder, exist_ok=True)
+    for i in range(files):
+        path = os.path.join(folder, f'导入{i}.mp3')
+        write_mp3(path, file_size, f'导入歌曲{i}', f'导入歌手{i % 100}', f'导入专辑{i % 10}', marker=path.encode())
+
+    started = time.perf_counter()
+    call_command('import_music_files', folder, workers=workers, full=True, stdout=StringIO())
+    results['import.full.files_per_s'] = _metric(files / (time.perf_counter() - started), 'files/s', 'higher')
+
+    started = time.perf_counter()
+    call_command('import_music_files', folder, workers=workers, stdout=StringIO())
+    results['import.incremental.files_per_s'] = _metric(files / (time.perf_counter() - started), 'files/s', 'higher')
+
+
+def bench_fix_file_paths(results):
+    """fix_file_paths（预览模式）扫描速率（记录/秒）"""
+    rows = Music.objects.count()
+    path_cache.invalidate()
+    started = time.perf_counter()
+    call_command('fix_file_paths', stdout=StringIO())
+    results['fix_file_paths.scan.rows_per_s'] = _metric(rows / (time.perf_counter() - started), 'rows/s', 'higher')
+
+
+BENCHMARKS = ['list', 'play', 'import', 'fix']
+
+
+def run_suite(workdir, tracks=10000, files=20, file_size=2 * 1048576, import_files=500,
+              repeat=20, seed=0, only=None, stdout=None):
+    """在 workdir 下生成曲库并运行选中的基准测试，返回 {'meta': {...}, 'results': {...}}"""
+    only = only or BENCHMARKS
+    log = stdout.write if stdout else (lambda message: None)
+    library = os.path.join(workdir, 'library')
+    results = {}
+
+    with override_settings(MEDIA_ROOT=library, MUSIC_DELIVERY_MODE='django'):
+        cache.clear()
+        get_page_cache().clear()
+        path_cache.invalidate()
+
+        log(f'Generating {tracks} rows and {files} files of {file_size} bytes ...')
+        started = time.perf_counter()
+        generate_library(library, tracks, files, file_size, seed=seed)
+        log(f'  done in {time.perf_counter() - started:.1f}s')
+
+        if 'list' in only:
+            log('Benchmarking music_list ...')
+            bench_music_list(results, repeat)
+        if 'play' in only:
+            log('Benchmarking play_music ...')
+            bench_play_music(results, repeat, seed=seed)
+        if 'fix' in only:
+            log('Benchmarking fix_file_paths ...')
+            bench_fix_file_paths(results)
+        if 'import' in only:
+            log('Benchmarking import_music_files ...')
+            bench_import(results, os.path.join(workdir, 'import'), import_files)
+
+    meta = {
+        'timestamp': timezone.now().isoformat(),
+        'python': platform.python_version(),
+        'django': django.get_version(),
+        'platform': platform.platform(),
+        'params': {
+            'tracks': tracks, 'files': files, 'file_size': file_size,
+            'import_files': import_files, 'repeat': repeat, 'seed': seed, 'only': only,
+        },
+    }
+    return {'meta': meta, 'results': results}
+
+
+def compare_results(current, baseline, tolerance):
+    """
+    与基准结果对比，返回退化的指标 [(指标名, 基准值, 当前值, 变化比例)]
+    lower 越小越好：当前值超过基准值 (1 + tolerance) 倍算退化；higher 反之
+    """
+    regressions = []
+    for name, metric in current['results'].items():
+        base = baseline.get('results', {}).get(name)
+        if not base or not base['value']:
+            continue
+        change = (metric['value'] - base['value']) / base['value']
+        worse = change > tolerance if metric['better'] == 'lower' else change < -tolerance
+        if worse:
+            regressions.append((name, base['value'], metric['value'], change))
+    return regressions
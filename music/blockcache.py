@@ -0,0 +1,103 @@
+# music/blockcache.py
+import threading
+from collections import OrderedDict
+from django.conf import settings
+from .metrics import BLOCK_CACHE_BYTES, BLOCK_CACHE_LOOKUPS
+
+
+class BlockCache:
+    """
+    进程内的音频数据块缓存，所有连接共享
+    - 文件按 block_size 切成固定大小的块，key 为 (文件 key, 块序号)，
+      文件 key 包含路径、修改时间和大小，文件被替换后旧块不会再命中，按 LRU 慢慢淘汰
+    - 总字节数不超过 max_bytes，超出时淘汰最久未使用的块
+    - 准入：文件开头 head_bytes 以内的块第一次读取就缓存（播放总是从开头开始）；
+      其它块要在最近被读取过一次之后再次读取才缓存，避免偶尔的整曲播放把热门数据挤出去
+    """
+
+    def __init__(self, max_bytes=64 * 1024 * 1024, block_size=256 * 1024, head_bytes=1024 * 1024):
+        self.max_bytes = max_bytes
+        self.block_size = block_size
+        self.head_bytes = head_bytes
+        self.size = 0
+        self.hits = 0
+        self.misses = 0
+        self._blocks = OrderedDict()
+        # 读取过一次但还没有缓存的块，只记 key
+        self._seen = OrderedDict()
+        self._lock = threading.Lock()
+
+    @property
+    def enabled(self):
+        return self.max_bytes > 0 and self.block_size > 0
+
+    def get(self, file_key, index, load):
+        """返回第 index 块的数据；未命中时调用 load() 从文件读取，并按准入规则决定是否缓存"""
+        key = (file_key, index)
+        with self._lock:
+            block = self._blocks.get(key)
+            if block is not None:
+                self._blocks.move_to_end(key)
+                self.hits += 1
+        if block is not None:
+            BLOCK_CACHE_LOOKUPS.inc('hit')
+            return block
+
+        BLOCK_CACHE_LOOKUPS.inc('miss')
+        # 读文件时不持有锁，其它连接的命中不受影响
+        block = load()
+        with self._lock:
+            self.misses += 1
+            if block and len(block) <= self.max_bytes and self._admit(key, index):
+                self._store(key, block)
+        return block
+
+    def _admit(self, key, index):
+        if index * self.block_size < self.head_bytes:
+            return True
+        if key in self._seen:
+            del self._seen[key]
+            return True
+        self._seen[key] = None
+        # 候选块只记 key，记住缓存容量 4 倍数量的块，长曲目播放两遍也能被缓存
+        while len(self._seen) > max(self.max_bytes // self.block_size * 4, 1):
+            self._seen.popitem(last=False)
+        return False
+
+    def _store(self, key, block):
+        old = self._blocks.pop(key, None)
+        added = len(block) - (len(old) if old is not None else 0)
+        self._blocks[key] = block
+        self.size += added
+        while self.size > self.max_bytes:
+            _, evicted = self._blocks.popitem(last=False)
+            self.size -= len(evicted)
+            added -= len(evicted)
+        BLOCK_CACHE_BYTES.inc(amount=added)
+
+    def clear(self):
+        with self._lock:
+            BLOCK_CACHE_BYTES.dec(amount=self.size)
+            self._blocks.clear()
+            self._seen.clear()
+            self.size = 0
+
+    def stats(self):
+        with self._lock:
+            return {
+                'blocks': len(self._blocks),
+                'bytes': self.size,
+                'max_bytes': self.max_bytes,
+                'hits': self.hits,
+                'misses': self.misses,
+            }
+
+    def __len__(self):
+        return len(self._blocks)
+
+
+block_cache = BlockCache(
+    max_bytes=getattr(settings, 'MUSIC_BLOCK_CACHE_SIZE', 64 * 1024 * 1024),
+    block_size=getattr(settings, 'MUSIC_BLOCK_CACHE_BLOCK_SIZE', 256 * 1024),
+    head_bytes=getattr(settings, 'MUSIC_BLOCK_CACHE_HEAD_BYTES', 1024 * 1024),
+)
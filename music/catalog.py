@@ -0,0 +1,163 @@
+# music/catalog.py
+import hashlib
+import threading
+import time
+from django.conf import settings
+from django.db.models import F, Q
+from django.urls import reverse
+from .covers import cover_version
+from .models import CatalogVersion
+from .pagination import encode_cursor
+
+# 曲库版本号：任何 Music 的增删改都会递增，用于生成 JSON 接口的 ETag 和列表页缓存 key
+# 保存在数据库中（CatalogVersion），命令行导入、同步等其它进程的修改对网页进程同样可见
+DEFAULT_CATALOG_VERSION_TTL = 1.0
+_version = {'value': None, 'checked': 0.0}
+_version_lock = threading.Lock()
+
+# 每次请求默认/最多返回的条数
+DEFAULT_CATALOG_LIMIT = 200
+MAX_CATALOG_LIMIT = 1000
+
+# 可选字段 -> 数据库列；src 由 id 生成播放地址；cover 生成带版本参数的封面地址（已知没有封面时为 null）
+CATALOG_FIELDS = {
+    'id': 'id',
+    'name': 'name',
+    'singer': 'singer',
+    'album': 'album',
+    'created_at': 'created_at',
+    'size': 'size_bytes',
+    'available': 'file_available',
+    'duration': 'duration',
+    'bitrate': 'bitrate',
+    'codec': 'codec',
+    'src': 'id',
+    'cover': 'cover',
+}
+DEFAULT_CATALOG_FIELDS = ['id', 'name', 'singer', 'album', 'src']
+
+
+def get_catalog_version():
+    """
+    当前曲库版本号
+    从数据库读取后在进程内保留 MUSIC_CATALOG_VERSION_TTL 秒（0 表示每次都查询），
+    其它进程的修改最多延迟这么久生效；本进程的修改立即生效
+    数据库中还没有版本号时用当前时间（微秒）初始化，重建数据库后不会和旧的 ETag / 页面缓存 key 撞车
+    """
+    ttl = getattr(settings, 'MUSIC_CATALOG_VERSION_TTL', DEFAULT_CATALOG_VERSION_TTL)
+    now = time.monotonic()
+    with _version_lock:
+        if _version['value'] is not None and now - _version['checked'] < ttl:
+            return _version['value']
+    version = CatalogVersion.objects.filter(pk=1).values_list('version', flat=True).first()
+    if version is None:
+        row, _ = CatalogVersion.objects.get_or_create(pk=1, defaults={'version': time.time_ns() // 1000})
+        version = row.version
+    with _version_lock:
+        _version['value'] = version
+        _version['checked'] = now
+    return version
+
+
+def bump_catalog_version():
+    """曲库发生变化后调用，使所有已发出的 ETag 失效"""
+    if not CatalogVersion.objects.filter(pk=1).update(version=F('version') + 1):
+        # 数据库里还没有版本号
+        get_catalog_version()
+    forget_catalog_version()
+
+
+def forget_catalog_version():
+    """丢弃进程内保留的版本号，下次读取时重新查询数据库"""
+    with _version_lock:
+        _version['value'] = None
+
+
+def parse_fields(value):
+    """解析 fields 参数，忽略未知字段，去重并保持顺序"""
+    if not value:
+        return list(DEFAULT_CATALOG_FIELDS)
+    fields = []
+    for name in value.split(','):
+        name = name.strip()
+        if name in CATALOG_FIELDS and name not in fields:
+            fields.append(name)
+    return fields or list(DEFAULT_CATALOG_FIELDS)
+
+
+def parse_limit(value):
+    try:
+        limit = int(value)
+    except (TypeError, ValueError):
+        return DEFAULT_CATALOG_LIMIT
+    return min(max(limit, 1), MAX_CATALOG_LIMIT)
+
+
+def catalog_etag(version, fields, limit, cursor_token):
+    """ETag 只取决于曲库版本号和规范化后的查询参数，不需要访问数据库就能算出来"""
+    key = f'{",".join(fields)}|{limit}|{cursor_token}'
+    digest = hashlib.sha1(key.encode()).hexdigest()[:16]
+    return f'"catalog-{version}-{digest}"'
+
+
+class _CursorRow:
+    """encode_cursor 只需要 created_at 和 id"""
+
+    def __init__(self, created_at, music_id):
+        self.created_at = created_at
+        self.id = music_id
+
+
+def catalog_columns(fields):
+    """查询需要的数据库列，前两列固定是 created_at 和 id（用于游标）"""
+    columns = ['created_at', 'id']
+    for name in fields:
+        column = CATALOG_FIELDS[name]
+        if column not in columns:
+            columns.append(column)
+    return columns
+
+
+def serialize_rows(rows, columns, fields):
+    """把 values_list 的结果转换成按 fields 顺序排列的紧凑列表"""
+    index = {column: i for i, column in enumerate(columns)}
+    # 播放地址和封面地址只需要反解一次，其余用 id 替换
+    src_template = reverse('play_music', args=[0])[:-2] + '%d/'
+    cover_template = reverse('music_cover', args=[0])[:-2] + '%d/'
+    items = []
+    for row in rows:
+        item = []
+        for name in fields:
+            value = row[index[CATALOG_FIELDS[name]]]
+            if name == 'src':
+                value = src_template % value
+            elif name == 'cover':
+                # 还没有提取过时不带版本参数，由封面接口按 ETag 校验
+                if value == '':
+                    value = None
+                else:
+                    value = cover_template % row[index['id']] + (f'?v={cover_version(value)}' if value else '')
+            elif name == 'created_at':
+                value = value.isoformat()
+            item.append(value)
+        items.append(item)
+    return items
+
+
+def catalog_page(queryset, fields, limit, cursor=None):
+    """
+    按 (created_at, id) 倒序取一页，只查询需要的列
+    返回 (紧凑的行列表, 下一页游标或 None)
+    """
+    if cursor:
+        created_at, music_id = cursor
+        queryset = queryset.filter(Q(created_at__lt=created_at) | Q(created_at=created_at, id__lt=music_id))
+
+    columns = catalog_columns(fields)
+    rows = list(queryset.order_by('-created_at', '-id').values_list(*columns)[:limit + 1])
+
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        next_cursor = encode_cursor(_CursorRow(rows[-1][0], rows[-1][1]))
+    return serialize_rows(rows, columns, fields), next_cursor
@@ -0,0 +1,217 @@
+# music/covers.py
+"""
+内嵌封面提取和磁盘缓存
+- 封面只从音频文件中提取一次（ID3 APIC、FLAC / Vorbis 图片块、MP4 covr），按内容哈希保存在缓存目录，
+  同一专辑的多首歌封面相同，只保存一份；Music.cover 记录对应的缓存文件名
+- 安装了 Pillow 时缩小为缩略图（JPEG），否则原样保存
+- 缓存目录超过大小上限时按最近访问时间（文件 mtime）淘汰
+注意：extract_cover / cover_task 会在进程池的子进程中执行，不要在这里导入 Django 模型
+"""
+import base64
+import hashlib
+import io
+import mimetypes
+import os
+import threading
+import time
+from django.conf import settings
+from mutagen import File
+from mutagen.flac import Picture
+
+try:
+    from PIL import Image
+except ImportError:  # Pillow 是可选依赖
+    Image = None
+
+# 图片类型 3 = 封面（正面），见 ID3 APIC / FLAC PICTURE 规范
+FRONT_COVER = 3
+# 命中时距离上次更新 mtime 超过这个秒数才再次更新，避免每个请求都写一次磁盘
+TOUCH_INTERVAL = 3600
+# 淘汰时删到上限的这个比例以下，避免每次写入都要扫描目录
+EVICT_TARGET = 0.9
+
+_EXTENSIONS = {'image/jpeg': '.jpg', 'image/jpg': '.jpg', 'image/png': '.png', 'image/gif': '.gif', 'image/webp': '.webp'}
+
+
+def cover_version(name):
+    """封面缓存文件名中的内容哈希，用作 ETag 和封面地址的版本参数"""
+    return os.path.splitext(name)[0]
+
+
+def extract_cover(file_path):
+    """
+    读取内嵌封面，返回 (图片数据, MIME 类型)；没有封面时返回 None
+    有多张图片时优先使用正面封面；文件无法解析时抛出异常
+    """
+    audio = File(file_path)
+    tags = audio.tags if audio is not None else None
+    pictures = []  # (类型, 数据, MIME)
+    if hasattr(audio, 'pictures'):
+        # FLAC 图片块
+        pictures.extend((p.type, p.data, p.mime) for p in audio.pictures)
+    if tags is not None:
+        if hasattr(tags, 'getall'):
+            # ID3 APIC 帧
+            pictures.extend((p.type, p.data, p.mime) for p in tags.getall('APIC'))
+        elif 'covr' in tags:
+            # MP4 covr：imageformat 14 为 PNG，13 为 JPEG
+            pictures.extend(
+                (FRONT_COVER, bytes(c), 'image/png' if c.imageformat == 14 else 'image/jpeg') for c in tags['covr']
+            )
+        elif 'metadata_block_picture' in tags:
+            # Ogg Vorbis / Opus：base64 编码的 FLAC 图片块
+            for value in tags['metadata_block_picture']:
+                p = Picture(base64.b64decode(value))
+                pictures.append((p.type, p.data, p.mime))
+    pictures = [p for p in pictures if p[1]]
+    if not pictures:
+        return None
+    _, data, mime = min(pictures, key=lambda p: p[0] != FRONT_COVER)
+    return data, (mime or 'image/jpeg').lower()
+
+
+class CoverCache:
+    """
+    按内容寻址的封面缓存：文件名为“哈希 + 扩展名”，放在以哈希前两位命名的子目录中
+    max_bytes：缓存目录大小上限（0 不淘汰）；thumb_size：缩略图最大边长（0 或没有 Pillow 时保存原图）
+    """
+
+    def __init__(self, root, max_bytes=0, thumb_size=0):
+        self.root = root
+        self.max_bytes = max_bytes
+        self.thumb_size = thumb_size
+        # 本进程估算的缓存大小，第一次写入时扫描目录得到；多进程时会偏小，淘汰时重新扫描校正
+        self._bytes = None
+        self._lock = threading.Lock()
+
+    def path(self, name):
+        return os.path.join(self.root, name[:2], name)
+
+    def get(self, name):
+        """缓存中存在时返回文件路径并记录访问时间，否则返回 None"""
+        path = self.path(name)
+        try:
+            st = os.stat(path)
+            if time.time() - st.st_mtime > TOUCH_INTERVAL:
+                os.utime(path)
+        except OSError:
+            return None
+        return path
+
+    def _thumbnail(self, data, mime):
+        if Image is None or not self.thumb_size:
+            return data, mime
+        try:
+            with Image.open(io.BytesIO(data)) as image:
+                if max(image.size) <= self.thumb_size and image.format == 'JPEG':
+                    return data, 'image/jpeg'
+                image.thumbnail((self.thumb_size, self.thumb_size))
+                out = io.BytesIO()
+                image.convert('RGB').save(out, 'JPEG', quality=85, optimize=True)
+        except Exception:
+            # 无法识别的图片原样保存
+            return data, mime
+        return out.getvalue(), 'image/jpeg'
+
+    def store(self, data, mime):
+        """保存一张封面（已存在时只更新访问时间），返回缓存文件名"""
+        # 哈希包含缩略图尺寸，修改尺寸后不会用到旧的缩略图
+        digest = hashlib.blake2b(data, digest_size=16)
+        digest.update(str(self.thumb_size if Image is not None else 0).encode())
+        stem = digest.hexdigest()
+        # 已经缓存过（同一专辑的其它歌曲）时不再生成缩略图
+        thumbnailed = Image is not None and self.thumb_size
+        name = stem + self._extension('image/jpeg' if thumbnailed else mime)
+        if self.get(name):
+            return name
+        data, mime = self._thumbnail(data, mime)
+        name = stem + self._extension(mime)
+
+        path = self.path(name)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        # 先写临时文件再改名，并发写同一张封面也不会读到写了一半的文件
+        tmp = f'{path}.{os.getpid()}.{threading.get_ident()}.tmp'
+        with open(tmp, 'wb') as fh:
+            fh.write(data)
+        os.replace(tmp, path)
+        self._account(len(data))
+        return name
+
+    @staticmethod
+    def _extension(mime):
+        return _EXTENSIONS.get(mime) or mimetypes.guess_extension(mime) or '.img'
+
+    def store_from(self, file_path):
+        """从音频文件提取封面并保存，返回缓存文件名；没有封面时返回 ''"""
+        cover = extract_cover(file_path)
+        return self.store(*cover) if cover else ''
+
+    def _account(self, nbytes):
+        with self._lock:
+            if self._bytes is None:
+                self._bytes = self.size()
+            else:
+                self._bytes += nbytes
+            over = self.max_bytes and self._bytes > self.max_bytes
+        if over:
+            self.evict()
+
+    def _entries(self):
+        entries = []
+        try:
+            subdirs = list(os.scandir(self.root))
+        except OSError:
+            return entries
+        for subdir in subdirs:
+            if not subdir.is_dir():
+                continue
+            try:
+                with os.scandir(subdir.path) as it:
+                    for entry in it:
+                        if entry.is_file() and not entry.name.endswith('.tmp'):
+                            st = entry.stat()
+                            entries.append((st.st_mtime, st.st_size, entry.path))
+            except OSError:
+                # 其它进程同时在淘汰
+                continue
+        return entries
+
+    def size(self):
+        return sum(size for _, size, _ in self._entries())
+
+    def evict(self):
+        """按访问时间从旧到新删除，直到缓存大小降到上限的 EVICT_TARGET 以下；返回删除的文件数"""
+        entries = sorted(self._entries())
+        total = sum(size for _, size, _ in entries)
+        target = self.max_bytes * EVICT_TARGET
+        removed = 0
+        for _, size, path in entries:
+            if total <= target:
+                break
+            try:
+                os.remove(path)
+            except OSError:
+                continue
+            total -= size
+            removed += 1
+        with self._lock:
+            self._bytes = total
+        return removed
+
+
+cover_cache = CoverCache(
+    getattr(settings, 'MUSIC_COVER_CACHE_DIR', None) or os.path.join(settings.BASE_DIR, 'cache', 'covers'),
+    max_bytes=getattr(settings, 'MUSIC_COVER_CACHE_SIZE', 256 * 1024 * 1024),
+    thumb_size=getattr(settings, 'MUSIC_COVER_SIZE', 300),
+)
+
+
+def cover_task(file_path, root, thumb_size):
+    """
+    进程池中执行的任务（warm_cover_cache 命令）：提取并保存封面，不做淘汰
+    返回 (file_path, 缓存文件名)，没有封面时为 ''，文件无法解析时为 None
+    """
+    try:
+        return file_path, CoverCache(root, 0, thumb_size).store_from(file_path)
+    except Exception:
+        return file_path, None
@@ -0,0 +1,115 @@
+# music/fingerprint.py
+"""
+音频文件内容指纹，用于发现重复的文件
+- 只看音频数据：跳过开头的 ID3v2 标签 / FLAC 元数据块和结尾的 APEv2 / ID3v1 标签，
+  同一个文件复制到别的目录、或者只改了标签，指纹都相同
+- 快速指纹：音频数据长度 + 开头、中间、结尾各一块的 BLAKE2b，每个文件只读三块
+- 快速指纹相同的文件再对完整音频数据做哈希确认（same_content）
+注意：这个模块会在导入进程池的子进程中执行，不要在这里导入 Django 模型
+"""
+import hashlib
+import os
+import struct
+
+# 快速指纹每处采样的字节数
+SAMPLE_SIZE = 64 * 1024
+# 完整哈希时每次读取的字节数
+READ_SIZE = 1024 * 1024
+
+
+def _syncsafe(data):
+    return (data[0] << 21) | (data[1] << 14) | (data[2] << 7) | data[3]
+
+
+def audio_span(fh, size):
+    """返回音频数据在文件中的范围 [start, end)，不含首尾的标签"""
+    start = 0
+    fh.seek(0)
+    head = fh.read(10)
+    if head[:4] == b'fLaC':
+        # FLAC 元数据块：1 字节（最高位表示最后一块）+ 3 字节长度
+        pos = 4
+        while pos + 4 <= size:
+            fh.seek(pos)
+            block = fh.read(4)
+            pos += 4 + int.from_bytes(block[1:4], 'big')
+            if block[0] & 0x80:
+                break
+        start = min(pos, size)
+    else:
+        while len(head) == 10 and head[:3] == b'ID3' and not any(b & 0x80 for b in head[6:10]):
+            start += 10 + _syncsafe(head[6:10]) + (10 if head[5] & 0x10 else 0)
+            fh.seek(start)
+            head = fh.read(10)
+
+    end = size
+    if end - start >= 128:
+        fh.seek(end - 128)
+        if fh.read(3) == b'TAG':
+            end -= 128
+    if end - start >= 32:
+        fh.seek(end - 32)
+        footer = fh.read(32)
+        if footer[:8] == b'APETAGEX':
+            length, _, flags = struct.unpack('<III', footer[12:24])
+            end -= length + (32 if flags & 0x80000000 else 0)
+    return start, max(end, start)
+
+
+def quick_fingerprint(file_path):
+    """快速指纹 '音频长度(十六进制):哈希'；文件无法读取时返回 None"""
+    try:
+        with open(file_path, 'rb') as fh:
+            start, end = audio_span(fh, os.fstat(fh.fileno()).st_size)
+            length = end - start
+            digest = hashlib.blake2b(digest_size=16)
+            if length <= SAMPLE_SIZE * 3:
+                fh.seek(start)
+                digest.update(fh.read(length))
+            else:
+                for offset in (start, start + (length - SAMPLE_SIZE) // 2, end - SAMPLE_SIZE):
+                    fh.seek(offset)
+                    digest.update(fh.read(SAMPLE_SIZE))
+    except OSError:
+        return None
+    return f'{length:x}:{digest.hexdigest()}'
+
+
+def full_hash(file_path):
+    """完整音频数据的 BLAKE2b；文件无法读取时返回 None"""
+    try:
+        with open(file_path, 'rb') as fh:
+            start, end = audio_span(fh, os.fstat(fh.fileno()).st_size)
+            digest = hashlib.blake2b(digest_size=32)
+            fh.seek(start)
+            remaining = end - start
+            while remaining > 0:
+                chunk = fh.read(min(READ_SIZE, remaining))
+                if not chunk:
+                    break
+                digest.update(chunk)
+                remaining -= len(chunk)
+    except OSError:
+        return None
+    return digest.hexdigest()
+
+
+def same_content(path, other, cache=None):
+    """两个快速指纹相同的文件，音频数据是否完全一致；cache（dict）可在多次比较间复用完整哈希"""
+    cache = {} if cache is None else cache
+    hashes = []
+    for p in (path, other):
+        if p not in cache:
+            cache[p] = full_hash(p)
+        hashes.append(cache[p])
+    return hashes[0] is not None and hashes[0] == hashes[1]
+
+
+def fingerprint_task(file_path):
+    """进程池中执行的任务（find_duplicates 命令）：返回 (file_path, 快速指纹或 None)"""
+    return file_path, quick_fingerprint(file_path)
+
+
+def full_hash_task(file_path):
+    """进程池中执行的任务（find_duplicates 命令）：返回 (file_path, 完整哈希或 None)"""
+    return file_path, full_hash(file_path)
@@ -0,0 +1,424 @@
+# music/importer.py
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from itertools import islice
+from django.db import transaction
+from django.utils import timezone
+from .catalog import bump_catalog_version
+from .fingerprint import same_content
+from .metadata import extract_track
+from .models import Music, LibraryFile
+from .pagination import invalidate_music_count
+from .search import index_music
+from .utils import ResolvedFile, invalidate_music_file_path
+
+# 支持导入的音频格式
+SUPPORTED_FORMATS = ['.mp3', '.wav', '.flac', '.ogg', '.m4a']
+
+DEFAULT_BATCH_SIZE = 500
+
+
+class ImportStats:
+    """导入过程中的计数和吞吐量统计"""
+
+    def __init__(self):
+        self.total = 0
+        self.processed = 0
+        self.imported = 0
+        self.updated = 0
+        self.unchanged = 0
+        self.missing = 0
+        self.skipped = 0
+        self.failed = 0
+        self.started = time.monotonic()
+
+    @property
+    def elapsed(self):
+        return time.monotonic() - self.started
+
+    @property
+    def rate(self):
+        """已解析文件数 / 秒"""
+        elapsed = self.elapsed
+        return self.processed / elapsed if elapsed > 0 else 0.0
+
+    def as_dict(self):
+        return {
+            'total': self.total,
+            'processed': self.processed,
+            'imported': self.imported,
+            'updated': self.updated,
+            'unchanged': self.unchanged,
+            'missing': self.missing,
+            'skipped': self.skipped,
+            'failed': self.failed,
+            'elapsed': round(self.elapsed, 2),
+            'rate': round(self.rate, 1),
+        }
+
+
+def _chunks(items, size):
+    items = list(items)
+    for i in range(0, len(items), size):
+        yield items[i:i + size]
+
+
+def scan_audio_files(folder, stats, formats=SUPPORTED_FORMATS, recursive=True, unreadable=None):
+    """
+    用 os.scandir 遍历目录，产出支持格式的音频文件 (path, size, mtime)
+    只读取目录项和 stat 信息，不会打开文件；非音频文件计入 skipped
+    unreadable（set）：传入时记录无法读取（不存在以外的错误）的目录和目录项，
+    调用方据此区分“文件已消失”和“暂时读不到”
+    """
+    stack = [folder]
+    while stack:
+        path = stack.pop()
+        try:
+            it = os.scandir(path)
+        except FileNotFoundError:
+            continue
+        except OSError:
+            if unreadable is not None:
+                unreadable.add(path)
+            continue
+        with it:
+            for entry in it:
+                try:
+                    if entry.is_dir(follow_symlinks=False):
+                        if recursive:
+                            stack.append(entry.path)
+                        continue
+                    if not entry.is_file():
+                        continue
+                    stats.total += 1
+                    if os.path.splitext(entry.name)[1].lower() not in formats:
+                        stats.skipped += 1
+                        continue
+                    st = entry.stat()
+                except FileNotFoundError:
+                    continue
+                except OSError:
+                    if unreadable is not None:
+                        unreadable.add(entry.path)
+                    continue
+                yield entry.path, st.st_size, st.st_mtime
+
+
+def iter_extracted(paths, workers, extract=extract_track, chunksize=16):
+    """
+    在进程池中并行执行 extract（默认 extract_track），按提交顺序产出结果
+    每次只提交有限的一段路径，避免几十万个任务同时堆在内存里
+    """
+    if workers <= 1:
+        for path in paths:
+            yield extract(path)
+        return
+
+    window = workers * chunksize * 4
+    paths = iter(paths)
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        while True:
+            chunk = list(islice(paths, window))
+            if not chunk:
+                break
+            yield from pool.map(extract, chunk, chunksize=chunksize)
+
+
+class ScanManifest:
+    """
+    增量导入用的扫描清单（LibraryFile）
+    - 路径、大小、修改时间都没变的文件直接跳过，不解析标签
+    - 清单里有、这次扫描没看到的文件视为已消失
+    recursive=False 时只扫描目录本身，清单也只取直接位于目录下的文件，子目录中的文件不会被当成已消失
+    """
+
+    def __init__(self, folder, recursive=True):
+        prefix = os.path.join(folder, '')
+        self.entries = {
+            path: (size, mtime)
+            for path, size, mtime in LibraryFile.objects.filter(path__startswith=prefix)
+            .values_list('path', 'size', 'mtime')
+            if recursive or os.path.dirname(path) == os.path.dirname(prefix)
+        }
+        self.seen = set()
+        # 已有 Music 记录、但文件发生了变化的路径，解析后更新记录而不是新增
+        self.modified = set()
+        # 本次需要写入清单的 path -> (size, mtime)
+        self.pending = {}
+
+    def changed_files(self, files, stats, lookup_size=DEFAULT_BATCH_SIZE):
+        """过滤掉没有变化的文件，只产出需要解析标签的路径"""
+        unknown = []
+        for path, size, mtime in files:
+            self.seen.add(path)
+            known = self.entries.get(path)
+            if known is None:
+                unknown.append((path, size, mtime))
+                if len(unknown) >= lookup_size:
+                    yield from self._check_unknown(unknown, stats)
+                    unknown = []
+            elif known == (size, mtime):
+                stats.unchanged += 1
+            else:
+                self.modified.add(path)
+                yield path
+        yield from self._check_unknown(unknown, stats)
+
+    def _check_unknown(self, files, stats):
+        """清单中还没有的文件：已有相同路径、大小和修改时间的 Music 记录时直接记入清单"""
+        if not files:
+            return
+        rows = {
+            file_path: (size, mtime)
+            for file_path, size, mtime in Music.objects.filter(file_path__in=[f[0] for f in files])
+            .values_list('file_path', 'size_bytes', 'file_mtime')
+        }
+        for path, size, mtime in files:
+            if path in rows:
+                if rows[path] == (size, mtime):
+                    stats.unchanged += 1
+                    self.record(path, size, mtime)
+                    continue
+                self.modified.add(path)
+            yield path
+
+    def record(self, path, size, mtime):
+        if size is not None:
+            self.pending[path] = (size, mtime)
+
+    def save(self, stats, batch_size=DEFAULT_BATCH_SIZE):
+        """写入清单的变化，并把文件已消失的 Music 记录标记为不可用"""
+        now = timezone.now()
+        new_entries = [
+            LibraryFile(path=path, size=size, mtime=mtime, scanned_at=now)
+            for path, (size, mtime) in self.pending.items()
+            if path not in self.entries
+        ]
+        changed = [
+            (path, size, mtime)
+            for path, (size, mtime) in self.pending.items()
+            if path in self.entries and self.entries[path] != (size, mtime)
+        ]
+        missing = [path for path in self.entries if path not in self.seen]
+
+        with transaction.atomic():
+            LibraryFile.objects.bulk_create(new_entries, batch_size=batch_size)
+            for path, size, mtime in changed:
+                LibraryFile.objects.filter(path=path).update(size=size, mtime=mtime, scanned_at=now)
+            for chunk in _chunks(missing, batch_size):
+                Music.objects.filter(file_path__in=chunk).update(
+                    resolved_path=None, size_bytes=None, file_mtime=None,
+                    file_available=False, verified_at=now,
+                )
+                LibraryFile.objects.filter(path__in=chunk).delete()
+
+        stats.missing = len(missing)
+        if missing:
+            invalidate_music_file_path(*missing)
+            bump_catalog_version()
+
+
+def load_existing_keys():
+    """一次性读出已有的 (name, singer)，替代逐条 exists() 查询"""
+    return set(Music.objects.values_list('name', 'singer'))
+
+
+class ContentIndex:
+    """
+    按内容指纹查重：已有记录的指纹一次性加载到集合中，
+    快速指纹相同时再对两个文件的完整音频数据做哈希确认，指纹碰撞不会误判
+    """
+
+    def __init__(self):
+        self.fingerprints = set(Music.objects.filter(fingerprint__isnull=False).values_list('fingerprint', flat=True))
+        # 本次导入新增的指纹 -> 文件路径（还没写入数据库的批次也能查到）
+        self._paths = {}
+        self._hashes = {}
+
+    def is_duplicate(self, file_path, fingerprint):
+        if not fingerprint or fingerprint not in self.fingerprints:
+            return False
+        if fingerprint in self._paths:
+            candidates = [self._paths[fingerprint]]
+        else:
+            candidates = [
+                resolved or path
+                for resolved, path in Music.objects.filter(fingerprint=fingerprint).values_list('resolved_path', 'file_path')
+            ]
+        return any(other == file_path or same_content(file_path, other, self._hashes) for other in candidates)
+
+    def add(self, file_path, fingerprint):
+        if fingerprint:
+            self.fingerprints.add(fingerprint)
+            self._paths.setdefault(fingerprint, file_path)
+
+
+def _new_music(file_path, metadata, size, mtime):
+    music = Music(
+        name=metadata['name'],
+        singer=metadata['singer'],
+        album=metadata['album'],
+        file_path=file_path,
+    )
+    music.set_file_facts(ResolvedFile(file_path, size, mtime) if size is not None else None)
+    music.set_audio_facts(metadata.get('audio'))
+    music.fingerprint = metadata.get('fingerprint')
+    return music
+
+
+def _insert_musics(musics):
+    with transaction.atomic():
+        Music.objects.bulk_create(musics, batch_size=len(musics))
+        index_music(musics)
+
+
+def write_batch(batch, stats, manifest=None):
+    """
+    在一个事务里批量写入一批 Music
+    整批写入失败时（例如某条记录的字段超长）改为逐条写入，只有出错的记录计入失败，
+    其它记录照常写入并记入扫描清单；失败的文件不记入清单，下次增量导入时会重试
+    """
+    if not batch:
+        return
+    try:
+        _insert_musics(batch)
+    except Exception as e:
+        print(f"批量写入 {len(batch)} 首失败，改为逐条写入：{str(e)}")
+        written = []
+        for music in batch:
+            # 失败的批次可能已经给对象填了主键
+            music.pk = None
+            try:
+                _insert_musics([music])
+            except Exception as e:
+                stats.failed += 1
+                print(f"写入失败 {music.file_path}：{str(e)}")
+            else:
+                written.append(music)
+        batch = written
+        if not batch:
+            return
+    stats.imported += len(batch)
+    # bulk_create 不会触发 post_save，搜索索引在事务中一起写入；这里手动丢弃路径缓存和总数缓存，并递增曲库版本号
+    invalidate_music_file_path(*[m.file_path for m in batch])
+    invalidate_music_count()
+    bump_catalog_version()
+    if manifest is not None:
+        for m in batch:
+            manifest.record(m.file_path, m.size_bytes, m.file_mtime)
+
+
+def update_batch(results, stats, existing, manifest):
+    """
+    文件有变化的已有记录：重新写入标签和文件信息
+    返回找不到对应记录、需要按新文件处理的结果
+    """
+    if not results:
+        return []
+    rows = {m.file_path: m for m in Music.objects.filter(file_path__in=[r[0] for r in results])}
+    updated = []
+    leftover = []
+    verified_at = timezone.now()
+    for file_path, metadata, size, mtime in results:
+        music = rows.get(file_path)
+        if music is None:
+            leftover.append((file_path, metadata, size, mtime))
+            continue
+        music.name = metadata['name']
+        music.singer = metadata['singer']
+        music.album = metadata['album']
+        music.set_file_facts(ResolvedFile(file_path, size, mtime) if size is not None else None, verified_at)
+        music.set_audio_facts(metadata.get('audio'))
+        music.fingerprint = metadata.get('fingerprint')
+        # 标签可能变了，封面在下次请求时重新提取
+        music.cover = None
+        existing.add((music.name, music.singer))
+        updated.append(music)
+
+    try:
+        with transaction.atomic():
+            Music.objects.bulk_update(
+                updated, ['name', 'singer', 'album', 'fingerprint', 'cover', *Music.FILE_FACT_FIELDS, *Music.AUDIO_FACT_FIELDS]
+            )
+            index_music(updated)
+        stats.updated += len(updated)
+        invalidate_music_file_path(*[m.file_path for m in updated])
+        bump_catalog_version()
+        for m in updated:
+            manifest.record(m.file_path, m.size_bytes, m.file_mtime)
+    except Exception as e:
+        stats.failed += len(updated)
+        print(f"批量更新 {len(updated)} 首失败：{str(e)}")
+    return leftover
+
+
+def import_folder(folder, workers=None, batch_size=DEFAULT_BATCH_SIZE, progress=None,
+                  incremental=False, extract=extract_track, formats=SUPPORTED_FORMATS, recursive=True):
+    """
+    导入目录下的所有音频文件
+    - 标签解析在进程池中并行执行（workers <= 1 时在当前进程执行）
+    - 已有的 (name, singer) 一次性加载到集合中去重；内容相同的文件（复制到别处或改过标签）按指纹去重
+    - 每 batch_size 条用 bulk_create 在一个事务中写入
+    - incremental=True 时对照扫描清单，只解析新增或变化的文件，并标记已消失的文件
+    progress(stats) 会在每批写入后被调用，可用于输出吞吐量
+    """
+    folder = os.path.abspath(folder)
+    workers = workers or os.cpu_count() or 1
+    batch_size = max(batch_size, 1)
+    stats = ImportStats()
+    existing = load_existing_keys()
+    contents = ContentIndex()
+    manifest = ScanManifest(folder, recursive) if incremental else None
+
+    files = scan_audio_files(folder, stats, formats, recursive)
+    if manifest is not None:
+        paths = manifest.changed_files(files, stats)
+    else:
+        paths = (path for path, size, mtime in files)
+
+    batch = []
+    updates = []
+
+    def add_new(file_path, metadata, size, mtime):
+        key = (metadata['name'], metadata['singer'])
+        fingerprint = metadata.get('fingerprint')
+        if key in existing or contents.is_duplicate(file_path, fingerprint):
+            stats.skipped += 1
+            # 重复的文件也记入清单，下次不再解析
+            if manifest is not None:
+                manifest.record(file_path, size, mtime)
+            return
+        existing.add(key)
+        contents.add(file_path, fingerprint)
+        batch.append(_new_music(file_path, metadata, size, mtime))
+
+    for file_path, metadata, size, mtime in iter_extracted(paths, workers, extract):
+        stats.processed += 1
+        if manifest is not None and file_path in manifest.modified:
+            updates.append((file_path, metadata, size, mtime))
+            if len(updates) >= batch_size:
+                for result in update_batch(updates, stats, existing, manifest):
+                    add_new(*result)
+                updates = []
+        else:
+            add_new(file_path, metadata, size, mtime)
+
+        if len(batch) >= batch_size:
+            write_batch(batch, stats, manifest)
+            batch = []
+            if progress:
+                progress(stats)
+        elif progress and stats.processed % batch_size == 0:
+            # 大量重复文件被跳过时也定期报告进度
+            progress(stats)
+
+    for result in update_batch(updates, stats, existing, manifest):
+        add_new(*result)
+    if batch:
+        write_batch(batch, stats, manifest)
+    if manifest is not None:
+        manifest.save(stats, batch_size)
+    if progress:
+        progress(stats)
+    return stats
@@ -0,0 +1,111 @@
+# music/jobs.py
+"""
+后台导入任务
+网页提交导入后只创建 ImportJob 并放进本地线程池，请求立即返回；
+任务调用 import_folder 分批解析和写入，进度定期写回 ImportJob，页面通过 JSON 接口轮询
+进程退出时正在执行的任务不会恢复，会一直停在“导入中”
+"""
+import threading
+import time
+import traceback
+from concurrent.futures import ThreadPoolExecutor
+from django.conf import settings
+from django.db import close_old_connections, connection, transaction
+from django.utils import timezone
+from .importer import DEFAULT_BATCH_SIZE, import_folder
+from .models import ImportJob
+
+# 两次写入进度之间的最短间隔（秒）
+PROGRESS_INTERVAL = 1.0
+
+_job_executor = None
+_job_executor_lock = threading.Lock()
+
+
+def get_job_executor():
+    """
+    获取（懒加载）导入任务线程池，大小由 MUSIC_IMPORT_JOB_WORKERS 配置
+    配置为 0 时返回 None，任务在当前请求中直接执行（测试和调试用）
+    """
+    global _job_executor
+    workers = int(getattr(settings, 'MUSIC_IMPORT_JOB_WORKERS', 1))
+    if workers <= 0:
+        return None
+    if _job_executor is None:
+        with _job_executor_lock:
+            if _job_executor is None:
+                _job_executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='music-import')
+    return _job_executor
+
+
+def _save_stats(job, stats, **extra):
+    values = {name: getattr(stats, name) for name in ImportJob.COUNTER_FIELDS}
+    values['rate'] = round(stats.rate, 1)
+    values.update(extra)
+    ImportJob.objects.filter(pk=job.pk).update(**values)
+    for name, value in values.items():
+        setattr(job, name, value)
+
+
+def run_import_job(job_id, **import_options):
+    """执行导入任务，import_options 原样传给 import_folder"""
+    job = ImportJob.objects.get(pk=job_id)
+    ImportJob.objects.filter(pk=job.pk).update(status=ImportJob.STATUS_RUNNING, started_at=timezone.now())
+    last_saved = [0.0]
+
+    def progress(stats):
+        now = time.monotonic()
+        if now - last_saved[0] >= PROGRESS_INTERVAL:
+            last_saved[0] = now
+            _save_stats(job, stats)
+
+    try:
+        stats = import_folder(job.folder, progress=progress, **import_options)
+    except Exception as e:
+        traceback.print_exc()
+        ImportJob.objects.filter(pk=job.pk).update(
+            status=ImportJob.STATUS_FAILED, error=str(e), finished_at=timezone.now(),
+        )
+        return
+    _save_stats(job, stats, status=ImportJob.STATUS_DONE, finished_at=timezone.now())
+
+
+def _run_in_worker(job_id, import_options):
+    # 工作线程有自己的数据库连接，用完关闭
+    close_old_connections()
+    try:
+        run_import_job(job_id, **import_options)
+    finally:
+        connection.close()
+
+
+def start_import_job(folder, batch_size=DEFAULT_BATCH_SIZE, **import_options):
+    """创建导入任务并提交到线程池，返回 ImportJob"""
+    job = ImportJob.objects.create(folder=folder)
+    import_options['batch_size'] = batch_size
+    executor = get_job_executor()
+    if executor is None:
+        run_import_job(job.pk, **import_options)
+        job.refresh_from_db()
+    else:
+        # 等创建任务的事务提交后再提交，工作线程一定能读到这条记录
+        transaction.on_commit(lambda: executor.submit(_run_in_worker, job.pk, import_options))
+    return job
+
+
+def job_status(job):
+    """轮询接口返回的任务状态"""
+    data = {name: getattr(job, name) for name in ImportJob.COUNTER_FIELDS}
+    end = job.finished_at or timezone.now()
+    data.update({
+        'id': job.pk,
+        'folder': job.folder,
+        'status': job.status,
+        'finished': job.finished,
+        'rate': job.rate,
+        'elapsed': round((end - job.started_at).total_seconds(), 1) if job.started_at else 0,
+        'error': job.error,
+        'created_at': job.created_at.isoformat(),
+        'finished_at': job.finished_at.isoformat() if job.finished_at else None,
+    })
+    return data
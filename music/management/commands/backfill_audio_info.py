@@ -0,0 +1,81 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from itertools import islice
+from music.catalog import bump_catalog_version
+from music.importer import iter_extracted
+from music.metadata import read_track_info
+from music.models import Music
+from collections import deque
+import os
+import time
+
+class Command(BaseCommand):
+    help = (
+        'Fill the stored audio facts (duration, bitrate, sample rate, codec, tag source) of Music rows '
+        'with mutagen in a process pool, in id order with one bulk update per batch. '
+        'Rows already filled are skipped, so an interrupted run resumes where it stopped.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, default=os.cpu_count() or 1, help='Reader processes (1 = read in this process).')
+        parser.add_argument('--batch-size', type=int, default=500, help='Rows read and written per batch.')
+        parser.add_argument('--after', type=int, default=0, help='Start after this Music id.')
+        parser.add_argument('--limit', type=int, default=0, help='Maximum rows to process (0 = no limit).')
+        parser.add_argument('--refresh', action='store_true', help='Re-read rows that already have audio facts.')
+
+    def handle(self, *args, **options):
+        batch_size = max(options['batch_size'], 1)
+        rows = Music.objects.filter(file_path__isnull=False).exclude(file_available=False)
+        if not options['refresh']:
+            # tag_source 只有成功读取后才会写入，没有填过的行就是剩下要处理的
+            rows = rows.filter(tag_source__isnull=True)
+        rows = rows.order_by('id').only('id', 'file_path', 'resolved_path', *Music.AUDIO_FACT_FIELDS)
+
+        # 按提交顺序记住每个路径对应的记录，进程池的结果按同样的顺序返回
+        pending = deque()
+
+        def paths():
+            last = options['after']
+            remaining = options['limit'] or None
+            while remaining is None or remaining > 0:
+                size = batch_size if remaining is None else min(batch_size, remaining)
+                chunk = list(rows.filter(id__gt=last)[:size])
+                if not chunk:
+                    return
+                last = chunk[-1].id
+                if remaining is not None:
+                    remaining -= len(chunk)
+                for music in chunk:
+                    pending.append(music)
+                    yield music.resolved_path or music.file_path
+
+        filled = 0
+        unreadable = 0
+        started = time.monotonic()
+        results = iter_extracted(paths(), options['workers'], read_track_info)
+        while True:
+            chunk = list(islice(results, batch_size))
+            if not chunk:
+                break
+            updated = []
+            for _, info in chunk:
+                music = pending.popleft()
+                if info is None:
+                    unreadable += 1
+                    continue
+                music.set_audio_facts(info)
+                updated.append(music)
+            with transaction.atomic():
+                Music.objects.bulk_update(updated, Music.AUDIO_FACT_FIELDS)
+            if updated:
+                # 列表页和曲库接口会显示这些字段
+                bump_catalog_version()
+            filled += len(updated)
+            elapsed = time.monotonic() - started
+            self.stdout.write(
+                f'  filled {filled} rows up to id {music.id} ({(filled + unreadable) / elapsed if elapsed else 0:.0f} rows/s)'
+            )
+
+        self.stdout.write('\nSummary:')
+        self.stdout.write(f'  Filled: {filled}')
+        self.stdout.write(f'  Unreadable / missing: {unreadable}')
@@ -0,0 +1,78 @@
+from django.core.management.base import BaseCommand
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Q
+from django.utils import timezone
+from functools import partial
+from itertools import islice
+from music.importer import iter_extracted
+from music.models import Music, SeekIndex
+from music.seektable import SEEKABLE_FORMATS, build_seek_table
+import os
+import time
+
+class Command(BaseCommand):
+    help = (
+        'Build frame-accurate time-to-byte seek tables (and exact durations) for MP3 tracks '
+        'in a process pool. Tracks whose table matches the current file size and mtime are skipped.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, default=os.cpu_count() or 1, help='Scanner processes (1 = scan in this process).')
+        parser.add_argument('--batch-size', type=int, default=500, help='Tables written per transaction.')
+        parser.add_argument('--interval', type=float, default=None, help='Seconds between seek points (default: MUSIC_SEEK_INTERVAL).')
+        parser.add_argument('--limit', type=int, default=0, help='Maximum tracks to scan (0 = no limit).')
+        parser.add_argument('--rebuild', action='store_true', help='Rebuild tables that are still up to date.')
+
+    def handle(self, *args, **options):
+        interval = options['interval'] or float(getattr(settings, 'MUSIC_SEEK_INTERVAL', 1.0))
+        batch_size = max(options['batch_size'], 1)
+
+        formats = Q()
+        for ext in SEEKABLE_FORMATS:
+            formats |= Q(file_path__iendswith=ext)
+        rows = Music.objects.filter(formats, file_available=True).order_by('id').values_list(
+            'id', 'resolved_path', 'file_path', 'size_bytes', 'file_mtime',
+            'seek_index__file_size', 'seek_index__file_mtime', 'seek_index__interval',
+        )
+        if options['limit']:
+            rows = rows[:options['limit']]
+
+        # 路径 -> 记录 id（同一个文件可能对应多条记录）
+        targets = {}
+        up_to_date = 0
+        for pk, resolved, file_path, size, mtime, index_size, index_mtime, index_interval in rows.iterator(chunk_size=2000):
+            if not options['rebuild'] and (index_size, index_mtime, index_interval) == (size, mtime, interval):
+                up_to_date += 1
+                continue
+            targets.setdefault(resolved or file_path, []).append(pk)
+
+        built = 0
+        failed = 0
+        started = time.monotonic()
+        scan = partial(build_seek_table, interval=interval)
+        results = iter_extracted(list(targets), options['workers'], scan)
+        while True:
+            chunk = list(islice(results, batch_size))
+            if not chunk:
+                break
+            now = timezone.now()
+            tables = []
+            for path, table, size, mtime in chunk:
+                if table is None:
+                    failed += 1
+                    self.stdout.write(f'  failed: {path}', self.style.WARNING)
+                    continue
+                tables.extend(SeekIndex.from_table(pk, table, size, mtime, now) for pk in targets[path])
+            # 先删除旧表再插入：MySQL 不支持带 unique_fields 的 bulk_create(update_conflicts=True)
+            with transaction.atomic():
+                SeekIndex.objects.filter(music_id__in=[index.music_id for index in tables]).delete()
+                SeekIndex.objects.bulk_create(tables)
+            built += len(tables)
+            elapsed = time.monotonic() - started
+            self.stdout.write(f'  built {built} tables ({built / elapsed if elapsed else 0:.0f} tables/s)')
+
+        self.stdout.write('\nSummary:')
+        self.stdout.write(f'  Built: {built}')
+        self.stdout.write(f'  Up to date: {up_to_date}')
+        self.stdout.write(f'  Failed / not MP3 audio: {failed}')
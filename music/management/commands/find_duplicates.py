@@ -0,0 +1,111 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Count
+from itertools import islice
+from music.fingerprint import fingerprint_task, full_hash_task
+from music.importer import iter_extracted
+from music.models import Music
+from collections import deque
+import os
+import time
+
+class Command(BaseCommand):
+    help = (
+        'Report groups of Music rows whose audio content is identical (copies or re-tagged files). '
+        'Missing content fingerprints are computed first in a process pool; fingerprint collisions '
+        'are confirmed with a full hash of the audio data.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, default=os.cpu_count() or 1, help='Hashing processes (1 = hash in this process).')
+        parser.add_argument('--batch-size', type=int, default=500, help='Fingerprints computed and written per batch.')
+        parser.add_argument('--no-scan', action='store_true', help='Only use fingerprints already stored.')
+        parser.add_argument('--no-verify', action='store_true', help='Trust fingerprints without a full hash of colliding files.')
+
+    def handle(self, *args, **options):
+        if not options['no_scan']:
+            self.fill_fingerprints(max(options['batch_size'], 1), options['workers'])
+
+        colliding = (
+            Music.objects.filter(fingerprint__isnull=False)
+            .values('fingerprint').annotate(n=Count('id')).filter(n__gt=1)
+            .values_list('fingerprint', flat=True)
+        )
+        candidates = {}
+        for music in Music.objects.filter(fingerprint__in=colliding).order_by('id').only(
+            'id', 'name', 'singer', 'file_path', 'resolved_path', 'size_bytes', 'fingerprint'
+        ):
+            candidates.setdefault(music.fingerprint, []).append(music)
+
+        groups = list(candidates.values())
+        if not options['no_verify']:
+            groups = self.verify(groups, options['workers'])
+
+        wasted = 0
+        rows = 0
+        for number, group in enumerate(groups, 1):
+            paths = {music.resolved_path or music.file_path for music in group}
+            size = group[0].size_bytes or 0
+            wasted += size * (len(paths) - 1)
+            rows += len(group) - 1
+            self.stdout.write(f'Group {number} ({len(group)} rows, {len(paths)} files, {size / (1024 * 1024):.2f} MB each):')
+            for music in group:
+                self.stdout.write(f'  #{music.id} {music.singer} - {music.name}  {music.resolved_path or music.file_path}')
+
+        self.stdout.write('\nSummary:')
+        self.stdout.write(f'  Duplicate groups: {len(groups)}')
+        self.stdout.write(f'  Redundant rows: {rows}')
+        self.stdout.write(f'  Redundant bytes on disk: {wasted}')
+
+    def fill_fingerprints(self, batch_size, workers):
+        """给还没有指纹的记录计算快速指纹，按 id 顺序分批写入；中断后再次运行会从没算过的记录继续"""
+        rows = (
+            Music.objects.filter(fingerprint__isnull=True, file_path__isnull=False)
+            .exclude(file_available=False)
+            .order_by('id').only('id', 'file_path', 'resolved_path')
+        )
+        pending = deque()
+
+        def paths():
+            last = 0
+            while True:
+                chunk = list(rows.filter(id__gt=last)[:batch_size])
+                if not chunk:
+                    return
+                last = chunk[-1].id
+                for music in chunk:
+                    pending.append(music)
+                    yield music.resolved_path or music.file_path
+
+        filled = 0
+        started = time.monotonic()
+        results = iter_extracted(paths(), workers, fingerprint_task)
+        while True:
+            chunk = list(islice(results, batch_size))
+            if not chunk:
+                break
+            updated = []
+            for _, fingerprint in chunk:
+                music = pending.popleft()
+                if fingerprint:
+                    music.fingerprint = fingerprint
+                    updated.append(music)
+            with transaction.atomic():
+                Music.objects.bulk_update(updated, ['fingerprint'])
+            filled += len(updated)
+            elapsed = time.monotonic() - started
+            self.stdout.write(f'  fingerprinted {filled} rows ({filled / elapsed if elapsed else 0:.0f} rows/s)')
+
+    def verify(self, groups, workers):
+        """快速指纹相同的记录按完整哈希再分组，只保留真正相同的"""
+        paths = sorted({music.resolved_path or music.file_path for group in groups for music in group})
+        hashes = dict(iter_extracted(paths, workers, full_hash_task))
+        verified = []
+        for group in groups:
+            by_hash = {}
+            for music in group:
+                digest = hashes.get(music.resolved_path or music.file_path)
+                if digest:
+                    by_hash.setdefault(digest, []).append(music)
+            verified.extend(g for g in by_hash.values() if len(g) > 1)
+        return verified
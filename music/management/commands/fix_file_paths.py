@@ -1,102 +1,109 @@
 from django.core.management.base import BaseCommand
 from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+from music.catalog import bump_catalog_version
 from music.models import Music
-import os
+from music.pathfix import AMBIGUOUS, EXISTS, FIXED, MediaIndex, resolve
+from music.utils import invalidate_music_file_path, resolve_file_path
+import time
 
 class Command(BaseCommand):
-    help = 'Preview or fix Music.file_path values by resolving them against MEDIA_ROOT and common Windows path issues.'
+    help = (
+        'Preview or fix Music.file_path values by resolving them against an in-memory index of the media roots '
+        '(MEDIA_ROOT plus --root) and common Windows path issues.'
+    )
 
     def add_arguments(self, parser):
         parser.add_argument('--apply', action='store_true', help='Apply fixes to the database (default is dry-run).')
         parser.add_argument('--limit', type=int, default=0, help='Limit number of records to process (0 = all).')
+        parser.add_argument('--batch-size', type=int, default=1000, help='Rows read per query and fixes written per bulk update.')
+        parser.add_argument('--root', action='append', default=[], help='Additional media root to index (repeatable).')
 
     def handle(self, *args, **options):
         apply_changes = options['apply']
         limit = options['limit']
+        batch_size = max(options['batch_size'], 1)
+        verbose = options['verbosity'] >= 2
 
-        medias = Music.objects.all().order_by('id')
+        media_root = getattr(settings, 'MEDIA_ROOT', '') or ''
+        started = time.monotonic()
+        index = MediaIndex([media_root] + options['root'])
+        self.stdout.write(
+            f'Indexed {index.files} files under {len(index.roots)} root(s) in {time.monotonic() - started:.1f}s'
+        )
+
+        medias = Music.objects.order_by('id').only('id', 'file_path', *Music.FILE_FACT_FIELDS)
         if limit > 0:
             medias = medias[:limit]
 
         total = 0
+        fixable = 0
         fixed = 0
         unchanged = 0
+        ambiguous = 0
         not_found = 0
-        candidates = []
+        pending = []
+        started = time.monotonic()
 
-        media_root = getattr(settings, 'MEDIA_ROOT', '') or ''
+        def flush():
+            nonlocal fixed
+            if pending:
+                with transaction.atomic():
+                    Music.objects.bulk_update(pending, ['file_path', *Music.FILE_FACT_FIELDS])
+                fixed += len(pending)
+            pending.clear()
 
-        for m in medias:
+        for m in medias.iterator(chunk_size=batch_size):
             total += 1
             original = m.file_path or ''
-            resolved = None
 
             if not original:
                 not_found += 1
                 self.stdout.write(f"#{m.id}: empty file_path")
-                continue
-
-            # If path exists as-is, keep
-            if os.path.exists(original):
-                unchanged += 1
-                self.stdout.write(f"#{m.id}: OK (exists): {original}")
-                continue
-
-            # Try as relative to MEDIA_ROOT
-            if media_root:
-                candidate = os.path.join(media_root, original)
-                if os.path.exists(candidate):
-                    resolved = os.path.abspath(candidate)
-
-            # Try basename in MEDIA_ROOT
-            if not resolved and media_root:
-                basename = os.path.basename(original)
-                candidate = os.path.join(media_root, basename)
-                if os.path.exists(candidate):
-                    resolved = os.path.abspath(candidate)
-
-            # Try fixing Windows/Unix mixed formats
-            if not resolved:
-                path = original
-                # replace forward/back slashes
-                alt = path.replace('\\', '/')
-                if alt.startswith('/') and ':' in alt:
-                    # e.g. /D:/music/xxx -> D:/music/xxx
-                    if len(alt) >= 3:
-                        drive = alt[1:3]
-                        rest = alt[3:]
-                        candidate = f"{drive}{rest}"
-                        if os.path.exists(candidate):
-                            resolved = os.path.abspath(candidate)
-                # try swapping slashes
-                if not resolved:
-                    candidate = path.replace('/', os.sep).replace('\\', os.sep)
-                    if os.path.exists(candidate):
-                        resolved = os.path.abspath(candidate)
+            else:
+                status, result = resolve(original, index, media_root)
+                if status == EXISTS:
+                    unchanged += 1
+                    if verbose:
+                        self.stdout.write(f"#{m.id}: OK (exists): {original}")
+                elif status == FIXED:
+                    fixable += 1
+                    self.stdout.write(f"#{m.id}: will fix -> {result}")
+                    if apply_changes:
+                        m.file_path = result
+                        # 新路径的文件信息一起写入，列表页不必等下一次校验
+                        m.set_file_facts(resolve_file_path(result), timezone.now())
+                        pending.append(m)
+                elif status == AMBIGUOUS:
+                    ambiguous += 1
+                    self.stdout.write(f"#{m.id}: AMBIGUOUS ({len(result)} candidates): {original}")
+                    for candidate in result[:5]:
+                        self.stdout.write(f"    {candidate}")
+                else:
+                    not_found += 1
+                    self.stdout.write(f"#{m.id}: NOT FOUND (tried media roots and common fixes): {original}")
 
-            # Last resort: try common root drives
-            if not resolved and os.name == 'nt' and ':' not in original:
-                for drive in ['D:', 'C:']:
-                    candidate = os.path.join(drive + os.sep, original.lstrip('\\/'))
-                    if os.path.exists(candidate):
-                        resolved = os.path.abspath(candidate)
-                        break
+            if len(pending) >= batch_size:
+                flush()
+            if total % batch_size == 0:
+                elapsed = time.monotonic() - started
+                self.stdout.write(f'  scanned {total} rows ({total / elapsed if elapsed else 0:.0f} rows/s)')
+        flush()
 
-            if resolved:
-                candidates.append((m.id, original, resolved))
-                self.stdout.write(f"#{m.id}: will fix -> {resolved}")
-                if apply_changes:
-                    m.file_path = resolved
-                    m.save()
-                    fixed += 1
-            else:
-                not_found += 1
-                self.stdout.write(f"#{m.id}: NOT FOUND (tried MEDIA_ROOT and common fixes): {original}")
+        if apply_changes and fixed:
+            # 路径已修改，丢弃进程内的路径解析缓存；bulk_update 不触发信号，手动更新曲库版本号
+            invalidate_music_file_path()
+            bump_catalog_version()
 
+        elapsed = time.monotonic() - started
         # Summary
         self.stdout.write('\nSummary:')
         self.stdout.write(f'  Total scanned: {total}')
         self.stdout.write(f'  Unchanged (exists): {unchanged}')
+        self.stdout.write(f'  Fixable: {fixable}')
         self.stdout.write(f'  Fixed (applied): {fixed}')
+        self.stdout.write(f'  Ambiguous (not fixed): {ambiguous}')
         self.stdout.write(f'  Not found / empty: {not_found}')
+        self.stdout.write(f'  Elapsed: {elapsed:.1f}s ({total / elapsed if elapsed else 0:.0f} rows/s)')
         self.stdout.write('\nRun with `--apply` to persist fixes (or `--limit N` to restrict).')
@@ -0,0 +1,44 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.conf import settings
+from music.importer import import_folder, DEFAULT_BATCH_SIZE
+import os
+
+class Command(BaseCommand):
+    help = 'Import audio files from a folder: parse tags in a process pool and insert Music rows in batched transactions.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('folder', nargs='?', default='', help='Music folder to import (default: MEDIA_ROOT).')
+        parser.add_argument('--workers', type=int, default=os.cpu_count() or 1, help='Tag extraction processes (1 = no process pool).')
+        parser.add_argument('--batch-size', type=int, default=DEFAULT_BATCH_SIZE, help='Rows written per bulk_create / transaction.')
+        parser.add_argument('--full', action='store_true', help='Re-parse every file instead of only files that are new or changed since the last scan.')
+
+    def handle(self, *args, **options):
+        folder = options['folder'] or getattr(settings, 'MEDIA_ROOT', '') or ''
+        if not folder or not os.path.isdir(folder):
+            raise CommandError(f'Music folder does not exist: {folder}')
+
+        self.stdout.write(f"Importing {folder} with {options['workers']} workers, batch size {options['batch_size']}")
+
+        def progress(stats):
+            self.stdout.write(
+                f'  processed {stats.processed} files, imported {stats.imported}, '
+                f'skipped {stats.skipped} ({stats.rate:.1f} files/s)'
+            )
+
+        stats = import_folder(
+            folder,
+            workers=options['workers'],
+            batch_size=options['batch_size'],
+            progress=progress,
+            incremental=not options['full'],
+        )
+
+        self.stdout.write('\nSummary:')
+        self.stdout.write(f'  Total files: {stats.total}')
+        self.stdout.write(f'  Imported: {stats.imported}')
+        self.stdout.write(f'  Updated (changed files): {stats.updated}')
+        self.stdout.write(f'  Unchanged (not parsed): {stats.unchanged}')
+        self.stdout.write(f'  Missing (marked unavailable): {stats.missing}')
+        self.stdout.write(f'  Skipped: {stats.skipped}')
+        self.stdout.write(f'  Failed: {stats.failed}')
+        self.stdout.write(f'  Elapsed: {stats.elapsed:.1f}s ({stats.rate:.1f} files/s)')
@@ -0,0 +1,26 @@
+from django.core.management.base import BaseCommand
+from music.models import SearchTerm
+from music.search import DEFAULT_INDEX_BATCH_SIZE, rebuild_index
+import time
+
+
+class Command(BaseCommand):
+    help = 'Rebuild the search index (n-gram / word terms for name, singer and album) for every Music row.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=DEFAULT_INDEX_BATCH_SIZE, help='Music rows indexed per transaction.')
+
+    def handle(self, *args, **options):
+        batch_size = max(options['batch_size'], 1)
+        started = time.monotonic()
+
+        def progress(total):
+            elapsed = time.monotonic() - started
+            self.stdout.write(f'  indexed {total} rows ({total / elapsed if elapsed else 0:.0f} rows/s)')
+
+        total = rebuild_index(batch_size, progress)
+
+        self.stdout.write('\nSummary:')
+        self.stdout.write(f'  Indexed rows: {total}')
+        self.stdout.write(f'  Terms: {SearchTerm.objects.count()}')
+        self.stdout.write(f'  Elapsed: {time.monotonic() - started:.1f}s')
@@ -0,0 +1,81 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test.utils import setup_test_environment, teardown_test_environment
+from music.benchmark import BENCHMARKS, compare_results, run_suite
+import json
+import os
+import shutil
+import tempfile
+
+
+class Command(BaseCommand):
+    help = (
+        'Run the performance benchmark suite on a synthetic library in a throw-away SQLite test database '
+        '(music_list latency, play_music throughput/memory, import rate, fix_file_paths scan rate). '
+        'Results are written as JSON and can be compared against a baseline to fail on regressions. '
+        'Example: python manage.py run_benchmarks --settings=music_platform.settings_benchmark'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--tracks', type=int, default=10000, help='Music rows in the synthetic library.')
+        parser.add_argument('--files', type=int, default=20, help='Real audio files on disk the rows point to.')
+        parser.add_argument('--file-size', type=int, default=2 * 1048576, help='Size of each audio file in bytes.')
+        parser.add_argument('--import-files', type=int, default=500, help='Files generated for the import benchmark.')
+        parser.add_argument('--repeat', type=int, default=20, help='Repetitions per latency / throughput measurement.')
+        parser.add_argument('--seed', type=int, default=0, help='Random seed for the generator and range offsets.')
+        parser.add_argument('--only', nargs='+', choices=BENCHMARKS, help='Run only these benchmarks.')
+        parser.add_argument('--output', default='benchmark.json', help='Where to write the JSON results.')
+        parser.add_argument('--baseline', default='', help='Previous JSON results to compare against.')
+        parser.add_argument('--tolerance', type=float, default=0.25, help='Allowed relative regression before failing (0.25 = 25%%).')
+        parser.add_argument('--workdir', default='', help='Directory for generated files (default: a temporary directory, removed afterwards).')
+
+    def handle(self, *args, **options):
+        if connection.vendor != 'sqlite':
+            raise CommandError(
+                'The benchmark suite runs on SQLite; use --settings=music_platform.settings_benchmark'
+            )
+
+        baseline = None
+        if options['baseline']:
+            with open(options['baseline'], encoding='utf-8') as fh:
+                baseline = json.load(fh)
+
+        workdir = options['workdir'] or tempfile.mkdtemp(prefix='music-bench-')
+        os.makedirs(workdir, exist_ok=True)
+
+        # 在独立的测试数据库里运行，不影响现有数据
+        setup_test_environment()
+        old_name = connection.creation.create_test_db(verbosity=0, autoclobber=True)
+        try:
+            report = run_suite(
+                workdir,
+                tracks=options['tracks'],
+                files=max(options['files'], 1),
+                file_size=options['file_size'],
+                import_files=options['import_files'],
+                repeat=max(options['repeat'], 1),
+                seed=options['seed'],
+                only=options['only'],
+                stdout=self.stdout,
+            )
+        finally:
+            connection.creation.destroy_test_db(old_name, verbosity=0)
+            teardown_test_environment()
+            if not options['workdir']:
+                shutil.rmtree(workdir, ignore_errors=True)
+
+        with open(options['output'], 'w', encoding='utf-8') as fh:
+            json.dump(report, fh, ensure_ascii=False, indent=2)
+
+        self.stdout.write('\nResults:')
+        for name, metric in report['results'].items():
+            self.stdout.write(f"  {name:<42} {metric['value']:>12.3f} {metric['unit']}")
+        self.stdout.write(f"\nWritten to {options['output']}")
+
+        if baseline is not None:
+            regressions = compare_results(report, baseline, options['tolerance'])
+            if regressions:
+                for name, base, current, change in regressions:
+                    self.stderr.write(f'  REGRESSION {name}: {base} -> {current} ({change:+.0%})')
+                raise CommandError(f'{len(regressions)} metric(s) regressed by more than {options["tolerance"]:.0%}')
+            self.stdout.write(f"No regressions against {options['baseline']} (tolerance {options['tolerance']:.0%})")
@@ -0,0 +1,221 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.core.wsgi import get_wsgi_application
+from django.urls import reverse
+from music.models import Music
+from music.streaming import StreamingASGIHandler, get_chunk_size
+from wsgiref.util import setup_testing_defaults
+import asyncio
+import os
+import tempfile
+import threading
+import time
+import tracemalloc
+
+
+def _current_rss():
+    """当前进程常驻内存（字节），仅 Linux 可用，其它平台返回 0"""
+    try:
+        with open('/proc/self/status') as fh:
+            for line in fh:
+                if line.startswith('VmRSS:'):
+                    return int(line.split()[1]) * 1024
+    except OSError:
+        pass
+    return 0
+
+
+class _Sampler:
+    """后台线程定期采样线程数和 RSS，记录峰值"""
+
+    def __init__(self, interval=0.05):
+        self.interval = interval
+        self.peak_threads = 0
+        self.peak_rss = 0
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    def _run(self):
+        while not self._stop.is_set():
+            self.peak_threads = max(self.peak_threads, threading.active_count())
+            self.peak_rss = max(self.peak_rss, _current_rss())
+            self._stop.wait(self.interval)
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._stop.set()
+        self._thread.join()
+
+
+class Command(BaseCommand):
+    help = (
+        'Local load test for the audio endpoint: simulate many concurrent slow clients and '
+        'compare the sync (thread per connection, WSGI) and async (ASGI) streaming views '
+        'on peak thread count and memory.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--clients', type=int, default=200, help='Number of concurrent simulated clients.')
+        parser.add_argument('--chunks', type=int, default=20, help='Chunks each client downloads (Range request of chunks * chunk size).')
+        parser.add_argument('--delay', type=float, default=0.1, help='Seconds each client waits between chunks (simulated slow network).')
+        parser.add_argument('--mode', choices=['sync', 'async', 'both'], default='both', help='Which streaming mode to run.')
+        parser.add_argument('--music-id', type=int, default=0, help='Existing Music id to stream (default: create a temporary track).')
+        parser.add_argument('--host', default='localhost', help='Host header sent with each request (must be in ALLOWED_HOSTS).')
+
+    def handle(self, *args, **options):
+        chunk_size = get_chunk_size()
+        self.clients = options['clients']
+        self.delay = options['delay']
+        self.host = options['host']
+        self.range_header = f"bytes=0-{options['chunks'] * chunk_size - 1}"
+
+        temp_music = None
+        temp_file = None
+        if options['music_id']:
+            try:
+                music = Music.objects.get(id=options['music_id'])
+            except Music.DoesNotExist:
+                raise CommandError(f"Music #{options['music_id']} does not exist")
+        else:
+            # 临时生成一个足够大的测试文件
+            fd, temp_file = tempfile.mkstemp(suffix='.mp3')
+            with os.fdopen(fd, 'wb') as fh:
+                fh.write(os.urandom(chunk_size) * options['chunks'])
+            music = temp_music = Music.objects.create(
+                name='stream_loadtest', singer='stream_loadtest', file_path=temp_file
+            )
+
+        modes = ['sync', 'async'] if options['mode'] == 'both' else [options['mode']]
+        results = []
+        try:
+            for mode in modes:
+                if mode == 'sync':
+                    path = reverse('play_music', args=[music.id])
+                    results.append(self._measure(mode, self._run_sync, path))
+                else:
+                    path = reverse('play_music_async', args=[music.id])
+                    results.append(self._measure(mode, self._run_async, path))
+        finally:
+            if temp_music is not None:
+                temp_music.delete()
+            if temp_file:
+                os.remove(temp_file)
+
+        self.stdout.write(
+            f'\nclients={self.clients} range={self.range_header} delay={self.delay}s chunk={chunk_size}B'
+        )
+        self.stdout.write(f"{'mode':<6} {'ok':>5} {'MB sent':>9} {'seconds':>8} {'peak threads':>13} {'py peak MB':>11} {'rss peak MB':>12}")
+        for r in results:
+            self.stdout.write(
+                f"{r['mode']:<6} {r['ok']:>5} {r['bytes'] / 1048576:>9.1f} {r['elapsed']:>8.2f} "
+                f"{r['peak_threads']:>13} {r['py_peak'] / 1048576:>11.1f} {r['rss_peak'] / 1048576:>12.1f}"
+            )
+
+    def _measure(self, mode, runner, path):
+        self.stdout.write(f'Running {mode} mode with {self.clients} clients ...')
+        tracemalloc.start()
+        started = time.perf_counter()
+        try:
+            with _Sampler() as sampler:
+                ok, sent = runner(path)
+            _, py_peak = tracemalloc.get_traced_memory()
+        finally:
+            tracemalloc.stop()
+        return {
+            'mode': mode,
+            'ok': ok,
+            'bytes': sent,
+            'elapsed': time.perf_counter() - started,
+            'peak_threads': sampler.peak_threads,
+            'py_peak': py_peak,
+            'rss_peak': sampler.peak_rss,
+        }
+
+    def _run_sync(self, path):
+        """模拟多线程 WSGI 服务器：每个连接一个线程，按慢速客户端的节奏消费响应"""
+        application = get_wsgi_application()
+        stats = {'ok': 0, 'bytes': 0}
+        lock = threading.Lock()
+
+        def client():
+            environ = {
+                'REQUEST_METHOD': 'GET',
+                'PATH_INFO': path,
+                'HTTP_HOST': self.host,
+                'HTTP_RANGE': self.range_header,
+            }
+            setup_testing_defaults(environ)
+            status_holder = []
+            result = application(environ, lambda status, headers: status_holder.append(status))
+            sent = 0
+            try:
+                for chunk in result:
+                    sent += len(chunk)
+                    time.sleep(self.delay)
+            finally:
+                result.close()
+            with lock:
+                stats['bytes'] += sent
+                if status_holder and status_holder[0].startswith('206'):
+                    stats['ok'] += 1
+
+        threads = [threading.Thread(target=client) for _ in range(self.clients)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        return stats['ok'], stats['bytes']
+
+    def _run_async(self, path):
+        """直接驱动 ASGI 应用：每个连接一个协程，send 中的等待模拟慢速客户端"""
+        application = StreamingASGIHandler()
+        stats = {'ok': 0, 'bytes': 0}
+
+        async def client(index):
+            scope = {
+                'type': 'http',
+                'asgi': {'version': '3.0'},
+                'http_version': '1.1',
+                'method': 'GET',
+                'scheme': 'http',
+                'path': path,
+                'raw_path': path.encode(),
+                'root_path': '',
+                'query_string': b'',
+                'headers': [(b'host', self.host.encode()), (b'range', self.range_header.encode())],
+                'client': ('127.0.0.1', 10000 + index),
+                'server': (self.host, 80),
+            }
+            disconnected = asyncio.Event()
+            request_sent = False
+
+            async def receive():
+                nonlocal request_sent
+                if not request_sent:
+                    request_sent = True
+                    return {'type': 'http.request', 'body': b'', 'more_body': False}
+                await disconnected.wait()
+                return {'type': 'http.disconnect'}
+
+            async def send(message):
+                if message['type'] == 'http.response.start':
+                    if message['status'] == 206:
+                        stats['ok'] += 1
+                elif message['type'] == 'http.response.body':
+                    body = message.get('body', b'')
+                    if body:
+                        stats['bytes'] += len(body)
+                        await asyncio.sleep(self.delay)
+
+            try:
+                await application(scope, receive, send)
+            finally:
+                disconnected.set()
+
+        async def main():
+            await asyncio.gather(*(client(i) for i in range(self.clients)))
+
+        asyncio.run(main())
+        return stats['ok'], stats['bytes']
@@ -0,0 +1,85 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.conf import settings
+from django.db import close_old_connections
+from music.importer import DEFAULT_BATCH_SIZE
+from music.sync import LibrarySync
+from music.watcher import DIR, InotifyWatcher, make_watcher
+import os
+import time
+
+class Command(BaseCommand):
+    help = (
+        'Keep Music rows in sync with the media folders: watch them (inotify, or periodic rescans as a fallback), '
+        'debounce bursts of changes and apply inserts, moves and deletions in batched transactions.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('folders', nargs='*', help='Folders to watch (default: MEDIA_ROOT).')
+        parser.add_argument('--debounce', type=float, default=1.0, help='Seconds without new events before a burst is applied.')
+        parser.add_argument('--max-delay', type=float, default=10.0, help='Apply a continuous burst at least this often (seconds).')
+        parser.add_argument('--polling', action='store_true', help='Rescan periodically instead of using inotify.')
+        parser.add_argument('--poll-interval', type=float, default=10.0, help='Seconds between rescans in polling mode.')
+        parser.add_argument('--batch-size', type=int, default=DEFAULT_BATCH_SIZE, help='Paths applied per transaction.')
+        parser.add_argument('--workers', type=int, default=1, help='Tag extraction processes for large bursts (1 = no process pool).')
+        parser.add_argument('--keep-missing', action='store_true', help='Mark rows of deleted files unavailable instead of deleting them.')
+        parser.add_argument('--skip-initial', action='store_true', help='Do not reconcile the whole folders before watching.')
+        parser.add_argument('--once', action='store_true', help='Reconcile the folders once and exit.')
+
+    def handle(self, *args, **options):
+        folders = [os.path.abspath(f) for f in options['folders'] or [getattr(settings, 'MEDIA_ROOT', '') or '']]
+        for folder in folders:
+            if not folder or not os.path.isdir(folder):
+                raise CommandError(f'Music folder does not exist: {folder}')
+
+        syncer = LibrarySync(
+            batch_size=options['batch_size'],
+            workers=options['workers'],
+            delete_missing=not options['keep_missing'],
+        )
+
+        if not options['skip_initial'] or options['once']:
+            self.apply(syncer, folders, set(), set(folders))
+        if options['once']:
+            return
+
+        watcher = make_watcher(folders, options['polling'], options['poll_interval'])
+        mode = 'inotify' if isinstance(watcher, InotifyWatcher) else f'polling every {options["poll_interval"]}s'
+        self.stdout.write(f'Watching {", ".join(folders)} ({mode})')
+        try:
+            while True:
+                files, dirs = self.collect(watcher, options['debounce'], options['max_delay'])
+                # 两批变化之间可能隔了很久，数据库连接可能已经被服务器断开
+                close_old_connections()
+                self.apply(syncer, folders, files, dirs)
+        except KeyboardInterrupt:
+            pass
+        finally:
+            watcher.close()
+
+    def collect(self, watcher, debounce, max_delay):
+        """阻塞到第一批事件，然后继续收集，直到 debounce 秒内没有新事件或距第一批超过 max_delay 秒"""
+        files, dirs = set(), set()
+        events = []
+        while not events:
+            events = watcher.read()
+        first = time.monotonic()
+        while events:
+            for kind, path in events:
+                (dirs if kind == DIR else files).add(path)
+            remaining = first + max_delay - time.monotonic()
+            if remaining <= 0:
+                break
+            events = watcher.read(min(debounce, remaining))
+        return files, dirs
+
+    def apply(self, syncer, folders, files, dirs):
+        # 媒体目录整个不见了（NAS 掉线、未挂载），不能当成文件都被删除
+        if any(not os.path.isdir(folder) for folder in folders):
+            self.stderr.write('A media folder is unavailable, skipping this batch.')
+            return
+        # 目录下的文件会随目录一起对比
+        files = {f for f in files if not any(f.startswith(os.path.join(d, '')) for d in dirs)}
+        started = time.monotonic()
+        stats = syncer.sync(files, dirs)
+        if stats.changed or stats.skipped or stats.unreadable:
+            self.stdout.write(f'Synced {len(files)} files / {len(dirs)} folders in {time.monotonic() - started:.2f}s: {stats}')
@@ -0,0 +1,88 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import F, Q
+from django.utils import timezone
+from music.catalog import bump_catalog_version
+from music.models import Music
+from music.utils import resolve_file_path
+from datetime import timedelta
+import time
+
+class Command(BaseCommand):
+    help = (
+        'Re-verify the stored file facts (resolved path, size, mtime, existence) of Music rows '
+        'incrementally in batches, least recently verified first.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=500, help='Rows verified and written per batch.')
+        parser.add_argument('--max-age', type=float, default=24, help='Only re-verify rows last verified more than this many hours ago (0 = all).')
+        parser.add_argument('--limit', type=int, default=0, help='Maximum rows to verify per pass (0 = no limit).')
+        parser.add_argument('--interval', type=float, default=0, help='Keep running in the background, starting a new pass every N seconds (0 = single pass).')
+
+    def handle(self, *args, **options):
+        while True:
+            self.verify_pass(options)
+            if options['interval'] <= 0:
+                break
+            time.sleep(options['interval'])
+
+    def verify_pass(self, options):
+        batch_size = max(options['batch_size'], 1)
+        limit = options['limit']
+
+        # 从未校验过的记录排在最前面，其余按上次校验时间从旧到新；
+        # 本轮校验过的记录 verified_at 会晚于 cutoff，不会被重复处理
+        cutoff = timezone.now() - timedelta(hours=max(options['max_age'], 0))
+        rows = (
+            Music.objects
+            .filter(Q(verified_at__isnull=True) | Q(verified_at__lt=cutoff))
+            .order_by(F('verified_at').asc(nulls_first=True), 'id')
+            .only('id', 'file_path', 'fingerprint', 'cover', *Music.FILE_FACT_FIELDS)
+        )
+
+        total = 0
+        available = 0
+        missing = 0
+        changed = 0
+        started = time.monotonic()
+
+        while not limit or total < limit:
+            size = batch_size if not limit else min(batch_size, limit - total)
+            # 每批处理后 verified_at 会被更新，不再满足筛选条件，所以始终取前 size 条即可
+            batch = list(rows[:size])
+            if not batch:
+                break
+
+            verified_at = timezone.now()
+            changed_before = changed
+            for m in batch:
+                before = (m.resolved_path, m.size_bytes, m.file_mtime, m.file_available)
+                resolved = resolve_file_path(m.file_path) if m.file_path else None
+                m.set_file_facts(resolved, verified_at)
+                if before != (m.resolved_path, m.size_bytes, m.file_mtime, m.file_available):
+                    changed += 1
+                    if before[1:3] != (m.size_bytes, m.file_mtime):
+                        # 文件内容可能变了，指纹由 find_duplicates 命令重新计算，封面在下次请求时重新提取
+                        m.fingerprint = None
+                        m.cover = None
+                if resolved:
+                    available += 1
+                else:
+                    missing += 1
+
+            with transaction.atomic():
+                Music.objects.bulk_update(batch, [*Music.FILE_FACT_FIELDS, 'fingerprint', 'cover'])
+            if changed > changed_before:
+                # 文件状态有变化，曲库接口的输出随之变化
+                bump_catalog_version()
+
+            total += len(batch)
+            elapsed = time.monotonic() - started
+            self.stdout.write(f'  verified {total} rows ({total / elapsed if elapsed else 0:.0f} rows/s)')
+
+        self.stdout.write('\nSummary:')
+        self.stdout.write(f'  Verified: {total}')
+        self.stdout.write(f'  Available: {available}')
+        self.stdout.write(f'  Missing / empty: {missing}')
+        self.stdout.write(f'  Changed: {changed}')
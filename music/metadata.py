@@ -0,0 +1,153 @@
+# music/metadata.py
+# 注意：这个模块会在导入进程池的子进程中执行，不要在这里导入 Django 模型
+import os
+from mutagen import File
+from mutagen.id3 import ID3, TIT2, TPE1, TALB
+from .fingerprint import quick_fingerprint
+
+
+# 标签类名 -> tag_source（EasyID3 / EasyMP4Tags 是 easy=True 时的包装类）
+_TAG_SOURCES = {
+    'ID3': 'id3', 'EasyID3': 'id3',
+    'MP4Tags': 'mp4', 'EasyMP4Tags': 'mp4',
+    'VCommentDict': 'vorbis', 'VCFLACDict': 'vorbis', 'OggVCommentDict': 'vorbis',
+    'OggOpusVComment': 'vorbis', 'OggFLACVComment': 'vorbis', 'OggSpeexVComment': 'vorbis',
+    'APEv2': 'ape', 'ASFTags': 'asf',
+}
+# 文件类型类名 -> codec（MP4 按 info.codec 区分 AAC / ALAC）
+_CODECS = {
+    'MP3': 'mp3', 'EasyMP3': 'mp3', 'FLAC': 'flac', 'OggVorbis': 'vorbis', 'OggOpus': 'opus',
+    'OggFLAC': 'flac', 'WAVE': 'pcm', 'AIFF': 'pcm', 'ASF': 'wma', 'AAC': 'aac', 'MonkeysAudio': 'ape',
+    'WavPack': 'wavpack', 'TrueAudio': 'tta',
+}
+
+
+def get_audio_info(audio):
+    """
+    从 mutagen 对象读取音频信息：{'duration', 'bitrate', 'sample_rate', 'codec', 'tag_source'}
+    时长单位秒，码率单位 bps；没有标签时 tag_source 为 'filename'（歌曲名从文件名得到）
+    """
+    info = audio.info
+    kind = type(audio).__name__
+    codec = _CODECS.get(kind, kind.lower())
+    if kind in ('MP4', 'EasyMP4'):
+        codec = getattr(info, 'codec', '') or 'mp4'
+        codec = 'aac' if codec.startswith('mp4a') else codec
+    elif codec == 'mp3' and getattr(info, 'layer', 3) != 3:
+        codec = f'mp{info.layer}'
+    tags = audio.tags
+    return {
+        'duration': round(info.length, 3) if getattr(info, 'length', None) else None,
+        'bitrate': getattr(info, 'bitrate', None) or None,
+        'sample_rate': getattr(info, 'sample_rate', None) or None,
+        'codec': codec[:20],
+        'tag_source': _TAG_SOURCES.get(type(tags).__name__, type(tags).__name__.lower()) if tags else 'filename',
+    }
+
+
+def read_audio_info(file_path):
+    """只读取音频信息（不解析标签内容），无法解析时返回 None"""
+    try:
+        audio = File(file_path)
+        return get_audio_info(audio) if audio else None
+    except Exception:
+        return None
+
+
+def read_track_info(file_path):
+    """进程池中执行的任务（backfill_audio_info 命令）：返回 (file_path, 音频信息或 None)"""
+    return file_path, read_audio_info(file_path)
+
+
+def get_music_metadata(file_path, with_audio=False):
+    """
+    解析歌曲名、歌手、专辑标签
+    with_audio=True 时在同一次打开文件时顺便读取音频信息，放在返回值的 'audio' 键中（无法解析时为 None）
+    """
+    audio_info = None
+    try:
+        audio = File(file_path, easy=True)
+        if audio:
+            audio_info = get_audio_info(audio)
+        else:
+            audio = ID3(file_path)
+
+        metadata = {
+            'name': os.path.splitext(os.path.basename(file_path))[0],
+            'singer': '未知歌手',
+            'album': '未知专辑'
+        }
+
+        if isinstance(audio, ID3):
+            if TIT2 in audio:
+                metadata['name'] = audio[TIT2].text[0]
+            if TPE1 in audio:
+                metadata['singer'] = audio[TPE1].text[0]
+            if TALB in audio:
+                metadata['album'] = audio[TALB].text[0]
+        elif audio:
+            if 'title' in audio:
+                metadata['name'] = audio['title'][0]
+            if 'artist' in audio:
+                metadata['singer'] = audio['artist'][0]
+            if 'album' in audio:
+                metadata['album'] = audio['album'][0]
+
+        for key in metadata:
+            metadata[key] = metadata[key].strip().replace('/', '-').replace('\\', '-')
+
+    except Exception as e:
+        print(f"解析文件 {file_path} 元数据失败：{str(e)}")
+        metadata = {
+            'name': os.path.splitext(os.path.basename(file_path))[0],
+            'singer': '未知歌手',
+            'album': '未知专辑'
+        }
+    if with_audio:
+        metadata['audio'] = audio_info
+    return metadata
+
+
+def extract_track(file_path):
+    """
+    导入进程池中执行的任务：解析标签和音频信息，计算内容指纹，并顺便读取文件大小和修改时间
+    返回 (file_path, metadata, size, mtime)，文件无法访问时 size/mtime 为 None
+    """
+    metadata = get_music_metadata(file_path, with_audio=True)
+    metadata['fingerprint'] = quick_fingerprint(file_path)
+    try:
+        st = os.stat(file_path)
+        size, mtime = st.st_size, st.st_mtime
+    except OSError:
+        size = mtime = None
+    return file_path, metadata, size, mtime
+
+
+def parse_filename(file_path):
+    """按“歌手-歌曲名.扩展名”的命名规则解析文件名（不读取文件内容）"""
+    name_without_ext = os.path.splitext(os.path.basename(file_path))[0]
+    name_parts = name_without_ext.split('-', 1)
+
+    if len(name_parts) == 2:
+        singer = name_parts[0].strip()
+        name = name_parts[1].strip()
+    else:
+        singer = '未知歌手'
+        name = name_without_ext.strip()
+
+    return {'name': name, 'singer': singer, 'album': '未知专辑'}
+
+
+def extract_track_from_filename(file_path):
+    """与 extract_track 相同，但只从文件名解析歌手和歌曲名（网页导入使用），音频信息仍从文件读取"""
+    metadata = parse_filename(file_path)
+    metadata['audio'] = read_audio_info(file_path)
+    if metadata['audio']:
+        metadata['audio']['tag_source'] = 'filename'
+    metadata['fingerprint'] = quick_fingerprint(file_path)
+    try:
+        st = os.stat(file_path)
+        size, mtime = st.st_size, st.st_mtime
+    except OSError:
+        size = mtime = None
+    return file_path, metadata, size, mtime
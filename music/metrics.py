@@ -0,0 +1,238 @@
+# music/metrics.py
+"""
+进程内的轻量指标（不依赖 prometheus_client），以 Prometheus 文本格式在 /metrics 输出
+多进程部署时每个 worker 各自统计，抓取到的是处理该次请求的进程的数据
+"""
+import threading
+import time
+from bisect import bisect_left
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.db import connection
+
+# 所有指标，按定义顺序输出
+REGISTRY = []
+
+# 延迟类直方图的默认分桶（秒）
+DEFAULT_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _format_labels(names, values, extra=''):
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return '{' + ','.join(pairs) + '}' if pairs else ''
+
+
+def _format_value(value):
+    if value == float('inf'):
+        return '+Inf'
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class _Metric:
+    kind = ''
+
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values = {}
+        self._lock = threading.Lock()
+        REGISTRY.append(self)
+
+    def render(self):
+        lines = [f'# HELP {self.name} {self.documentation}', f'# TYPE {self.name} {self.kind}']
+        with self._lock:
+            items = sorted(self._values.items())
+            lines.extend(self._render_samples(items))
+        return lines
+
+    def _render_samples(self, items):
+        return [
+            f'{self.name}{_format_labels(self.labelnames, labels)} {_format_value(value)}'
+            for labels, value in items
+        ]
+
+
+class Counter(_Metric):
+    kind = 'counter'
+
+    def inc(self, *labels, amount=1):
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0) + amount
+
+
+class Gauge(_Metric):
+    kind = 'gauge'
+
+    def inc(self, *labels, amount=1):
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0) + amount
+
+    def dec(self, *labels, amount=1):
+        self.inc(*labels, amount=-amount)
+
+    def render(self):
+        # 没有标签的 gauge 即使还没有变化过也输出 0
+        if not self.labelnames:
+            with self._lock:
+                self._values.setdefault((), 0)
+        return super().render()
+
+
+class Histogram(_Metric):
+    kind = 'histogram'
+
+    def __init__(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(buckets)
+
+    def observe(self, value, *labels):
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            entry = self._values.get(labels)
+            if entry is None:
+                # [各分桶计数（最后一个是 +Inf）, 总和, 次数]
+                entry = self._values[labels] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            entry[0][index] += 1
+            entry[1] += value
+            entry[2] += 1
+
+    def _render_samples(self, items):
+        lines = []
+        for labels, (counts, total, count) in items:
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets + (float('inf'),), counts):
+                cumulative += bucket_count
+                le = f'le="{_format_value(bound)}"'
+                lines.append(f'{self.name}_bucket{_format_labels(self.labelnames, labels, le)} {cumulative}')
+            lines.append(f'{self.name}_sum{_format_labels(self.labelnames, labels)} {total!r}')
+            lines.append(f'{self.name}_count{_format_labels(self.labelnames, labels)} {count}')
+        return lines
+
+
+REQUEST_LATENCY = Histogram(
+    'music_http_request_duration_seconds',
+    'Time spent producing the response (streamed bodies excluded), by view.',
+    ['view'],
+)
+REQUESTS = Counter('music_http_requests_total', 'HTTP requests by view and status code.', ['view', 'status'])
+DB_QUERIES = Histogram(
+    'music_db_queries_per_request',
+    'Database queries executed while producing the response, by view.',
+    ['view'],
+    buckets=(0, 1, 2, 5, 10, 20, 50, 100, 200),
+)
+DB_TIME = Histogram(
+    'music_db_time_seconds_per_request',
+    'Total database time while producing the response, by view.',
+    ['view'],
+)
+PATH_CACHE_LOOKUPS = Counter('music_path_cache_lookups_total', 'File path resolution cache lookups.', ['result'])
+PATH_RESOLUTION = Histogram(
+    'music_path_resolution_seconds',
+    'Filesystem time to resolve a Music.file_path on a cache miss.',
+    buckets=(0.0001, 0.0005, 0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1.0),
+)
+AUDIO_REQUESTS = Counter(
+    'music_audio_requests_total',
+    'Audio requests by kind (full, range, multipart, not_modified, offload).',
+    ['kind'],
+)
+AUDIO_BYTES = Counter('music_audio_bytes_served_total', 'Audio body bytes served (Content-Length), by kind.', ['kind'])
+ACTIVE_STREAMS = Gauge('music_active_streams', 'Audio response bodies currently open.')
+BLOCK_CACHE_LOOKUPS = Counter('music_block_cache_lookups_total', 'Audio block cache lookups.', ['result'])
+BLOCK_CACHE_BYTES = Gauge('music_block_cache_bytes', 'Bytes of audio data held in the block cache.')
+THROTTLED = Counter(
+    'music_throttled_requests_total',
+    'Audio requests rejected by the stream throttle, by reason (bandwidth, client_streams, streams).',
+    ['reason'],
+)
+READAHEAD_TASKS = Counter(
+    'music_readahead_tasks_total',
+    'Next-track readahead tasks by outcome (scheduled, dropped, warmed, missing, failed).',
+    ['result'],
+)
+
+
+def render_metrics():
+    lines = []
+    for metric in REGISTRY:
+        lines.extend(metric.render())
+    return '\n'.join(lines) + '\n'
+
+
+def record_audio(kind, content_length=0):
+    AUDIO_REQUESTS.inc(kind)
+    if content_length:
+        AUDIO_BYTES.inc(kind, amount=content_length)
+
+
+def track_stream(body):
+    """音频响应体打开时计入活动流，响应体 close() 时减去"""
+    ACTIVE_STREAMS.inc()
+    body.add_close_callback(_stream_closed)
+    return body
+
+
+def _stream_closed():
+    ACTIVE_STREAMS.dec()
+
+
+def _view_name(request):
+    match = getattr(request, 'resolver_match', None)
+    if match is None:
+        return 'unresolved'
+    return match.view_name or match._func_path
+
+
+class MetricsMiddleware:
+    """
+    记录每个视图的耗时和状态码，同步请求还记录数据库查询次数和耗时
+    放在 MIDDLEWARE 的最前面，耗时包含其它中间件；流式响应体的传输时间不计入
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.async_mode = iscoroutinefunction(get_response)
+        if self.async_mode:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.async_mode:
+            return self.__acall__(request)
+
+        stats = [0, 0.0]
+
+        def count_queries(execute, sql, params, many, context):
+            started = time.perf_counter()
+            try:
+                return execute(sql, params, many, context)
+            finally:
+                stats[0] += 1
+                stats[1] += time.perf_counter() - started
+
+        started = time.perf_counter()
+        with connection.execute_wrapper(count_queries):
+            response = self.get_response(request)
+        view = _view_name(request)
+        REQUEST_LATENCY.observe(time.perf_counter() - started, view)
+        REQUESTS.inc(view, str(response.status_code))
+        DB_QUERIES.observe(stats[0], view)
+        DB_TIME.observe(stats[1], view)
+        return response
+
+    async def __acall__(self, request):
+        # 异步视图中的 ORM 调用在同步线程里执行，这里只记录耗时和状态码
+        started = time.perf_counter()
+        response = await self.get_response(request)
+        view = _view_name(request)
+        REQUEST_LATENCY.observe(time.perf_counter() - started, view)
+        REQUESTS.inc(view, str(response.status_code))
+        return response
@@ -0,0 +1,38 @@
+# Generated by Django 6.0.2 on 2026-10-18 02:23
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('music', '0003_alter_music_created_at'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='music',
+            name='file_available',
+            field=models.BooleanField(blank=True, null=True, verbose_name='文件是否存在'),
+        ),
+        migrations.AddField(
+            model_name='music',
+            name='file_mtime',
+            field=models.FloatField(blank=True, null=True, verbose_name='文件修改时间'),
+        ),
+        migrations.AddField(
+            model_name='music',
+            name='resolved_path',
+            field=models.CharField(blank=True, max_length=500, null=True, verbose_name='解析后的文件路径'),
+        ),
+        migrations.AddField(
+            model_name='music',
+            name='size_bytes',
+            field=models.BigIntegerField(blank=True, null=True, verbose_name='文件大小(字节)'),
+        ),
+        migrations.AddField(
+            model_name='music',
+            name='verified_at',
+            field=models.DateTimeField(blank=True, null=True, verbose_name='上次校验时间'),
+        ),
+    ]
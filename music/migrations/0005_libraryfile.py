@@ -0,0 +1,28 @@
+# Generated by Django 6.0.2 on 2026-10-18 02:25
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('music', '0004_music_file_facts'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='LibraryFile',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('path', models.CharField(max_length=500, unique=True, verbose_name='文件路径')),
+                ('size', models.BigIntegerField(verbose_name='文件大小(字节)')),
+                ('mtime', models.FloatField(verbose_name='文件修改时间')),
+                ('scanned_at', models.DateTimeField(default=django.utils.timezone.now, verbose_name='扫描时间')),
+            ],
+            options={
+                'verbose_name': '扫描清单',
+                'verbose_name_plural': '扫描清单',
+            },
+        ),
+    ]
@@ -0,0 +1,21 @@
+# Generated by Django 6.0.2 on 2026-10-18 02:27
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('music', '0005_libraryfile'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='music',
+            index=models.Index(fields=['-created_at', '-id'], name='music_created_id_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='music',
+            index=models.Index(fields=['singer', 'name'], name='music_singer_name_idx'),
+        ),
+    ]
@@ -0,0 +1,27 @@
+# Generated by Django 6.0.2 on 2026-10-18 02:37
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('music', '0006_music_list_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SearchTerm',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('term', models.CharField(max_length=32, verbose_name='词项')),
+                ('music', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='search_terms', to='music.music', verbose_name='音乐')),
+            ],
+            options={
+                'verbose_name': '搜索索引',
+                'verbose_name_plural': '搜索索引',
+                'indexes': [models.Index(fields=['term', '-music'], name='music_search_term_idx')],
+            },
+        ),
+    ]
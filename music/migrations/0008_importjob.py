@@ -0,0 +1,40 @@
+# Generated by Django 6.0.2 on 2026-10-18 02:52
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('music', '0007_searchterm'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ImportJob',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('folder', models.CharField(max_length=500, verbose_name='导入目录')),
+                ('status', models.CharField(choices=[('pending', '排队中'), ('running', '导入中'), ('done', '已完成'), ('failed', '失败')], default='pending', max_length=10, verbose_name='状态')),
+                ('total', models.IntegerField(default=0, verbose_name='扫描到的文件数')),
+                ('processed', models.IntegerField(default=0, verbose_name='已解析')),
+                ('imported', models.IntegerField(default=0, verbose_name='新增')),
+                ('updated', models.IntegerField(default=0, verbose_name='更新')),
+                ('unchanged', models.IntegerField(default=0, verbose_name='未变化')),
+                ('missing', models.IntegerField(default=0, verbose_name='已消失')),
+                ('skipped', models.IntegerField(default=0, verbose_name='跳过')),
+                ('failed', models.IntegerField(default=0, verbose_name='失败')),
+                ('rate', models.FloatField(default=0, verbose_name='速度(文件/秒)')),
+                ('error', models.TextField(blank=True, default='', verbose_name='错误信息')),
+                ('created_at', models.DateTimeField(default=django.utils.timezone.now, verbose_name='提交时间')),
+                ('started_at', models.DateTimeField(blank=True, null=True, verbose_name='开始时间')),
+                ('finished_at', models.DateTimeField(blank=True, null=True, verbose_name='结束时间')),
+            ],
+            options={
+                'verbose_name': '导入任务',
+                'verbose_name_plural': '导入任务',
+                'ordering': ['-created_at'],
+            },
+        ),
+    ]
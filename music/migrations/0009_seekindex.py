@@ -0,0 +1,32 @@
+# Generated by Django 6.0.2 on 2026-10-18 02:56
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('music', '0008_importjob'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SeekIndex',
+            fields=[
+                ('music', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='seek_index', serialize=False, to='music.music', verbose_name='音乐')),
+                ('interval', models.FloatField(verbose_name='间隔(秒)')),
+                ('duration', models.FloatField(verbose_name='时长(秒)')),
+                ('frames', models.IntegerField(verbose_name='帧数')),
+                ('offsets', models.BinaryField(verbose_name='字节偏移')),
+                ('file_size', models.BigIntegerField(verbose_name='文件大小(字节)')),
+                ('file_mtime', models.FloatField(verbose_name='文件修改时间')),
+                ('built_at', models.DateTimeField(default=django.utils.timezone.now, verbose_name='生成时间')),
+            ],
+            options={
+                'verbose_name': '跳转表',
+                'verbose_name_plural': '跳转表',
+            },
+        ),
+    ]
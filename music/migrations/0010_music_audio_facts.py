@@ -0,0 +1,38 @@
+# Generated by Django 6.0.2 on 2026-10-18 02:58
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('music', '0009_seekindex'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='music',
+            name='bitrate',
+            field=models.IntegerField(blank=True, null=True, verbose_name='码率(bps)'),
+        ),
+        migrations.AddField(
+            model_name='music',
+            name='codec',
+            field=models.CharField(blank=True, max_length=20, null=True, verbose_name='编码格式'),
+        ),
+        migrations.AddField(
+            model_name='music',
+            name='duration',
+            field=models.FloatField(blank=True, null=True, verbose_name='时长(秒)'),
+        ),
+        migrations.AddField(
+            model_name='music',
+            name='sample_rate',
+            field=models.IntegerField(blank=True, null=True, verbose_name='采样率(Hz)'),
+        ),
+        migrations.AddField(
+            model_name='music',
+            name='tag_source',
+            field=models.CharField(blank=True, max_length=20, null=True, verbose_name='标签来源'),
+        ),
+    ]
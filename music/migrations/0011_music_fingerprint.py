@@ -0,0 +1,18 @@
+# Generated by Django 6.0.2 on 2026-10-18 03:00
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('music', '0010_music_audio_facts'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='music',
+            name='fingerprint',
+            field=models.CharField(blank=True, db_index=True, max_length=64, null=True, verbose_name='内容指纹'),
+        ),
+    ]
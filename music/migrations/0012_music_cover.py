@@ -0,0 +1,18 @@
+# Generated by Django 6.0.2 on 2026-10-18 03:02
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('music', '0011_music_fingerprint'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='music',
+            name='cover',
+            field=models.CharField(blank=True, max_length=80, null=True, verbose_name='封面缓存'),
+        ),
+    ]
@@ -0,0 +1,24 @@
+# Generated by Django 6.0.2 on 2026-10-18 03:10
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('music', '0012_music_cover'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CatalogVersion',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('version', models.BigIntegerField(verbose_name='版本号')),
+            ],
+            options={
+                'verbose_name': '曲库版本',
+                'verbose_name_plural': '曲库版本',
+            },
+        ),
+    ]
@@ -1,7 +1,6 @@
 from django.db import models
 from django.utils import timezone
-import os
-from .utils import get_music_file_path
+from .utils import get_music_file_info, resolve_file_path
 # Create your models here.
 
 class Music(models.Model):
@@ -15,22 +14,82 @@ class Music(models.Model):
         blank=True,
         verbose_name="添加时间"
     )
+    # 以下字段缓存文件系统信息，由导入流程和 verify_music_files 命令维护，
+    # 列表页直接读取这些字段，不再访问磁盘
+    resolved_path = models.CharField(max_length=500, blank=True, null=True, verbose_name="解析后的文件路径")
+    size_bytes = models.BigIntegerField(blank=True, null=True, verbose_name="文件大小(字节)")
+    file_mtime = models.FloatField(blank=True, null=True, verbose_name="文件修改时间")
+    file_available = models.BooleanField(blank=True, null=True, verbose_name="文件是否存在")
+    verified_at = models.DateTimeField(blank=True, null=True, verbose_name="上次校验时间")
+    # 以下字段是音频信息，导入时用 mutagen 读取，已有记录由 backfill_audio_info 命令补齐
+    duration = models.FloatField(blank=True, null=True, verbose_name="时长(秒)")
+    bitrate = models.IntegerField(blank=True, null=True, verbose_name="码率(bps)")
+    sample_rate = models.IntegerField(blank=True, null=True, verbose_name="采样率(Hz)")
+    codec = models.CharField(max_length=20, blank=True, null=True, verbose_name="编码格式")
+    # 歌曲名等信息的来源：id3 / vorbis / mp4 / ape / asf 等标签格式，或 filename（从文件名解析）
+    tag_source = models.CharField(max_length=20, blank=True, null=True, verbose_name="标签来源")
+    # 音频数据的快速指纹（见 music.fingerprint），用于发现复制或改过标签的重复文件
+    fingerprint = models.CharField(max_length=64, blank=True, null=True, db_index=True, verbose_name="内容指纹")
+    # 封面缓存文件名（见 music.covers）；'' 表示文件没有内嵌封面，None 表示还没有提取过
+    cover = models.CharField(max_length=80, blank=True, null=True, verbose_name="封面缓存")
+
+    # 文件信息相关字段，批量更新（bulk_update）时使用
+    FILE_FACT_FIELDS = ['resolved_path', 'size_bytes', 'file_mtime', 'file_available', 'verified_at']
+    # 音频信息字段，批量更新时使用
+    AUDIO_FACT_FIELDS = ['duration', 'bitrate', 'sample_rate', 'codec', 'tag_source']
 
     class Meta:
         verbose_name = "音乐"
         verbose_name_plural = "音乐"
         ordering = ['-created_at']
+        indexes = [
+            # 列表页按添加时间倒序（游标分页）
+            models.Index(fields=['-created_at', '-id'], name='music_created_id_idx'),
+            # 导入时按 (歌手, 歌曲名) 去重
+            models.Index(fields=['singer', 'name'], name='music_singer_name_idx'),
+        ]
 
     def __str__(self):
         return f"{self.singer} - {self.name}"
     
+    def set_file_facts(self, resolved, verified_at=None):
+        """根据解析结果（ResolvedFile 或 None）设置文件信息字段，不保存"""
+        self.resolved_path = resolved.path if resolved else None
+        self.size_bytes = resolved.size if resolved else None
+        self.file_mtime = resolved.mtime if resolved else None
+        self.file_available = resolved is not None
+        self.verified_at = verified_at or timezone.now()
+
+    def set_audio_facts(self, info):
+        """根据 metadata.get_audio_info() 的结果设置音频信息字段（None 时不修改），不保存"""
+        if info:
+            for name in self.AUDIO_FACT_FIELDS:
+                setattr(self, name, info[name])
+
+    @property
+    def duration_display(self):
+        """时长显示为 分:秒（列表页使用），未知时为空字符串"""
+        if self.duration is None:
+            return ''
+        minutes, seconds = divmod(int(round(self.duration)), 60)
+        return f"{minutes}:{seconds:02d}"
+
+    def refresh_file_facts(self):
+        """重新在文件系统上解析路径并更新文件信息字段，不保存"""
+        resolved = resolve_file_path(self.file_path) if self.file_path else None
+        self.set_file_facts(resolved)
+        return resolved
+
     @property
     def file_size(self):
         """获取文件大小(MB)"""
         try:
-            if not self.file_path:
-                return 0
-            size = os.path.getsize(self.file_path) / (1024 * 1024)
+            if self.file_available is not None:
+                size_bytes = self.size_bytes or 0
+            else:
+                resolved = get_music_file_info(self)
+                size_bytes = resolved.size if resolved else 0
+            size = size_bytes / (1024 * 1024)
             return round(size, 2)
         except Exception:
             return 0
@@ -38,8 +97,147 @@ class Music(models.Model):
     @property
     def file_exists(self):
         """返回文件是否存在（用于模板判断）"""
+        # 已经校验过的记录直接使用存储的结果
+        if self.file_available is not None:
+            return self.file_available
         try:
-            path = get_music_file_path(self)
-            return bool(path and os.path.exists(path))
+            # 解析结果已经包含存在性（并且会被缓存），不需要再 stat 一次
+            return get_music_file_info(self) is not None
         except Exception:
-            return False
\ No newline at end of file
+            return False
+
+
+class LibraryFile(models.Model):
+    """
+    媒体库扫描清单：记录上次扫描时每个音频文件的大小和修改时间
+    增量导入时只有新增或变化的文件才需要重新解析标签
+    """
+    path = models.CharField(max_length=500, unique=True, verbose_name="文件路径")
+    size = models.BigIntegerField(verbose_name="文件大小(字节)")
+    mtime = models.FloatField(verbose_name="文件修改时间")
+    scanned_at = models.DateTimeField(default=timezone.now, verbose_name="扫描时间")
+
+    class Meta:
+        verbose_name = "扫描清单"
+        verbose_name_plural = "扫描清单"
+
+    def __str__(self):
+        return self.path
+
+
+class SearchTerm(models.Model):
+    """
+    搜索用的倒排索引：每行是 (词项, 音乐)
+    中文等 CJK 文本按二元组切分，拉丁字母和数字按单词切分，由 music.search 维护
+    """
+    term = models.CharField(max_length=32, verbose_name="词项")
+    music = models.ForeignKey(Music, on_delete=models.CASCADE, related_name='search_terms', verbose_name="音乐")
+
+    class Meta:
+        verbose_name = "搜索索引"
+        verbose_name_plural = "搜索索引"
+        indexes = [
+            # 按词项精确查找和前缀范围查找；同一词项内最近添加的在前
+            models.Index(fields=['term', '-music'], name='music_search_term_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.term} -> {self.music_id}"
+
+
+class ImportJob(models.Model):
+    """
+    后台导入任务：网页导入提交后在本地线程池中执行，进度写在这里供页面轮询
+    计数含义与 importer.ImportStats 相同
+    """
+    STATUS_PENDING = 'pending'
+    STATUS_RUNNING = 'running'
+    STATUS_DONE = 'done'
+    STATUS_FAILED = 'failed'
+    STATUS_CHOICES = [
+        (STATUS_PENDING, '排队中'),
+        (STATUS_RUNNING, '导入中'),
+        (STATUS_DONE, '已完成'),
+        (STATUS_FAILED, '失败'),
+    ]
+    # 进度计数字段，与 ImportStats.as_dict() 的键一致
+    COUNTER_FIELDS = ['total', 'processed', 'imported', 'updated', 'unchanged', 'missing', 'skipped', 'failed']
+
+    folder = models.CharField(max_length=500, verbose_name="导入目录")
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default=STATUS_PENDING, verbose_name="状态")
+    total = models.IntegerField(default=0, verbose_name="扫描到的文件数")
+    processed = models.IntegerField(default=0, verbose_name="已解析")
+    imported = models.IntegerField(default=0, verbose_name="新增")
+    updated = models.IntegerField(default=0, verbose_name="更新")
+    unchanged = models.IntegerField(default=0, verbose_name="未变化")
+    missing = models.IntegerField(default=0, verbose_name="已消失")
+    skipped = models.IntegerField(default=0, verbose_name="跳过")
+    failed = models.IntegerField(default=0, verbose_name="失败")
+    rate = models.FloatField(default=0, verbose_name="速度(文件/秒)")
+    error = models.TextField(blank=True, default='', verbose_name="错误信息")
+    created_at = models.DateTimeField(default=timezone.now, verbose_name="提交时间")
+    started_at = models.DateTimeField(blank=True, null=True, verbose_name="开始时间")
+    finished_at = models.DateTimeField(blank=True, null=True, verbose_name="结束时间")
+
+    class Meta:
+        verbose_name = "导入任务"
+        verbose_name_plural = "导入任务"
+        ordering = ['-created_at']
+
+    def __str__(self):
+        return f"{self.folder} ({self.status})"
+
+    @property
+    def finished(self):
+        return self.status in (self.STATUS_DONE, self.STATUS_FAILED)
+
+
+class CatalogVersion(models.Model):
+    """
+    曲库版本号（只有 pk=1 一行），由 music.catalog 维护
+    放在数据库而不是进程内缓存中，命令行导入和同步的修改也能让网页进程的 ETag 和页面缓存失效
+    """
+    version = models.BigIntegerField(verbose_name="版本号")
+
+    class Meta:
+        verbose_name = "曲库版本"
+        verbose_name_plural = "曲库版本"
+
+    def __str__(self):
+        return str(self.version)
+
+
+class SeekIndex(models.Model):
+    """
+    MP3 跳转表：每隔 interval 秒所在帧的起始字节偏移（小端 uint32 打包），以及逐帧统计的精确时长
+    由 build_seek_index 命令在进程池中生成，文件大小或修改时间变化后失效
+    """
+    music = models.OneToOneField(
+        Music, on_delete=models.CASCADE, primary_key=True, related_name='seek_index', verbose_name="音乐"
+    )
+    interval = models.FloatField(verbose_name="间隔(秒)")
+    duration = models.FloatField(verbose_name="时长(秒)")
+    frames = models.IntegerField(verbose_name="帧数")
+    offsets = models.BinaryField(verbose_name="字节偏移")
+    file_size = models.BigIntegerField(verbose_name="文件大小(字节)")
+    file_mtime = models.FloatField(verbose_name="文件修改时间")
+    built_at = models.DateTimeField(default=timezone.now, verbose_name="生成时间")
+
+    class Meta:
+        verbose_name = "跳转表"
+        verbose_name_plural = "跳转表"
+
+    def __str__(self):
+        return f"{self.music_id} ({self.duration:.1f}s)"
+
+    @classmethod
+    def from_table(cls, music_id, table, size, mtime, built_at=None):
+        """由 seektable.SeekTable 生成（不保存）"""
+        return cls(
+            music_id=music_id, interval=table.interval, duration=table.duration, frames=table.frames,
+            offsets=table.offsets, file_size=size, file_mtime=mtime, built_at=built_at or timezone.now(),
+        )
+
+    def matches(self, size, mtime, interval):
+        """跳转表是否对应这个大小和修改时间的文件，且间隔相同"""
+        return (self.file_size, self.file_mtime, self.interval) == (size, mtime, float(interval))
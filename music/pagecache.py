@@ -0,0 +1,41 @@
+# music/pagecache.py
+import hashlib
+from django.conf import settings
+from django.core.cache import caches
+from .catalog import get_catalog_version
+
+DEFAULT_PAGE_CACHE_TIMEOUT = 300
+
+# 影响列表页输出的查询参数，其它参数不参与缓存 key，避免被随意构造的参数撑满缓存
+LIST_PAGE_PARAMS = {
+    True: ('cursor', 'before', 'p'),
+    False: ('page',),
+}
+
+
+def get_page_cache_timeout():
+    return getattr(settings, 'MUSIC_PAGE_CACHE_TIMEOUT', DEFAULT_PAGE_CACHE_TIMEOUT)
+
+
+def get_page_cache():
+    return caches[getattr(settings, 'MUSIC_PAGE_CACHE', 'default')]
+
+
+def list_page_key(request, cursor_mode):
+    """整页缓存的 key：曲库版本号 + 分页方式 + 规范化后的分页参数"""
+    params = '&'.join(f'{name}={request.GET.get(name, "")}' for name in LIST_PAGE_PARAMS[cursor_mode])
+    digest = hashlib.sha1(params.encode()).hexdigest()[:16]
+    return f'music:list:{get_catalog_version()}:{"cursor" if cursor_mode else "page"}:{digest}'
+
+
+def get_cached_page(key):
+    """返回缓存的整页 HTML（bytes），未命中或缓存关闭时返回 None"""
+    if get_page_cache_timeout() <= 0:
+        return None
+    return get_page_cache().get(key)
+
+
+def store_page(key, content):
+    timeout = get_page_cache_timeout()
+    if timeout > 0:
+        get_page_cache().set(key, content, timeout)
@@ -0,0 +1,136 @@
+# music/pagination.py
+import base64
+import math
+from datetime import datetime
+from urllib.parse import urlencode
+from django.core.cache import cache
+from django.core.paginator import Paginator
+from django.db.models import Q
+from django.utils.functional import cached_property
+
+# 音乐总数的缓存 key 前缀和有效期（秒）；key 中包含曲库版本号，
+# 其它进程（命令行导入、同步）修改曲库后本进程缓存的旧总数也不会再被使用；增删记录时还会主动失效
+MUSIC_COUNT_CACHE_KEY = 'music:count'
+MUSIC_COUNT_CACHE_TIMEOUT = 300
+
+
+def _count_key():
+    from .catalog import get_catalog_version
+
+    return f'{MUSIC_COUNT_CACHE_KEY}:{get_catalog_version()}'
+
+
+def get_music_count():
+    """音乐总数：优先读缓存，避免每次翻页都执行 COUNT(*)"""
+    from .models import Music
+
+    key = _count_key()
+    count = cache.get(key)
+    if count is None:
+        count = Music.objects.count()
+        cache.set(key, count, MUSIC_COUNT_CACHE_TIMEOUT)
+    return count
+
+
+def invalidate_music_count():
+    cache.delete(_count_key())
+
+
+class CachedCountPaginator(Paginator):
+    """总数来自 get_music_count() 的分页器（页码模式使用）"""
+
+    @cached_property
+    def count(self):
+        return get_music_count()
+
+
+def encode_cursor(music):
+    """把 (created_at, id) 编码成 URL 安全的游标"""
+    raw = f'{music.created_at.isoformat()}|{music.id}'
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip('=')
+
+
+def decode_cursor(token):
+    """解析游标，格式错误时返回 None"""
+    try:
+        raw = base64.urlsafe_b64decode(token + '=' * (-len(token) % 4)).decode()
+        created_at, music_id = raw.rsplit('|', 1)
+        return datetime.fromisoformat(created_at), int(music_id)
+    except (ValueError, TypeError):
+        return None
+
+
+class KeysetPaginator:
+    """只提供模板需要的总数和总页数"""
+
+    def __init__(self, count, per_page):
+        self.count = count
+        self.per_page = per_page
+
+    @property
+    def num_pages(self):
+        return max(math.ceil(self.count / self.per_page), 1)
+
+
+class KeysetPage:
+    """
+    基于 (created_at, id) 的游标分页，每一页的查询代价都是固定的：
+    WHERE (created_at, id) < 游标 ORDER BY created_at DESC, id DESC LIMIT per_page + 1
+    接口和 Paginator 的 Page 保持一致，模板可以直接使用
+    """
+
+    def __init__(self, queryset, per_page, cursor=None, before=None, number=1, count=0):
+        self.per_page = per_page
+        self.number = max(number, 1)
+        self.paginator = KeysetPaginator(count, per_page)
+
+        if before:
+            # 向前翻页：反向排序取 per_page + 1 条，再倒回来
+            created_at, music_id = before
+            rows = list(
+                queryset.filter(Q(created_at__gt=created_at) | Q(created_at=created_at, id__gt=music_id))
+                .order_by('created_at', 'id')[:per_page + 1]
+            )
+            self._has_previous = len(rows) > per_page
+            self._has_next = True
+            rows = rows[:per_page][::-1]
+        else:
+            if cursor:
+                created_at, music_id = cursor
+                queryset = queryset.filter(Q(created_at__lt=created_at) | Q(created_at=created_at, id__lt=music_id))
+            rows = list(queryset.order_by('-created_at', '-id')[:per_page + 1])
+            self._has_previous = bool(cursor)
+            self._has_next = len(rows) > per_page
+            rows = rows[:per_page]
+
+        if not self._has_previous:
+            self.number = 1
+        self.object_list = rows
+
+    def __iter__(self):
+        return iter(self.object_list)
+
+    def __len__(self):
+        return len(self.object_list)
+
+    def __bool__(self):
+        return bool(self.object_list)
+
+    def has_next(self):
+        return self._has_next and bool(self.object_list)
+
+    def has_previous(self):
+        return self._has_previous and bool(self.object_list)
+
+    def start_index(self):
+        if not self.object_list:
+            return 0
+        return (self.number - 1) * self.per_page + 1
+
+    def next_query(self):
+        """下一页的查询参数"""
+        return urlencode({'cursor': encode_cursor(self.object_list[-1]), 'p': self.number + 1})
+
+    def previous_query(self):
+        """上一页的查询参数"""
+        return urlencode({'before': encode_cursor(self.object_list[0]), 'p': self.number - 1})
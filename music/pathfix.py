@@ -0,0 +1,151 @@
+# music/pathfix.py
+"""
+fix_file_paths 使用的路径修复逻辑
+先用一次 os.scandir 遍历媒体目录，建立 文件名 -> 路径 的内存索引，
+之后每条记录的候选路径都在索引里查找，只有索引范围之外的路径才访问文件系统
+"""
+import os
+from collections import defaultdict
+
+# resolve 的结果
+EXISTS = 'exists'
+FIXED = 'fixed'
+AMBIGUOUS = 'ambiguous'
+NOT_FOUND = 'not_found'
+
+
+def _key(path):
+    """索引和比较时使用的形式（Windows 下不区分大小写）"""
+    return os.path.normcase(os.path.normpath(path))
+
+
+def _components(path):
+    """按 / 和 \\ 切分路径，去掉空段和盘符，统一大小写"""
+    parts = path.replace('\\', '/').split('/')
+    return [os.path.normcase(part) for part in parts if part and not part.endswith(':')]
+
+
+class MediaIndex:
+    """媒体目录下所有文件的内存索引"""
+
+    def __init__(self, roots):
+        self.roots = [os.path.abspath(root) for root in roots if root and os.path.isdir(root)]
+        self._root_keys = [os.path.join(_key(root), '') for root in self.roots]
+        self.by_name = defaultdict(list)
+        self.paths = set()
+        self.files = 0
+        # 已经遍历过的目录 (st_dev, st_ino)：会进入符号链接指向的目录，靠它防止链接成环、重复遍历
+        self._dirs = set()
+        for root in self.roots:
+            self._walk(root)
+
+    def _walk(self, root):
+        stack = [root]
+        while stack:
+            path = stack.pop()
+            try:
+                st = os.stat(path)
+                if (st.st_dev, st.st_ino) in self._dirs:
+                    continue
+                self._dirs.add((st.st_dev, st.st_ino))
+                it = os.scandir(path)
+            except OSError:
+                continue
+            with it:
+                for entry in it:
+                    try:
+                        if entry.is_dir():
+                            stack.append(entry.path)
+                            continue
+                        if not entry.is_file():
+                            continue
+                    except OSError:
+                        continue
+                    key = _key(entry.path)
+                    if key in self.paths:
+                        # 多个媒体目录互相包含时只记录一次
+                        continue
+                    self.paths.add(key)
+                    self.by_name[os.path.normcase(entry.name)].append(entry.path)
+                    self.files += 1
+
+    def covers(self, path):
+        """path 是否位于已索引的目录下"""
+        key = _key(path)
+        return any(key.startswith(root_key) for root_key in self._root_keys)
+
+    def exists(self, path):
+        """
+        索引内的路径不访问文件系统；不在索引里的才检查磁盘
+        （索引之后新增的文件、经由另一个符号链接才能到达的已遍历目录等）
+        """
+        if not os.path.isabs(path):
+            return False
+        if self.covers(path) and _key(path) in self.paths:
+            return True
+        return os.path.isfile(path)
+
+    def lookup_basename(self, original):
+        """
+        按文件名查找，返回匹配的路径列表
+        同名文件有多个时，只保留末尾目录和原路径重合最多的那些
+        """
+        parts = _components(original)
+        if not parts:
+            return []
+        matches = self.by_name.get(parts[-1], [])
+        if len(matches) <= 1:
+            return list(matches)
+
+        def overlap(path):
+            score = 0
+            for a, b in zip(reversed(_components(path)), reversed(parts)):
+                if a != b:
+                    break
+                score += 1
+            return score
+
+        scores = {path: overlap(path) for path in matches}
+        best = max(scores.values())
+        return [path for path in matches if scores[path] == best]
+
+
+def _slash_candidates(original):
+    """Windows / Unix 混用分隔符时的候选路径"""
+    alt = original.replace('\\', '/')
+    if alt.startswith('/') and ':' in alt and len(alt) >= 3:
+        # 例如 /D:/music/xxx -> D:/music/xxx
+        yield alt[1:3] + alt[3:]
+    yield original.replace('/', os.sep).replace('\\', os.sep)
+    if os.name == 'nt' and ':' not in original:
+        # 最后尝试常用盘符
+        for drive in ['D:', 'C:']:
+            yield os.path.join(drive + os.sep, original.lstrip('\\/'))
+
+
+def resolve(original, index, media_root=''):
+    """
+    解析一条记录的 file_path，返回 (状态, 路径或候选列表)
+    - EXISTS：原路径存在
+    - FIXED：找到唯一的新路径
+    - AMBIGUOUS：按文件名找到多个同样匹配的文件，返回候选列表，不自动修复
+    - NOT_FOUND：都没找到
+    """
+    if index.exists(original):
+        return EXISTS, original
+
+    if media_root and not os.path.isabs(original):
+        candidate = os.path.abspath(os.path.join(media_root, original))
+        if index.exists(candidate):
+            return FIXED, candidate
+
+    for candidate in _slash_candidates(original):
+        if candidate != original and index.exists(candidate):
+            return FIXED, os.path.abspath(candidate)
+
+    matches = index.lookup_basename(original)
+    if len(matches) == 1:
+        return FIXED, os.path.abspath(matches[0])
+    if matches:
+        return AMBIGUOUS, sorted(matches)
+    return NOT_FOUND, None
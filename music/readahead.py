@@ -0,0 +1,128 @@
+# music/readahead.py
+"""
+下一首预读：播放器告知接下来要播放的歌曲，后台线程提前把文件开头读进内存，
+切歌时不用等磁盘寻道或 NAS 唤醒
+"""
+import os
+import threading
+from collections import OrderedDict
+from django.conf import settings
+from .blockcache import block_cache
+from .metrics import READAHEAD_TASKS
+from .streaming import RangeFileWrapper
+from .utils import get_music_file_info
+
+DEFAULT_READAHEAD_BYTES = 2 * 1024 * 1024
+
+
+def warm_file(file_path, readahead_bytes=DEFAULT_READAHEAD_BYTES):
+    """
+    预热文件开头 readahead_bytes 字节
+    - 支持 posix_fadvise 时通知内核异步预读（进入系统页缓存）
+    - 块缓存开启时把开头的块读入 block_cache，播放时直接从内存发送；
+      两者都不可用时（Windows）直接读一遍，让系统缓存住
+    """
+    st = os.stat(file_path)
+    length = min(readahead_bytes, st.st_size)
+    fadvised = False
+    if hasattr(os, 'posix_fadvise'):
+        with open(file_path, 'rb') as fh:
+            os.posix_fadvise(fh.fileno(), 0, length, os.POSIX_FADV_WILLNEED)
+        fadvised = True
+
+    if block_cache.enabled:
+        # 只有开头 head_bytes 以内的块第一次读取就会被缓存
+        length = min(length, block_cache.head_bytes)
+    elif fadvised:
+        return
+    body = RangeFileWrapper(file_path, 0, length, file_key=(file_path, st.st_mtime_ns, st.st_size))
+    try:
+        for _ in body:
+            pass
+    finally:
+        body.close()
+
+
+class ReadaheadScheduler:
+    """
+    预读任务队列
+    - 最多排队 queue_size 首，满了丢弃最早的（用户切歌后旧的预告已经没用）
+    - 同一首歌在队列中只保留一份
+    - 最多 workers 个后台线程同时读文件，线程在第一次提交任务时启动
+    """
+
+    def __init__(self, workers=2, queue_size=32, readahead_bytes=DEFAULT_READAHEAD_BYTES):
+        self.workers = workers
+        self.queue_size = queue_size
+        self.readahead_bytes = readahead_bytes
+        # music.pk -> Music（只加载了 id 和 file_path）
+        self._queue = OrderedDict()
+        self._running = 0
+        self._threads = []
+        self._cond = threading.Condition()
+
+    @property
+    def enabled(self):
+        return self.workers > 0 and self.queue_size > 0
+
+    def schedule(self, musics):
+        """提交预读任务，返回实际加入队列的数量"""
+        if not self.enabled:
+            return 0
+        scheduled = 0
+        with self._cond:
+            for music in musics:
+                if music.pk in self._queue:
+                    continue
+                self._queue[music.pk] = music
+                scheduled += 1
+                READAHEAD_TASKS.inc('scheduled')
+                while len(self._queue) > self.queue_size:
+                    self._queue.popitem(last=False)
+                    READAHEAD_TASKS.inc('dropped')
+            self._start_workers()
+            self._cond.notify_all()
+        return scheduled
+
+    def _start_workers(self):
+        while len(self._threads) < self.workers:
+            thread = threading.Thread(target=self._work, name=f'music-readahead-{len(self._threads)}', daemon=True)
+            self._threads.append(thread)
+            thread.start()
+
+    def _work(self):
+        while True:
+            with self._cond:
+                while not self._queue:
+                    self._cond.wait()
+                _, music = self._queue.popitem(last=False)
+                self._running += 1
+            try:
+                READAHEAD_TASKS.inc(self._warm(music))
+            finally:
+                with self._cond:
+                    self._running -= 1
+                    self._cond.notify_all()
+
+    def _warm(self, music):
+        # 路径解析走 path_cache，和 play_music 得到的路径一致
+        resolved = get_music_file_info(music)
+        if resolved is None:
+            return 'missing'
+        try:
+            warm_file(resolved.path, self.readahead_bytes)
+        except OSError:
+            return 'failed'
+        return 'warmed'
+
+    def join(self, timeout=None):
+        """等待队列清空、正在执行的任务完成，返回是否在超时前完成"""
+        with self._cond:
+            return self._cond.wait_for(lambda: not self._queue and not self._running, timeout)
+
+
+readahead_scheduler = ReadaheadScheduler(
+    workers=getattr(settings, 'MUSIC_READAHEAD_WORKERS', 2),
+    queue_size=getattr(settings, 'MUSIC_READAHEAD_QUEUE_SIZE', 32),
+    readahead_bytes=getattr(settings, 'MUSIC_READAHEAD_BYTES', DEFAULT_READAHEAD_BYTES),
+)
@@ -0,0 +1,233 @@
+# music/search.py
+import re
+from itertools import count
+import unicodedata
+from django.db import transaction
+from .catalog import catalog_columns, serialize_rows
+from .models import Music, SearchTerm
+
+# 词项最大长度，和 SearchTerm.term 保持一致
+MAX_TERM_LENGTH = 32
+
+DEFAULT_SEARCH_LIMIT = 20
+MAX_SEARCH_LIMIT = 100
+DEFAULT_INDEX_BATCH_SIZE = 1000
+
+# 多个条件时，命中不超过这个数量的条件作为求交集的种子
+CANDIDATE_LIMIT = 2000
+# 校验候选结果时每次读取的行数
+VERIFY_CHUNK_SIZE = 200
+
+# CJK 字符：日文假名、中日韩统一表意文字（含扩展 A 和兼容区）、韩文音节
+_CJK = '\u3040-\u30ff\u3400-\u4dbf\u4e00-\u9fff\uf900-\ufaff\uac00-\ud7af'
+# 连续的 CJK 字符为一段；其它字母数字按单词切分
+TOKEN_RE = re.compile(f'([{_CJK}]+)|([^\\W_{_CJK}]+)')
+
+# 前缀查询的上界：term >= 前缀 AND term < 前缀 + U+FFFF，可以直接走索引
+PREFIX_UPPER_BOUND = '\uffff'
+
+
+def normalize(text):
+    """全角转半角、统一小写"""
+    return unicodedata.normalize('NFKC', text or '').lower()
+
+
+def _tokens(text):
+    """产出 (片段, 是否 CJK)"""
+    for match in TOKEN_RE.finditer(normalize(text)):
+        cjk, word = match.groups()
+        if cjk:
+            yield cjk, True
+        else:
+            yield word[:MAX_TERM_LENGTH], False
+
+
+def index_terms(*texts):
+    """
+    生成写入倒排索引的词项
+    - CJK 片段切成二元组，并单独索引每段的最后一个字，
+      这样单字查询用前缀匹配（"字?" 或 "字"）就能覆盖它出现的所有位置
+    - 其它文本按单词索引
+    """
+    terms = set()
+    for text in texts:
+        for token, is_cjk in _tokens(text):
+            if is_cjk:
+                terms.update(token[i:i + 2] for i in range(len(token) - 1))
+                terms.add(token[-1])
+            else:
+                terms.add(token)
+    return terms
+
+
+def parse_query(query):
+    """
+    把查询拆成必须同时命中的条件 [(kind, term), ...]，kind 为 'exact' 或 'prefix'
+    - CJK 片段拆成二元组精确匹配，单字用前缀匹配
+    - 单词精确匹配，最后一个单词按前缀匹配（边输入边搜索）
+    同时返回切分出的片段，用于校验结果
+    """
+    tokens = list(_tokens(query))
+    groups = []
+    for i, (token, is_cjk) in enumerate(tokens):
+        if is_cjk and len(token) > 1:
+            groups.extend(('exact', token[j:j + 2]) for j in range(len(token) - 1))
+        elif is_cjk or i == len(tokens) - 1:
+            groups.append(('prefix', token))
+        else:
+            groups.append(('exact', token))
+    return tokens, list(dict.fromkeys(groups))
+
+
+def _term_queryset(kind, term):
+    if kind == 'exact':
+        return SearchTerm.objects.filter(term=term)
+    return SearchTerm.objects.filter(term__gte=term, term__lt=term + PREFIX_UPPER_BOUND)
+
+
+def _selectivity(group):
+    # 精确匹配和更长的词项命中的行更少，先查
+    kind, term = group
+    return kind == 'prefix', -len(term)
+
+
+def matching_ids(groups):
+    """
+    多个条件求交集，返回按 id 倒序、支持切片的结果
+    - 先找一个命中不超过 CANDIDATE_LIMIT 条的条件作为种子，其它条件只在种子集合内查询
+    - 每个条件都命中大量记录时，交给数据库求交集：每个条件一个 IN 子查询
+      （不用 INTERSECT，MySQL 8.0.31 之前不支持）
+    """
+    groups = sorted(groups, key=_selectivity)
+    for i, group in enumerate(groups):
+        seed = list(_term_queryset(*group).values_list('music_id', flat=True)[:CANDIDATE_LIMIT + 1])
+        if len(seed) <= CANDIDATE_LIMIT:
+            break
+    else:
+        ids = Music.objects.all()
+        for group in groups:
+            ids = ids.filter(id__in=_term_queryset(*group).values('music_id'))
+        return ids.order_by('-id').values_list('id', flat=True)
+
+    candidates = set(seed)
+    for group in groups[:i] + groups[i + 1:]:
+        if not candidates:
+            break
+        candidates &= set(_term_queryset(*group).filter(music_id__in=candidates).values_list('music_id', flat=True))
+    return sorted(candidates, reverse=True)
+
+
+def first_ids(kind, term, limit):
+    """
+    只有一个条件时不需要求交集：沿 (term, -music) 索引顺序读取，凑够 limit 条就停止
+    结果按命中的词项排序（完全匹配的单词排在以它为前缀的单词前面），同一词项内最近添加的在前
+    """
+    queryset = _term_queryset(kind, term).order_by('term', '-music_id').values_list('music_id', flat=True)
+    ids = []
+    seen = set()
+    for music_id in queryset.iterator(chunk_size=limit * 4):
+        if music_id not in seen:
+            seen.add(music_id)
+            ids.append(music_id)
+            if len(ids) >= limit:
+                break
+    return ids
+
+
+def search_music(query, fields, limit=DEFAULT_SEARCH_LIMIT):
+    """
+    在歌曲名、歌手、专辑中搜索，返回 serialize_rows 格式的紧凑结果
+    多个条件时最近添加的在前，单个条件时的顺序见 first_ids
+    二元组求交集可能把不相邻的字也算作命中，三个字以上的 CJK 片段会在原文上再校验一次
+    """
+    tokens, groups = parse_query(query)
+    if not groups:
+        return []
+    if len(groups) == 1:
+        ids = first_ids(*groups[0], limit)
+    else:
+        ids = matching_ids(groups)
+    phrases = [token for token, is_cjk in tokens if is_cjk and len(token) > 2]
+
+    columns = catalog_columns(fields)
+    text_columns = ['name', 'singer', 'album']
+    query_columns = columns + [c for c in text_columns if c not in columns]
+    text_index = [query_columns.index(c) for c in text_columns]
+
+    rows = []
+    # ids 可能是惰性的 QuerySet，不能取 len()，逐段读取直到取空
+    for start in count(0, VERIFY_CHUNK_SIZE):
+        chunk = list(ids[start:start + VERIFY_CHUNK_SIZE])
+        if not chunk:
+            break
+        # values_list 的第二列是 id，按 ids 的顺序输出
+        found = {row[1]: row for row in Music.objects.filter(id__in=chunk).values_list(*query_columns)}
+        for music_id in chunk:
+            row = found.get(music_id)
+            if row is None:
+                continue
+            if phrases:
+                haystack = normalize(' '.join(row[j] or '' for j in text_index))
+                if not all(phrase in haystack for phrase in phrases):
+                    continue
+            rows.append(row)
+            if len(rows) >= limit:
+                return serialize_rows(rows, columns, fields)
+    return serialize_rows(rows, columns, fields)
+
+
+def _search_terms(musics):
+    return [
+        SearchTerm(term=term, music_id=music.pk)
+        for music in musics
+        for term in index_terms(music.name, music.singer, music.album)
+    ]
+
+
+def _fill_missing_pks(musics):
+    """
+    bulk_create 只在 SQLite 3.35+ / PostgreSQL / MariaDB 10.5+ 上回填主键，MySQL 上不会；
+    没有主键的记录按 file_path 查回 id（同一路径有多条时取最新的一条）
+    """
+    missing = [music for music in musics if music.pk is None and music.file_path]
+    if not missing:
+        return
+    ids = dict(
+        Music.objects.filter(file_path__in=[music.file_path for music in missing])
+        .order_by('id').values_list('file_path', 'id')
+    )
+    for music in missing:
+        music.pk = ids.get(music.file_path)
+
+
+def index_music(musics):
+    """重建若干 Music 的索引（先删除旧词项再写入）；刚 bulk_create、没有主键的记录会先查回主键"""
+    musics = list(musics)
+    _fill_missing_pks(musics)
+    musics = [music for music in musics if music.pk is not None]
+    if not musics:
+        return
+    with transaction.atomic():
+        SearchTerm.objects.filter(music_id__in=[music.pk for music in musics]).delete()
+        SearchTerm.objects.bulk_create(_search_terms(musics), batch_size=DEFAULT_INDEX_BATCH_SIZE)
+
+
+def rebuild_index(batch_size=DEFAULT_INDEX_BATCH_SIZE, progress=None):
+    """清空并按 id 顺序分批重建整个索引，返回处理的记录数；progress(已处理数) 在每批后调用"""
+    SearchTerm.objects.all().delete()
+    total = 0
+    last_id = 0
+    while True:
+        batch = list(
+            Music.objects.filter(id__gt=last_id).order_by('id')
+            .only('id', 'name', 'singer', 'album')[:batch_size]
+        )
+        if not batch:
+            break
+        with transaction.atomic():
+            SearchTerm.objects.bulk_create(_search_terms(batch), batch_size=DEFAULT_INDEX_BATCH_SIZE)
+        total += len(batch)
+        last_id = batch[-1].id
+        if progress:
+            progress(total)
+    return total
@@ -0,0 +1,172 @@
+# music/seektable.py
+"""
+MP3 逐帧扫描，生成“时间 → 字节偏移”的跳转表
+VBR 文件各帧长度不同，按平均码率估算的偏移会落在错误的位置；
+这里逐个解析帧头，记录每隔 interval 秒所在帧的起始偏移，并得到精确时长
+注意：这个模块会在进程池的子进程中执行，不要在这里导入 Django 模型
+"""
+import mmap
+import os
+import struct
+from collections import namedtuple
+
+# 跳转表支持的格式
+SEEKABLE_FORMATS = {'.mp3'}
+
+# 码率表（kbps），按 (是否 MPEG-1, 层) 索引，下标为帧头中的码率序号 1-14
+_BITRATES = {
+    (True, 1): (32, 64, 96, 128, 160, 192, 224, 256, 288, 320, 352, 384, 416, 448),
+    (True, 2): (32, 48, 56, 64, 80, 96, 112, 128, 160, 192, 224, 256, 320, 384),
+    (True, 3): (32, 40, 48, 56, 64, 80, 96, 112, 128, 160, 192, 224, 256, 320),
+    (False, 1): (32, 48, 56, 64, 80, 96, 112, 128, 144, 160, 176, 192, 224, 256),
+    (False, 2): (8, 16, 24, 32, 40, 48, 56, 64, 80, 96, 112, 128, 144, 160),
+    (False, 3): (8, 16, 24, 32, 40, 48, 56, 64, 80, 96, 112, 128, 144, 160),
+}
+# 采样率，按帧头中的版本位索引：3 = MPEG-1，2 = MPEG-2，0 = MPEG-2.5
+_SAMPLE_RATES = {3: (44100, 48000, 32000), 2: (22050, 24000, 16000), 0: (11025, 12000, 8000)}
+
+# 偏移按小端 uint32 存储，每个点 4 字节
+_OFFSET = struct.Struct('<I')
+MAX_OFFSET = 0xFFFFFFFF
+
+SeekTable = namedtuple('SeekTable', ['duration', 'interval', 'frames', 'offsets'])
+SeekTable.__doc__ = """
+duration：精确时长（秒）；interval：相邻两点的时间间隔（秒）；frames：音频帧数
+offsets：打包后的偏移（bytes），第 i 个为 i * interval 秒所在帧的起始字节
+"""
+
+
+def pack_offsets(offsets):
+    return struct.pack(f'<{len(offsets)}I', *offsets)
+
+
+def unpack_offsets(data):
+    return list(struct.unpack(f'<{len(data) // _OFFSET.size}I', data))
+
+
+def parse_frame_header(header):
+    """
+    解析 4 字节帧头（int），返回 (帧长度, 每帧采样数, 采样率, 帧头特征)；不是合法帧头时返回 None
+    帧头特征（版本、层、采样率）用于判断相邻两帧是否属于同一条流
+    自由码率（码率序号 0）的帧无法得知长度，也当作不合法
+    """
+    if header >> 21 != 0x7FF:
+        return None
+    version = (header >> 19) & 3
+    layer = 4 - ((header >> 17) & 3)
+    bitrate_index = (header >> 12) & 0xF
+    rate_index = (header >> 10) & 3
+    if version == 1 or layer == 4 or bitrate_index in (0, 15) or rate_index == 3:
+        return None
+    mpeg1 = version == 3
+    bitrate = _BITRATES[mpeg1, layer][bitrate_index - 1] * 1000
+    sample_rate = _SAMPLE_RATES[version][rate_index]
+    padding = (header >> 9) & 1
+    if layer == 1:
+        samples = 384
+        length = (12 * bitrate // sample_rate + padding) * 4
+    elif layer == 3 and not mpeg1:
+        samples = 576
+        length = 72 * bitrate // sample_rate + padding
+    else:
+        samples = 1152
+        length = 144 * bitrate // sample_rate + padding
+    return length, samples, sample_rate, header & 0xFFFE0C00
+
+
+def _skip_id3v2(data):
+    """跳过文件开头的 ID3v2 标签（可能有多个），返回音频数据的起始位置"""
+    pos = 0
+    while data[pos:pos + 3] == b'ID3' and len(data) >= pos + 10:
+        size = data[pos + 6:pos + 10]
+        if any(b & 0x80 for b in size):
+            break
+        length = (size[0] << 21) | (size[1] << 14) | (size[2] << 7) | size[3]
+        footer = 10 if data[pos + 5] & 0x10 else 0
+        pos += 10 + length + footer
+    return pos
+
+
+def _is_info_frame(data, pos, length):
+    """Xing / Info / VBRI 帧只携带 VBR 信息，不含音频，解码器会跳过它"""
+    head = data[pos + 4:pos + min(length, 48)]
+    return b'Xing' in head or b'Info' in head or b'VBRI' in head
+
+
+def scan_mp3(path, interval=1.0):
+    """
+    扫描 MP3 文件，返回 SeekTable；找不到音频帧或文件超过 4GB 时返回 None
+    帧头损坏时逐字节向后重新同步，新的位置必须和下一帧衔接上才接受
+    """
+    interval = float(interval)
+    with open(path, 'rb') as fh:
+        if os.fstat(fh.fileno()).st_size == 0:
+            return None
+        with mmap.mmap(fh.fileno(), 0, access=mmap.ACCESS_READ) as data:
+            size = len(data)
+            if size > MAX_OFFSET:
+                return None
+            pos = _skip_id3v2(data)
+            offsets = []
+            frames = 0
+            elapsed = 0.0
+            next_point = 0.0
+            expected = None
+            while pos + 4 <= size:
+                frame = parse_frame_header(int.from_bytes(data[pos:pos + 4], 'big'))
+                if frame is not None and expected is not None and frame[3] != expected:
+                    frame = None
+                if frame is not None and expected is None:
+                    # 第一帧（或重新同步后）：下一帧也必须能衔接上，避免把数据中的 0xFFE 误当帧头
+                    following = pos + frame[0]
+                    if following + 4 <= size:
+                        nxt = parse_frame_header(int.from_bytes(data[following:following + 4], 'big'))
+                        if nxt is None or nxt[3] != frame[3]:
+                            frame = None
+                    elif frames:
+                        frame = None
+                if frame is None:
+                    expected = None
+                    # 从下一个字节开始寻找同步字
+                    found = data.find(b'\xff', pos + 1)
+                    if found < 0:
+                        break
+                    pos = found
+                    continue
+                length, samples, sample_rate, expected = frame
+                if pos + length > size:
+                    break
+                if frames == 0 and not offsets and _is_info_frame(data, pos, length):
+                    pos += length
+                    continue
+                duration = samples / sample_rate
+                while next_point < elapsed + duration:
+                    offsets.append(pos)
+                    next_point = len(offsets) * interval
+                elapsed += duration
+                frames += 1
+                pos += length
+    if not frames:
+        return None
+    return SeekTable(round(elapsed, 6), interval, frames, pack_offsets(offsets))
+
+
+def build_seek_table(file_path, interval=1.0):
+    """
+    进程池中执行的任务：扫描文件并读取大小和修改时间
+    返回 (file_path, SeekTable 或 None, size, mtime)，文件无法访问时 size/mtime 为 None
+    """
+    try:
+        st = os.stat(file_path)
+        table = scan_mp3(file_path, interval)
+    except (OSError, ValueError):
+        return file_path, None, None, None
+    return file_path, table, st.st_size, st.st_mtime
+
+
+def offset_for_time(offsets, interval, seconds):
+    """在解包后的偏移列表中找 seconds 秒所在的位置，返回 (字节偏移, 该点对应的时间)"""
+    if not offsets:
+        return 0, 0.0
+    index = min(max(int(seconds // interval), 0), len(offsets) - 1)
+    return offsets[index], index * interval
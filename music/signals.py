@@ -0,0 +1,39 @@
+# music/signals.py
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from .catalog import bump_catalog_version
+from .models import Music
+from .pagination import invalidate_music_count
+from .search import index_music
+from .utils import invalidate_music_file_path
+
+
+@receiver(post_save, sender=Music)
+@receiver(post_delete, sender=Music)
+def invalidate_path_cache(sender, instance, **kwargs):
+    """Music 的 file_path 新增、修改或删除后，丢弃对应的路径解析缓存（包括负缓存）"""
+    if instance.file_path:
+        invalidate_music_file_path(instance.file_path)
+
+
+@receiver(post_save, sender=Music)
+@receiver(post_delete, sender=Music)
+def invalidate_count_cache(sender, instance, created=True, **kwargs):
+    """新增或删除记录后，丢弃缓存的音乐总数"""
+    if created:
+        invalidate_music_count()
+
+
+@receiver(post_save, sender=Music)
+@receiver(post_delete, sender=Music)
+def bump_catalog(sender, instance, **kwargs):
+    """任何记录的增删改都会改变曲库接口的输出，递增版本号使旧 ETag 失效"""
+    bump_catalog_version()
+
+
+@receiver(post_save, sender=Music)
+def update_search_index(sender, instance, update_fields=None, **kwargs):
+    """歌曲名、歌手或专辑可能变化时重建这条记录的搜索索引（删除时由外键级联清理）"""
+    if update_fields is None or {'name', 'singer', 'album'} & set(update_fields):
+        index_music([instance])
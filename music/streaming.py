@@ -0,0 +1,431 @@
+# music/streaming.py
+import asyncio
+import io
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import quote
+from django.conf import settings
+from django.core.handlers.asgi import ASGIHandler
+from django.http import HttpResponse
+from django.urls import Resolver404, resolve
+from django.utils.http import parse_http_date_safe
+from .blockcache import block_cache
+
+# 默认每次读取的块大小（64KB），可在 settings.py 中通过 MUSIC_STREAM_CHUNK_SIZE 修改
+DEFAULT_CHUNK_SIZE = 64 * 1024
+
+
+def get_chunk_size():
+    """获取流式传输的块大小"""
+    chunk_size = getattr(settings, 'MUSIC_STREAM_CHUNK_SIZE', DEFAULT_CHUNK_SIZE)
+    try:
+        chunk_size = int(chunk_size)
+    except (TypeError, ValueError):
+        return DEFAULT_CHUNK_SIZE
+    return chunk_size if chunk_size > 0 else DEFAULT_CHUNK_SIZE
+
+
+class BlockReader:
+    """
+    按偏移量读取文件内容
+    传入 file_key（路径、修改时间、大小）且块缓存开启时，经 block_cache 按块读取，
+    全部命中时不会打开文件；否则直接读文件
+    """
+
+    def __init__(self, file_path, file_key=None):
+        self.file_path = file_path
+        self.file_key = file_key
+        self.cache = block_cache if file_key is not None and block_cache.enabled else None
+        self._fh = None
+        self._offset = 0
+        if self.cache is None:
+            self._open()
+
+    def _open(self):
+        if self._fh is None:
+            self._fh = open(self.file_path, 'rb')
+            self._offset = 0
+        return self._fh
+
+    def seek(self, offset):
+        """把文件位置移到 offset（仅直接读文件时需要，sendfile 从这里开始发送）"""
+        if self.cache is None and offset != self._offset:
+            self._fh.seek(offset)
+            self._offset = offset
+
+    def read_at(self, offset, size):
+        """从 offset 开始最多读取 size 字节；走缓存时不会跨越块边界"""
+        if self.cache is None:
+            self.seek(offset)
+            data = self._fh.read(size)
+            self._offset += len(data)
+            return data
+
+        block_size = self.cache.block_size
+        index = offset // block_size
+        block = self.cache.get(self.file_key, index, lambda: self._read_block(index))
+        skip = offset - index * block_size
+        return block[skip:skip + size]
+
+    def _read_block(self, index):
+        fh = self._open()
+        fh.seek(index * self.cache.block_size)
+        return fh.read(self.cache.block_size)
+
+    def fileno(self):
+        if self.cache is not None:
+            # 数据要经过块缓存，不能交给 sendfile
+            raise io.UnsupportedOperation('fileno')
+        return self._fh.fileno()
+
+    def close(self):
+        if self._fh is not None:
+            self._fh.close()
+
+
+class StreamBody:
+    """
+    音频响应体的公共部分
+    - bytes_read：已经读出的数据字节数（交给 sendfile 发送时 read() 不会被调用，保持为 0）
+    - fileno_used：fileno() 是否已经交给服务器（可能经 sendfile 发送，bytes_read 不能反映实际发送量）
+    - add_close_callback()：登记 close() 时要调用的回调（统计活动流、释放限流名额等），只调用一次
+    """
+
+    def __init__(self):
+        self.bytes_read = 0
+        self.fileno_used = False
+        self._close_callbacks = []
+
+    def add_close_callback(self, callback):
+        self._close_callbacks.append(callback)
+
+    def _run_close_callbacks(self):
+        callbacks, self._close_callbacks = self._close_callbacks, []
+        for callback in callbacks:
+            callback()
+
+
+class RangeFileWrapper(StreamBody):
+    """
+    只暴露文件中 [start, start + length) 这一段的文件对象包装器
+
+    - read() 永远不会越过区间末尾，每次最多读取 chunk_size 字节，
+      所以无论文件多大，单个连接占用的内存都是固定的
+    - 不经过块缓存时暴露 fileno()/tell()，支持 sendfile 的 WSGI 服务器（如 gunicorn）
+      会按 Content-Length 直接用 os.sendfile 零拷贝发送这一段
+    """
+
+    def __init__(self, file_path, start=0, length=None, chunk_size=None, file_key=None):
+        super().__init__()
+        self._reader = BlockReader(file_path, file_key)
+        if length is None:
+            length = os.path.getsize(file_path) - start
+        self._reader.seek(start)
+        self._pos = start
+        self.remaining = max(length, 0)
+        self.chunk_size = chunk_size or get_chunk_size()
+
+    def read(self, size=-1):
+        if self.remaining <= 0:
+            return b''
+        if size is None or size < 0 or size > self.chunk_size:
+            size = self.chunk_size
+        data = self._reader.read_at(self._pos, min(size, self.remaining))
+        self._pos += len(data)
+        self.remaining -= len(data)
+        self.bytes_read += len(data)
+        return data
+
+    def __iter__(self):
+        return iter(lambda: self.read(self.chunk_size), b'')
+
+    def fileno(self):
+        fileno = self._reader.fileno()
+        self.fileno_used = True
+        return fileno
+
+    def tell(self):
+        return self._pos
+
+    def seekable(self):
+        # 不允许外部随意 seek，避免 FileResponse 自行推算 Content-Length
+        return False
+
+    def close(self):
+        self._reader.close()
+        self._run_close_callbacks()
+
+
+# 单个 Range 头最多允许的区间数，防止构造大量碎片区间拖垮服务
+MAX_RANGES = 16
+
+
+def make_etag(stat_result):
+    """根据文件的修改时间和大小生成强 ETag"""
+    return '"%x-%x"' % (stat_result.st_mtime_ns, stat_result.st_size)
+
+
+def if_range_matches(if_range, etag, last_modified):
+    """
+    判断 If-Range 是否仍然有效
+    - ETag 形式必须强比较（弱 ETag 永远不匹配）
+    - 日期形式必须与 Last-Modified 完全相等
+    """
+    if not if_range:
+        return True
+    if_range = if_range.strip()
+    if if_range.startswith('"') or if_range.startswith('W/'):
+        return if_range == etag
+    return parse_http_date_safe(if_range) == last_modified
+
+
+def parse_range_header(range_header, file_size):
+    """
+    解析 bytes= 形式的 Range 头
+    返回排序并合并后的 [(start, end), ...]；格式错误抛 ValueError，
+    所有区间都无法满足时返回空列表
+    """
+    specs = [spec.strip() for spec in range_header[6:].split(',')]
+    specs = [spec for spec in specs if spec]
+    if not specs or len(specs) > MAX_RANGES:
+        raise ValueError('Invalid Range header')
+
+    ranges = []
+    for spec in specs:
+        start_str, end_str = spec.split('-', 1)
+        start_str, end_str = start_str.strip(), end_str.strip()
+
+        if start_str == '':
+            # 后缀范围 bytes=-N 表示最后 N 个字节
+            if not end_str:
+                raise ValueError('Invalid Range header')
+            suffix_len = int(end_str)
+            if suffix_len <= 0 or file_size == 0:
+                continue
+            ranges.append((max(file_size - suffix_len, 0), file_size - 1))
+        else:
+            # 正常范围 start-end，其中 end 可省略
+            range_start = int(start_str)
+            range_end = int(end_str) if end_str else file_size - 1
+            if range_start < 0 or range_start >= file_size or range_start > range_end:
+                continue
+            ranges.append((range_start, min(range_end, file_size - 1)))
+
+    # 合并重叠或相邻的区间，减少分段数量
+    merged = []
+    for range_start, range_end in sorted(ranges):
+        if merged and range_start <= merged[-1][1] + 1:
+            merged[-1] = (merged[-1][0], max(merged[-1][1], range_end))
+        else:
+            merged.append((range_start, range_end))
+    return merged
+
+
+class MultipartRangeStream(StreamBody):
+    """
+    multipart/byteranges 响应体的迭代器
+    依次产出每段的分隔头和按块读取的数据，最后产出结束分隔符
+    """
+
+    def __init__(self, file_path, parts, closing, chunk_size=None, file_key=None):
+        super().__init__()
+        self._reader = BlockReader(file_path, file_key)
+        self._parts = list(parts)
+        self._closing = closing
+        self._pos = 0
+        self._remaining = 0
+        self.chunk_size = chunk_size or get_chunk_size()
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        if self._remaining > 0:
+            data = self._reader.read_at(self._pos, min(self.chunk_size, self._remaining))
+            if data:
+                self._pos += len(data)
+                self._remaining -= len(data)
+                self.bytes_read += len(data)
+                return data
+            self._remaining = 0
+        if self._parts:
+            header, range_start, range_end = self._parts.pop(0)
+            self._pos = range_start
+            self._remaining = range_end - range_start + 1
+            return header
+        if self._closing:
+            closing, self._closing = self._closing, b''
+            return closing
+        raise StopIteration
+
+    def close(self):
+        self._reader.close()
+        self._run_close_callbacks()
+
+
+def multipart_byteranges(file_path, ranges, file_size, content_type, boundary, file_key=None):
+    """
+    生成 multipart/byteranges 响应体
+    返回 (按块产出数据的迭代器, 响应体总长度)
+    """
+    parts = [
+        (
+            (
+                f'\r\n--{boundary}\r\n'
+                f'Content-Type: {content_type}\r\n'
+                f'Content-Range: bytes {range_start}-{range_end}/{file_size}\r\n\r\n'
+            ).encode('latin-1'),
+            range_start,
+            range_end,
+        )
+        for range_start, range_end in ranges
+    ]
+    closing = f'\r\n--{boundary}--\r\n'.encode('latin-1')
+    content_length = len(closing) + sum(
+        len(header) + range_end - range_start + 1
+        for header, range_start, range_end in parts
+    )
+    return MultipartRangeStream(file_path, parts, closing, file_key=file_key), content_length
+
+
+# 交付方式：进程内流式 / nginx X-Accel-Redirect / Apache X-Sendfile
+DELIVERY_DJANGO = 'django'
+DELIVERY_X_ACCEL = 'x-accel-redirect'
+DELIVERY_X_SENDFILE = 'x-sendfile'
+
+
+def _match_offload_root(file_path):
+    """在 MUSIC_OFFLOAD_ROOTS 中查找包含该文件的根目录，返回 (根目录, 内部地址, 相对路径)"""
+    roots = getattr(settings, 'MUSIC_OFFLOAD_ROOTS', None) or {}
+    real_path = os.path.abspath(file_path)
+    for root, location in roots.items():
+        real_root = os.path.abspath(root)
+        prefix = os.path.join(real_root, '')
+        if os.path.normcase(real_path).startswith(os.path.normcase(prefix)):
+            return real_root, location, real_path[len(prefix):]
+    return None
+
+
+def offload_response(file_path, content_type):
+    """
+    把文件传输交给前端 Web 服务器
+    - x-accel-redirect：返回 nginx internal location 下的地址
+    - x-sendfile：返回文件的绝对路径（Apache mod_xsendfile / lighttpd）
+    文件不在 MUSIC_OFFLOAD_ROOTS 配置的目录下或未开启时返回 None，由 Django 自行流式传输
+    """
+    mode = getattr(settings, 'MUSIC_DELIVERY_MODE', DELIVERY_DJANGO)
+    if mode not in (DELIVERY_X_ACCEL, DELIVERY_X_SENDFILE):
+        return None
+
+    matched = _match_offload_root(file_path)
+    if matched is None:
+        return None
+    real_root, location, relative = matched
+
+    response = HttpResponse(content_type=content_type)
+    if mode == DELIVERY_X_ACCEL:
+        # 中文文件名需要百分号编码，nginx 会自行解码
+        relative = relative.replace('\\', '/')
+        response['X-Accel-Redirect'] = location.rstrip('/') + '/' + quote(relative)
+    else:
+        # mod_xsendfile 默认开启 XSendFileUnescape，同样使用百分号编码
+        response['X-Sendfile'] = quote(os.path.join(real_root, relative).replace('\\', '/'), safe='/:')
+    return response
+
+
+# 异步流式传输时用于文件读取的线程池，避免阻塞事件循环
+DEFAULT_ASYNC_IO_WORKERS = 16
+_io_executor = None
+_io_executor_lock = threading.Lock()
+
+
+def get_io_executor():
+    """获取（懒加载）有界的文件读取线程池，大小由 MUSIC_ASYNC_IO_WORKERS 配置"""
+    global _io_executor
+    if _io_executor is None:
+        with _io_executor_lock:
+            if _io_executor is None:
+                workers = getattr(settings, 'MUSIC_ASYNC_IO_WORKERS', DEFAULT_ASYNC_IO_WORKERS)
+                _io_executor = ThreadPoolExecutor(
+                    max_workers=max(int(workers), 1),
+                    thread_name_prefix='music-io',
+                )
+    return _io_executor
+
+
+async def run_in_io_executor(func, *args):
+    """在文件读取线程池中执行阻塞函数"""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(get_io_executor(), func, *args)
+
+
+async def aiter_chunks(body):
+    """
+    把同步的块迭代器（RangeFileWrapper / MultipartRangeStream）包装成异步迭代器
+    每次 read 都在有界线程池里完成，慢速客户端只占用一个协程而不是一个线程
+    读完后关闭 body；没有读完时（客户端提前断开）由 AsyncBody.close() 关闭
+    """
+    iterator = iter(body)
+    try:
+        while True:
+            chunk = await run_in_io_executor(next, iterator, None)
+            if chunk is None:
+                break
+            yield chunk
+    finally:
+        body.close()
+
+
+class AsyncBody:
+    """
+    StreamingHttpResponse 使用的异步响应体：按 aiter_chunks 输出 body，
+    并提供 close()，响应会把它登记为 closer，客户端提前断开、迭代器没有读完时也会关闭 body
+    （释放文件句柄、活动流计数和限流名额）
+    """
+
+    def __init__(self, body):
+        self.body = body
+
+    def __aiter__(self):
+        return aiter_chunks(self.body)
+
+    def close(self):
+        self.body.close()
+
+
+def stream_view(view):
+    """
+    标记长时间流式输出的异步视图
+    StreamingASGIHandler 不会为这类请求创建每请求独占的同步线程，
+    视图里少量的 ORM 调用改在全局共享的同步线程中执行
+    """
+    view.stream_view = True
+    return view
+
+
+class StreamingASGIHandler(ASGIHandler):
+    """
+    Django 的 ASGIHandler 会给每个请求开一个 ThreadSensitiveContext，
+    只要请求里调用过同步代码（request_started 信号、ORM），就会有一个线程一直挂到响应结束。
+    对于要持续几分钟的音频流，这等于每个连接占一个线程，
+    所以标记了 stream_view 的视图跳过这个上下文，其它请求保持原样
+    """
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] == 'http' and self._is_stream_view(scope):
+            await self.handle(scope, receive, send)
+        else:
+            await super().__call__(scope, receive, send)
+
+    @staticmethod
+    def _is_stream_view(scope):
+        path = scope.get('path', '')
+        root_path = scope.get('root_path', '')
+        if root_path and path.startswith(root_path):
+            path = path[len(root_path):]
+        try:
+            match = resolve(path)
+        except Resolver404:
+            return False
+        return getattr(match.func, 'stream_view', False)
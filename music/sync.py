@@ -0,0 +1,230 @@
+# music/sync.py
+"""
+按文件系统的变化同步 Music 记录（sync_music_library 命令使用）
+不区分事件类型，只看磁盘上的现状：
+- 存在的文件：没有记录则新增，大小或修改时间变了则重新解析标签
+- 消失的文件：删除记录（或标记为不可用）
+- 新出现的文件和消失的记录大小、修改时间都相同时视为移动，只更新路径，保留原记录
+"""
+import os
+from django.db import transaction
+from django.db.models import Q
+from django.utils import timezone
+from .catalog import bump_catalog_version
+from .importer import (
+    DEFAULT_BATCH_SIZE, ImportStats, SUPPORTED_FORMATS, _chunks, _new_music, iter_extracted, scan_audio_files,
+)
+from .metadata import extract_track
+from .models import LibraryFile, Music
+from .pagination import invalidate_music_count
+from .search import index_music
+from .utils import ResolvedFile, invalidate_music_file_path
+
+
+class SyncStats:
+    """一次同步的计数"""
+
+    def __init__(self):
+        self.created = 0
+        self.updated = 0
+        self.moved = 0
+        self.removed = 0
+        self.unchanged = 0
+        self.skipped = 0
+        self.unreadable = 0
+
+    @property
+    def changed(self):
+        return self.created + self.updated + self.moved + self.removed
+
+    def __str__(self):
+        return (
+            f'created {self.created}, updated {self.updated}, moved {self.moved}, '
+            f'removed {self.removed}, unchanged {self.unchanged}, skipped {self.skipped}, unreadable {self.unreadable}'
+        )
+
+
+class LibrarySync:
+    """
+    把一批变化（文件路径 / 目录）应用到 Music 和扫描清单 LibraryFile
+    每 batch_size 个路径一个事务；delete_missing=False 时消失的文件只标记为不可用
+    """
+
+    def __init__(self, batch_size=DEFAULT_BATCH_SIZE, workers=1, delete_missing=True,
+                 formats=SUPPORTED_FORMATS, extract=extract_track):
+        self.batch_size = max(batch_size, 1)
+        self.workers = workers
+        self.delete_missing = delete_missing
+        self.formats = formats
+        self.extract = extract
+
+    def sync(self, files=(), dirs=()):
+        """files：可能变化的文件路径；dirs：需要整体对比的目录。返回 SyncStats"""
+        stats = SyncStats()
+        present = {}
+        gone = set()
+        for path in files:
+            path = os.path.abspath(path)
+            if os.path.splitext(path)[1].lower() not in self.formats:
+                continue
+            try:
+                st = os.stat(path)
+            except OSError:
+                gone.add(path)
+                continue
+            present[path] = (st.st_size, st.st_mtime)
+        for folder in dirs:
+            folder = os.path.abspath(folder)
+            unreadable = set()
+            scanned = {
+                path: (size, mtime)
+                for path, size, mtime in scan_audio_files(folder, ImportStats(), self.formats, unreadable=unreadable)
+            }
+            present.update(scanned)
+            # 读不到的目录（权限、I/O 错误）不能当成里面的文件都被删除，这些记录保持不变
+            stats.unreadable += len(unreadable)
+            prefixes = tuple(os.path.join(path, '') for path in unreadable)
+            known = Music.objects.filter(file_path__startswith=os.path.join(folder, '')).values_list('file_path', flat=True)
+            gone.update(
+                path for path in known.iterator()
+                if path not in scanned and path not in unreadable and not path.startswith(prefixes)
+            )
+        gone -= set(present)
+
+        paths = list(present)
+        for chunk in _chunks(paths, self.batch_size):
+            self._sync_present({path: present[path] for path in chunk}, gone, stats)
+        for chunk in _chunks(sorted(gone), self.batch_size):
+            self._remove(chunk, stats)
+        return stats
+
+    def _sync_present(self, present, gone, stats):
+        rows = {
+            music.file_path: music
+            for music in Music.objects.filter(file_path__in=list(present)).only('id', 'file_path', *Music.FILE_FACT_FIELDS)
+        }
+        now = timezone.now()
+        new_paths = []
+        changed = []
+        for path, facts in present.items():
+            music = rows.get(path)
+            if music is None:
+                new_paths.append(path)
+            elif (music.size_bytes, music.file_mtime) == facts and music.file_available:
+                stats.unchanged += 1
+            else:
+                changed.append(path)
+
+        moved = self._match_moves(new_paths, present, gone, now)
+        moved_paths = {music.file_path for music, _ in moved}
+        new_paths = [path for path in new_paths if path not in moved_paths]
+
+        # 新文件和内容变化的文件才解析标签（复用导入流程的 extract_track / get_music_metadata）
+        parsed = {
+            file_path: (metadata, size, mtime)
+            for file_path, metadata, size, mtime in iter_extracted(new_paths + changed, self.workers, self.extract)
+        }
+        updated = []
+        for path in changed:
+            metadata, size, mtime = parsed[path]
+            music = rows[path]
+            music.name = metadata['name']
+            music.singer = metadata['singer']
+            music.album = metadata['album']
+            music.set_file_facts(ResolvedFile(path, size, mtime) if size is not None else None, now)
+            music.set_audio_facts(metadata.get('audio'))
+            music.fingerprint = metadata.get('fingerprint')
+            # 标签可能变了，封面在下次请求时重新提取
+            music.cover = None
+            updated.append(music)
+        created = self._dedupe([_new_music(path, *parsed[path]) for path in new_paths], stats)
+
+        if not (created or updated or moved):
+            return
+        with transaction.atomic():
+            Music.objects.bulk_create(created, batch_size=self.batch_size)
+            Music.objects.bulk_update(
+                updated, ['name', 'singer', 'album', 'fingerprint', 'cover', *Music.FILE_FACT_FIELDS, *Music.AUDIO_FACT_FIELDS]
+            )
+            Music.objects.bulk_update([music for music, _ in moved], ['file_path', *Music.FILE_FACT_FIELDS])
+            index_music(created + updated)
+            # 清单先删除再插入：MySQL 不支持带 unique_fields 的 bulk_create(update_conflicts=True)
+            touched = created + updated + [music for music, _ in moved]
+            LibraryFile.objects.filter(
+                path__in=[old for _, old in moved] + [music.file_path for music in touched]
+            ).delete()
+            LibraryFile.objects.bulk_create([
+                LibraryFile(path=music.file_path, size=music.size_bytes, mtime=music.file_mtime, scanned_at=now)
+                for music in touched
+                if music.size_bytes is not None
+            ])
+        stats.created += len(created)
+        stats.updated += len(updated)
+        stats.moved += len(moved)
+        invalidate_music_file_path(*[m.file_path for m in created + updated], *[old for _, old in moved])
+        if created:
+            invalidate_music_count()
+        bump_catalog_version()
+
+    def _match_moves(self, new_paths, present, gone, now):
+        """在消失的记录中找大小和修改时间相同的，视为被移动（重命名保留修改时间）；返回 [(music, 原路径)]"""
+        if not new_paths or not gone:
+            return []
+        candidates = {}
+        sizes = {present[path][0] for path in new_paths}
+        for chunk in _chunks(sorted(gone), self.batch_size):
+            for music in Music.objects.filter(file_path__in=chunk, size_bytes__in=sizes).only(
+                'id', 'file_path', *Music.FILE_FACT_FIELDS
+            ):
+                candidates.setdefault((music.size_bytes, music.file_mtime), []).append(music)
+
+        moved = []
+        for path in new_paths:
+            matches = candidates.get(present[path])
+            if not matches:
+                continue
+            music = matches.pop(0)
+            old_path = music.file_path
+            gone.discard(old_path)
+            music.file_path = path
+            music.set_file_facts(ResolvedFile(path, *present[path]), now)
+            moved.append((music, old_path))
+        return moved
+
+    def _dedupe(self, musics, stats):
+        """与导入流程一致：已有相同 (歌曲名, 歌手) 的不重复添加"""
+        if not musics:
+            return []
+        query = Q()
+        for music in musics:
+            query |= Q(name=music.name, singer=music.singer)
+        existing = set(Music.objects.filter(query).values_list('name', 'singer'))
+        result = []
+        for music in musics:
+            key = (music.name, music.singer)
+            if key in existing:
+                stats.skipped += 1
+                continue
+            existing.add(key)
+            result.append(music)
+        return result
+
+    def _remove(self, paths, stats):
+        now = timezone.now()
+        with transaction.atomic():
+            rows = Music.objects.filter(file_path__in=paths)
+            if self.delete_missing:
+                # 逐条触发 post_delete 信号，搜索词项随记录级联删除
+                _, deleted = rows.delete()
+                count = deleted.get(Music._meta.label, 0)
+            else:
+                count = rows.filter(file_available=True).update(
+                    resolved_path=None, size_bytes=None, file_mtime=None,
+                    file_available=False, verified_at=now,
+                )
+            LibraryFile.objects.filter(path__in=paths).delete()
+        stats.removed += count
+        if count:
+            invalidate_music_file_path(*paths)
+            invalidate_music_count()
+            bump_catalog_version()
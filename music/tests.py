@@ -1,3 +1,1189 @@
-from django.test import TestCase
+import os
+import re
+import shutil
+import tempfile
+import time
+import tracemalloc
+from datetime import timedelta
+from io import StringIO
+from unittest import mock
 
-# Create your tests here.
+from django.core.cache import cache, caches
+from django.core.management import call_command
+from django.core.signals import request_finished
+from django.db import DatabaseError, close_old_connections, connection
+from django.db.models import F
+from django.http import FileResponse
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+from mutagen.id3 import APIC, ID3
+
+from .benchmark import compare_results, run_suite, write_mp3
+from .blockcache import block_cache
+from .catalog import forget_catalog_version
+from .covers import CoverCache, cover_cache
+from .readahead import readahead_scheduler
+from .search import search_music
+from .importer import import_folder
+from .metadata import extract_track_from_filename
+from .pathfix import MediaIndex
+from .models import CatalogVersion, ImportJob, LibraryFile, Music, SearchTerm, SeekIndex
+from .seektable import scan_mp3, unpack_offsets
+from .sync import LibrarySync
+from .throttle import stream_throttle
+from .utils import get_music_file_path, path_cache
+from .watcher import FILE, make_watcher
+
+
+def close_response(response):
+    """
+    关闭流式响应（释放文件句柄、活动流计数和限流名额），模拟客户端断开
+    直接调用 response.close() 会触发 close_old_connections，关闭 TestCase 事务所在的数据库连接，
+    之后的查询在 MySQL、磁盘上的 SQLite 等数据库上会出错，所以关闭时先断开它（和测试客户端的做法相同）
+    测试客户端包装的迭代器要先结束：它结束时会重新连接 close_old_connections，
+    没读完就留着的话，被回收时才执行的这段清理会打乱信号的连接状态
+    """
+    response._iterator.close()
+    request_finished.disconnect(close_old_connections)
+    try:
+        response.close()
+    finally:
+        request_finished.connect(close_old_connections)
+
+
+class AudioFileTestCase(TestCase):
+    """在临时目录里准备一个 16MB 的音频文件和对应的 Music 记录"""
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.tmpdir = tempfile.mkdtemp()
+        cls.file_path = os.path.join(cls.tmpdir, 'big.mp3')
+        # 16MB 的测试文件，内容为可预测的字节序列
+        block = bytes(range(256)) * 4096
+        with open(cls.file_path, 'wb') as fh:
+            for _ in range(16):
+                fh.write(block)
+        cls.file_size = os.path.getsize(cls.file_path)
+
+    @classmethod
+    def tearDownClass(cls):
+        shutil.rmtree(cls.tmpdir, ignore_errors=True)
+        super().tearDownClass()
+
+    def setUp(self):
+        self.music = Music.objects.create(name='晴天', singer='周杰伦', file_path=self.file_path)
+        self.url = reverse('play_music', args=[self.music.id])
+
+
+class PlayMusicStreamingTests(AudioFileTestCase):
+    """play_music 流式传输相关测试"""
+
+    def test_range_content(self):
+        response = self.client.get(self.url, HTTP_RANGE='bytes=100-299')
+        self.assertEqual(response.status_code, 206)
+        self.assertEqual(response['Content-Range'], f'bytes 100-299/{self.file_size}')
+        self.assertEqual(response['Content-Length'], '200')
+        body = b''.join(response.streaming_content)
+        self.assertEqual(body, (bytes(range(256)) * 2)[100:300])
+
+    def test_range_memory_is_constant(self):
+        """bytes=0- 请求整个文件时，峰值内存不应随文件大小增长（关闭块缓存，只看单个连接）"""
+        tracemalloc.start()
+        try:
+            with mock.patch.object(block_cache, 'max_bytes', 0):
+                response = self.client.get(self.url, HTTP_RANGE='bytes=0-')
+                total = 0
+                for chunk in response.streaming_content:
+                    total += len(chunk)
+            _, peak = tracemalloc.get_traced_memory()
+        finally:
+            tracemalloc.stop()
+        close_response(response)
+
+        self.assertEqual(response.status_code, 206)
+        self.assertEqual(total, self.file_size)
+        self.assertLess(peak, 1024 * 1024)
+
+    async def test_async_range_content(self):
+        url = reverse('play_music_async', args=[self.music.id])
+        response = await self.async_client.get(url, headers={'Range': 'bytes=100-299'})
+        self.assertEqual(response.status_code, 206)
+        self.assertEqual(response['Content-Length'], '200')
+        body = b''.join([chunk async for chunk in response.streaming_content])
+        self.assertEqual(body, (bytes(range(256)) * 2)[100:300])
+
+
+class StreamThrottleTests(AudioFileTestCase):
+    """音频传输限流相关测试"""
+
+    def throttle(self, **limits):
+        for name, value in dict(limits, _clients={}, active=0).items():
+            patcher = mock.patch.object(stream_throttle, name, value)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def get(self, spec, **extra):
+        return self.client.get(self.url, HTTP_RANGE=f'bytes={spec}', **extra)
+
+    def test_concurrent_stream_limits(self):
+        self.throttle(client_streams=1, max_streams=2)
+        first = self.get('0-99')
+        self.assertEqual(first.status_code, 206)
+        rejected = self.get('0-99')
+        self.assertEqual(rejected.status_code, 429)
+        self.assertEqual(rejected['Retry-After'], '5')
+
+        # 经可信代理转发的其它客户端不受影响，直到全局名额用完
+        other = self.get('0-99', HTTP_X_FORWARDED_FOR='10.0.0.2')
+        self.assertEqual(other.status_code, 206)
+        self.assertEqual(self.get('0-99', HTTP_X_FORWARDED_FOR='10.0.0.3').status_code, 503)
+
+        close_response(first)
+        close_response(other)
+        self.assertEqual(self.get('0-99').status_code, 206)
+
+    def test_bandwidth_bucket(self):
+        self.throttle(rate=100000, burst=100000)
+        # 余额为正时可以透支；只读了一部分就断开的请求退回没有发送的字节
+        response = self.get('0-199999')
+        next(iter(response.streaming_content))
+        close_response(response)
+        response = self.get('0-199999')
+        self.assertEqual(response.status_code, 206)
+        b''.join(response.streaming_content)
+        close_response(response)
+
+        rejected = self.get('0-99')
+        self.assertEqual(rejected.status_code, 429)
+        self.assertEqual(rejected.json()['reason'], 'bandwidth')
+        self.assertIn(int(rejected['Retry-After']), (1, 2))
+
+    async def test_async_disconnect_releases_stream(self):
+        self.throttle(client_streams=1)
+        url = reverse('play_music_async', args=[self.music.id])
+
+        async def chunks(body):
+            # 不关闭 body：断开时 aiter_chunks 的 finally 要等迭代器被回收才执行，不能依赖它
+            yield next(iter(body))
+
+        with mock.patch('music.streaming.aiter_chunks', chunks):
+            response = await self.async_client.get(url, headers={'Range': 'bytes=0-99999'})
+        # 客户端断开：异步迭代器没有读完，关闭响应时仍要释放名额（见 close_response）
+        await anext(response._iterator)
+        await response._iterator.aclose()
+        response = await self.async_client.get(url, headers={'Range': 'bytes=0-99'})
+        self.assertEqual(response.status_code, 206)
+        b''.join([chunk async for chunk in response.streaming_content])
+
+    def test_head_and_unread_streams_are_not_charged(self):
+        self.throttle(rate=100000, burst=100000)
+        # HEAD 不传输数据；没有读出任何数据就断开的请求退回全部预扣的字节
+        close_response(self.client.head(self.url))
+        close_response(self.get('0-199999'))
+        self.assertEqual(self.get('0-99').status_code, 206)
+
+        # fileno() 交给服务器后（sendfile）无法得知发送了多少，按全部发送计算
+        with mock.patch.object(block_cache, 'max_bytes', 0), \
+                mock.patch('music.views.FileResponse', wraps=FileResponse) as file_response:
+            response = self.get('0-199999')
+            file_response.call_args.args[0].fileno()
+            close_response(response)
+        self.assertEqual(self.get('0-99').status_code, 429)
+
+
+class BlockCacheTests(AudioFileTestCase):
+    """音频数据块缓存相关测试"""
+
+    def setUp(self):
+        super().setUp()
+        block_cache.clear()
+        self.addCleanup(block_cache.clear)
+        # 用小块测试跨块读取和淘汰
+        for name, value in (('block_size', 1000), ('head_bytes', 3000), ('max_bytes', 10000)):
+            patcher = mock.patch.object(block_cache, name, value)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def get(self, spec):
+        response = self.client.get(self.url, HTTP_RANGE=f'bytes={spec}')
+        body = b''.join(response.streaming_content)
+        close_response(response)
+        return body
+
+    def test_head_served_from_memory(self):
+        expected = (bytes(range(256)) * 20)[500:2500]
+        self.assertEqual(self.get('500-2499'), expected)
+
+        # 开头的块第一次读取就缓存，再次播放不打开文件
+        with mock.patch('builtins.open', side_effect=AssertionError('disk read')):
+            self.assertEqual(self.get('500-2499'), expected)
+        self.assertEqual(block_cache.stats()['bytes'], 3000)
+
+    def test_admission_and_memory_cap(self):
+        # 开头以外的块第二次读取才缓存，总大小不超过上限
+        self.get('5000-5999')
+        self.assertEqual(len(block_cache), 0)
+        for _ in range(2):
+            self.assertEqual(self.get('5000-20999'), (bytes(range(256)) * 100)[5000 % 256:5000 % 256 + 16000])
+        self.assertEqual(block_cache.stats()['bytes'], 10000)
+
+    def test_replaced_file_is_not_served_stale(self):
+        self.get('0-99')
+        stat = os.stat(self.file_path)
+        os.utime(self.file_path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10 ** 9))
+        self.addCleanup(os.utime, self.file_path, ns=(stat.st_atime_ns, stat.st_mtime_ns))
+        misses = block_cache.stats()['misses']
+        self.get('0-99')
+        self.assertEqual(block_cache.stats()['misses'], misses + 1)
+
+
+class ReadaheadTests(AudioFileTestCase):
+    """下一首预读相关测试"""
+
+    def setUp(self):
+        super().setUp()
+        path_cache.invalidate()
+        block_cache.clear()
+        self.addCleanup(block_cache.clear)
+
+    def test_announced_track_starts_from_memory(self):
+        missing = Music.objects.create(name='稻香', file_path=os.path.join(self.tmpdir, 'missing.mp3'))
+        url = reverse('readahead')
+        response = self.client.get(url, {'ids': f'{self.music.id},{missing.id},999999'})
+        self.assertEqual(response.status_code, 202)
+        self.assertEqual(response.json(), {'scheduled': 2})
+        self.assertTrue(readahead_scheduler.join(timeout=10))
+
+        with mock.patch('builtins.open', side_effect=AssertionError('disk read')):
+            response = self.client.get(self.url, HTTP_RANGE='bytes=0-99')
+            self.assertEqual(b''.join(response.streaming_content), bytes(range(100)))
+        close_response(response)
+        self.assertEqual(self.client.get(url, {'ids': 'x'}).status_code, 400)
+
+
+class PlayMusicConditionalTests(AudioFileTestCase):
+    """play_music 条件请求和多段 Range 相关测试"""
+
+    def test_validators_and_not_modified(self):
+        response = self.client.get(self.url)
+        close_response(response)
+        etag = response['ETag']
+        last_modified = response['Last-Modified']
+
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response['ETag'], etag)
+
+        response = self.client.get(self.url, HTTP_IF_MODIFIED_SINCE=last_modified)
+        self.assertEqual(response.status_code, 304)
+
+    def test_if_range(self):
+        response = self.client.get(self.url)
+        close_response(response)
+        etag = response['ETag']
+
+        response = self.client.get(self.url, HTTP_RANGE='bytes=0-9', HTTP_IF_RANGE=etag)
+        self.assertEqual(response.status_code, 206)
+        close_response(response)
+
+        # ETag 不匹配时忽略 Range，返回完整文件
+        response = self.client.get(self.url, HTTP_RANGE='bytes=0-9', HTTP_IF_RANGE='"stale"')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['Content-Length'], str(self.file_size))
+        close_response(response)
+
+    def test_multiple_ranges(self):
+        response = self.client.get(self.url, HTTP_RANGE='bytes=0-9, 20-29, 25-39')
+        self.assertEqual(response.status_code, 206)
+        content_type = response['Content-Type']
+        self.assertTrue(content_type.startswith('multipart/byteranges; boundary='))
+        boundary = content_type.split('boundary=')[1]
+
+        body = b''.join(response.streaming_content)
+        self.assertEqual(len(body), int(response['Content-Length']))
+        # 20-29 和 25-39 合并成一段
+        self.assertEqual(body.count(f'--{boundary}\r\n'.encode()), 2)
+        self.assertIn(f'Content-Range: bytes 20-39/{self.file_size}'.encode(), body)
+        self.assertIn(b'\r\n\r\n' + bytes(range(20, 40)) + b'\r\n', body)
+        self.assertTrue(body.endswith(f'--{boundary}--\r\n'.encode()))
+
+    def test_unsatisfiable_range(self):
+        response = self.client.get(self.url, HTTP_RANGE=f'bytes={self.file_size}-')
+        self.assertEqual(response.status_code, 416)
+        self.assertEqual(response['Content-Range'], f'bytes */{self.file_size}')
+
+
+class PlayMusicOffloadTests(AudioFileTestCase):
+    """X-Accel-Redirect / X-Sendfile 交付模式相关测试"""
+
+    def setUp(self):
+        super().setUp()
+        self.music.file_path = os.path.join(self.tmpdir, '周杰伦', '晴天.mp3')
+        os.makedirs(os.path.dirname(self.music.file_path), exist_ok=True)
+        shutil.copyfile(self.file_path, self.music.file_path)
+        self.music.save()
+
+    def test_x_accel_redirect(self):
+        with self.settings(MUSIC_DELIVERY_MODE='x-accel-redirect',
+                           MUSIC_OFFLOAD_ROOTS={self.tmpdir: '/protected-music/'}):
+            response = self.client.get(self.url, HTTP_RANGE='bytes=0-9')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(
+            response['X-Accel-Redirect'],
+            '/protected-music/%E5%91%A8%E6%9D%B0%E4%BC%A6/%E6%99%B4%E5%A4%A9.mp3',
+        )
+        self.assertEqual(response['Content-Type'], 'audio/mpeg')
+        self.assertIn('ETag', response)
+        self.assertEqual(response.content, b'')
+
+    def test_x_sendfile(self):
+        with self.settings(MUSIC_DELIVERY_MODE='x-sendfile',
+                           MUSIC_OFFLOAD_ROOTS={self.tmpdir: ''}):
+            response = self.client.get(self.url)
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response['X-Sendfile'].endswith('/%E5%91%A8%E6%9D%B0%E4%BC%A6/%E6%99%B4%E5%A4%A9.mp3'))
+
+    def test_fallback_outside_roots(self):
+        with self.settings(MUSIC_DELIVERY_MODE='x-accel-redirect',
+                           MUSIC_OFFLOAD_ROOTS={'/nonexistent-root': '/protected-music/'}):
+            response = self.client.get(self.url, HTTP_RANGE='bytes=0-9')
+        self.assertEqual(response.status_code, 206)
+        self.assertNotIn('X-Accel-Redirect', response)
+        self.assertEqual(b''.join(response.streaming_content), bytes(range(10)))
+
+
+class PathCacheTests(AudioFileTestCase):
+    """get_music_file_path 缓存相关测试"""
+
+    def setUp(self):
+        super().setUp()
+        path_cache.invalidate()
+
+    def test_warm_list_render_has_no_filesystem_calls(self):
+        self.client.get(reverse('music_list'))
+        with mock.patch('music.utils.os.stat', side_effect=os.stat) as stat:
+            response = self.client.get(reverse('music_list'))
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(response, '文件存在')
+        self.assertEqual(stat.call_count, 0)
+
+    def test_negative_cache_and_invalidation(self):
+        missing = os.path.join(self.tmpdir, 'missing.mp3')
+        self.music.file_path = missing
+        self.music.save()
+        self.assertIsNone(get_music_file_path(self.music))
+
+        # 负缓存：文件出现后，在失效之前仍然返回 None
+        shutil.copyfile(self.file_path, missing)
+        self.assertIsNone(get_music_file_path(self.music))
+
+        # 保存记录会触发信号，丢弃缓存
+        self.music.save()
+        self.assertEqual(get_music_file_path(self.music), missing)
+
+    def test_batch_check_files(self):
+        missing = Music.objects.create(name='稻香', singer='周杰伦', file_path=os.path.join(self.tmpdir, 'missing.mp3'))
+        url = reverse('check_files_exist')
+        ids = f'{self.music.id},{missing.id},999999'
+
+        with self.assertNumQueries(1):
+            data = self.client.get(url, {'ids': ids}).json()
+        self.assertEqual(data['files'], {str(self.music.id): True, str(missing.id): False})
+        self.assertEqual(data['unknown'], [999999])
+
+        # 第二次全部命中缓存，不再访问文件系统
+        with mock.patch('music.utils.os.stat', side_effect=os.stat) as stat:
+            again = self.client.post(url, {'ids': ids}).json()
+        self.assertEqual(again, data)
+        self.assertEqual(stat.call_count, 0)
+
+        self.assertEqual(self.client.get(url, {'ids': '1,x'}).status_code, 400)
+
+
+class FixFilePathsTests(TestCase):
+    """fix_file_paths 按文件名索引修复路径相关测试"""
+
+    def setUp(self):
+        self.root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.root, ignore_errors=True)
+        for rel in ('a/稻香.mp3', 'old/x/同名.mp3', 'new/y/同名.mp3', 'p/晴天.mp3', 'q/晴天.mp3'):
+            path = os.path.join(self.root, rel)
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            with open(path, 'wb') as fh:
+                fh.write(b'x' * 10)
+
+    def fix(self, *args):
+        out = StringIO()
+        with override_settings(MEDIA_ROOT=self.root):
+            call_command('fix_file_paths', *args, '--batch-size', '2', stdout=out)
+        return out.getvalue()
+
+    def test_index_lookup_and_bulk_apply(self):
+        ok = Music.objects.create(name='a', file_path=os.path.join(self.root, 'a', '稻香.mp3'))
+        nested = Music.objects.create(name='b', file_path='D:\\music\\稻香.mp3')
+        # 同名文件有多个时，按末尾目录选出唯一的一个
+        by_dir = Music.objects.create(name='c', file_path='E:\\backup\\y\\同名.mp3')
+        ambiguous = Music.objects.create(name='d', file_path='/gone/晴天.mp3')
+        missing = Music.objects.create(name='e', file_path='/gone/不存在.mp3')
+
+        output = self.fix()
+        self.assertIn('Fixable: 2', output)
+        self.assertIn('Ambiguous (not fixed): 1', output)
+        self.assertIn('Not found / empty: 1', output)
+        self.assertEqual(Music.objects.get(pk=nested.pk).file_path, 'D:\\music\\稻香.mp3')
+
+        with self.assertNumQueries(5):
+            # 一次流式读取 + 一次批量更新（包在事务的保存点里），不再逐条 save()；最后递增数据库中的曲库版本号
+            output = self.fix('--apply')
+        self.assertIn('Fixed (applied): 2', output)
+        self.assertEqual(Music.objects.get(pk=nested.pk).file_path, os.path.join(self.root, 'a', '稻香.mp3'))
+        fixed = Music.objects.get(pk=by_dir.pk)
+        self.assertEqual(fixed.file_path, os.path.join(self.root, 'new', 'y', '同名.mp3'))
+        self.assertTrue(fixed.file_available)
+        self.assertEqual(fixed.size_bytes, 10)
+        for music in (ok, ambiguous, missing):
+            self.assertEqual(Music.objects.get(pk=music.pk).file_path, music.file_path)
+
+    def test_symlinked_directories(self):
+        target = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, target, ignore_errors=True)
+        with open(os.path.join(target, '七里香.mp3'), 'wb') as fh:
+            fh.write(b'x' * 10)
+        os.symlink(target, os.path.join(self.root, 'album'))
+        # 指向上级目录的链接不会让遍历陷入死循环
+        os.symlink(self.root, os.path.join(self.root, 'a', 'loop'))
+        linked = os.path.join(self.root, 'album', '七里香.mp3')
+
+        index = MediaIndex([self.root])
+        self.assertEqual(index.lookup_basename('七里香.mp3'), [linked])
+        self.assertTrue(index.exists(linked))
+        # 已遍历过的目录经另一个链接到达时不重复索引，但仍然存在
+        self.assertEqual(index.files, 6)
+        self.assertTrue(index.exists(os.path.join(self.root, 'a', 'loop', 'p', '晴天.mp3')))
+
+        # 链接目录中存在的文件不能被改成别处的同名文件
+        os.makedirs(os.path.join(self.root, 'other'))
+        with open(os.path.join(self.root, 'other', '七里香.mp3'), 'wb') as fh:
+            fh.write(b'x' * 10)
+        music = Music.objects.create(name='f', file_path=linked)
+        self.fix('--apply')
+        self.assertEqual(Music.objects.get(pk=music.pk).file_path, linked)
+
+
+class MetricsTests(AudioFileTestCase):
+    """请求指标和 /metrics 接口相关测试"""
+
+    def active_streams(self):
+        text = self.client.get(reverse('metrics')).content.decode()
+        return int(re.search(r'^music_active_streams (\d+)$', text, re.M).group(1))
+
+    def test_metrics_endpoint(self):
+        streams = self.active_streams()
+        self.client.get(reverse('music_list'))
+        response = self.client.get(self.url, HTTP_RANGE='bytes=0-99')
+        b''.join(response.streaming_content)
+        close_response(response)
+
+        response = self.client.get(reverse('metrics'))
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response['Content-Type'].startswith('text/plain'))
+        text = response.content.decode()
+        self.assertIn('music_http_requests_total{view="music_list",status="200"}', text)
+        self.assertIn('music_db_queries_per_request_count{view="music_list"}', text)
+        self.assertIn('music_http_request_duration_seconds_bucket{view="play_music",le="+Inf"}', text)
+        self.assertRegex(text, r'music_audio_bytes_served_total\{kind="range"\} [1-9]')
+        self.assertRegex(text, r'music_path_cache_lookups_total\{result="(hit|miss)"\} [1-9]')
+        # 响应体已经关闭，不再计入活动流
+        self.assertEqual(self.active_streams(), streams)
+
+
+class FileFactsTests(AudioFileTestCase):
+    """存储的文件信息字段和 verify_music_files 命令相关测试"""
+
+    def test_verify_command_fills_file_facts(self):
+        missing = Music.objects.create(name='丢失', singer='未知歌手', file_path='/nonexistent/a.mp3')
+        call_command('verify_music_files', stdout=StringIO())
+
+        self.music.refresh_from_db()
+        self.assertTrue(self.music.file_available)
+        self.assertEqual(self.music.resolved_path, self.file_path)
+        self.assertEqual(self.music.size_bytes, self.file_size)
+        self.assertIsNotNone(self.music.verified_at)
+        missing.refresh_from_db()
+        self.assertFalse(missing.file_available)
+
+        # 刚校验过的记录不会在下一轮被重复处理
+        out = StringIO()
+        call_command('verify_music_files', stdout=out)
+        self.assertIn('Verified: 0', out.getvalue())
+
+    def test_list_render_uses_stored_facts(self):
+        call_command('verify_music_files', stdout=StringIO())
+        self.client.get(reverse('music_list'))
+        # 清空路径缓存后渲染列表页，文件状态只能来自数据库
+        path_cache.invalidate()
+        with mock.patch('music.utils.os.stat', side_effect=os.stat) as stat:
+            response = self.client.get(reverse('music_list'))
+        self.assertContains(response, '文件存在')
+        self.assertEqual(stat.call_count, 0)
+
+
+class ImportPipelineTests(TestCase):
+    """批量导入流程相关测试"""
+
+    def setUp(self):
+        self.folder = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.folder, ignore_errors=True)
+        for i, name in enumerate(['周杰伦-晴天.mp3', '周杰伦-七里香.flac', 'cover.jpg']):
+            with open(os.path.join(self.folder, name), 'wb') as fh:
+                fh.write(bytes([i]) * 128)
+        os.makedirs(os.path.join(self.folder, 'copy'))
+        shutil.copyfile(os.path.join(self.folder, '周杰伦-晴天.mp3'),
+                        os.path.join(self.folder, 'copy', '周杰伦-晴天.mp3'))
+
+    def test_import_folder(self):
+        Music.objects.create(name='周杰伦-七里香', singer='未知歌手', file_path='/old/七里香.flac')
+        with mock.patch('builtins.print'):
+            stats = import_folder(self.folder, workers=1, batch_size=1)
+
+        self.assertEqual(stats.total, 4)
+        self.assertEqual(stats.imported, 1)
+        # cover.jpg、已存在的七里香、重复的晴天
+        self.assertEqual(stats.skipped, 3)
+        music = Music.objects.get(name='周杰伦-晴天')
+        self.assertTrue(music.file_available)
+        self.assertEqual(music.size_bytes, 128)
+
+    def test_incremental_import(self):
+        extract = mock.Mock(side_effect=extract_track_from_filename)
+        stats = import_folder(self.folder, workers=1, incremental=True, extract=extract)
+        self.assertEqual(stats.imported, 2)
+        self.assertEqual(extract.call_count, 3)
+
+        # 没有任何变化时不解析任何文件
+        extract.reset_mock()
+        stats = import_folder(self.folder, workers=1, incremental=True, extract=extract)
+        self.assertEqual(extract.call_count, 0)
+        self.assertEqual(stats.unchanged, 3)
+
+        # 删除一个文件、修改一个文件
+        os.remove(os.path.join(self.folder, '周杰伦-七里香.flac'))
+        with open(os.path.join(self.folder, 'copy', '周杰伦-晴天.mp3'), 'ab') as fh:
+            fh.write(b'\0')
+        stats = import_folder(self.folder, workers=1, incremental=True, extract=extract)
+        self.assertEqual(extract.call_count, 1)
+        self.assertEqual(stats.missing, 1)
+        self.assertFalse(Music.objects.get(name='七里香').file_available)
+
+    def test_imported_tracks_are_searchable_without_returned_pks(self):
+        # MySQL 上 bulk_create 不回填主键
+        bulk_create = Music.objects.bulk_create
+
+        def without_pks(objs, *args, **kwargs):
+            created = bulk_create(objs, *args, **kwargs)
+            for music in created:
+                music.pk = None
+            return created
+
+        with mock.patch.object(Music.objects, 'bulk_create', side_effect=without_pks):
+            import_folder(self.folder, workers=1, extract=extract_track_from_filename)
+        music = Music.objects.get(name='晴天')
+        self.assertEqual(search_music('晴天', ['id'], 10), [[music.id]])
+
+    def test_bad_row_does_not_fail_its_batch(self):
+        bulk_create = Music.objects.bulk_create
+
+        def reject_qilixiang(objs, *args, **kwargs):
+            if any(music.name == '七里香' for music in objs):
+                raise DatabaseError('Data too long for column')
+            return bulk_create(objs, *args, **kwargs)
+
+        with mock.patch.object(Music.objects, 'bulk_create', side_effect=reject_qilixiang), \
+                mock.patch('builtins.print'):
+            stats = import_folder(self.folder, workers=1, incremental=True, extract=extract_track_from_filename)
+        self.assertEqual((stats.imported, stats.failed), (1, 1))
+        self.assertEqual(list(Music.objects.values_list('name', flat=True)), ['晴天'])
+        self.assertTrue(LibraryFile.objects.filter(path=os.path.join(self.folder, '周杰伦-晴天.mp3')).exists())
+
+        # 失败的文件没有记入扫描清单，下次导入时重试
+        stats = import_folder(self.folder, workers=1, incremental=True, extract=extract_track_from_filename)
+        self.assertEqual(stats.imported, 1)
+        self.assertTrue(Music.objects.filter(name='七里香').exists())
+
+    def test_non_recursive_import_keeps_subfolder_tracks(self):
+        stats = import_folder(self.folder, workers=1, incremental=True, extract=extract_track_from_filename)
+        self.assertEqual(stats.imported, 2)
+        # 网页导入只扫描目录本身，子目录中的文件不能被当成已消失
+        stats = import_folder(self.folder, workers=1, incremental=True, recursive=False,
+                              extract=extract_track_from_filename)
+        self.assertEqual(stats.missing, 0)
+        self.assertFalse(Music.objects.filter(file_available=False).exists())
+        self.assertEqual(LibraryFile.objects.count(), 3)
+
+    def test_import_view_enqueues_job(self):
+        url = reverse('import_music')
+        # 请求只创建任务，导入在事务提交后交给线程池
+        with mock.patch('music.jobs.get_job_executor') as executor:
+            with self.captureOnCommitCallbacks(execute=True):
+                response = self.client.post(url, {'music_folder': self.folder})
+        job = ImportJob.objects.get()
+        self.assertRedirects(response, f'{url}?job={job.pk}')
+        self.assertEqual(job.status, ImportJob.STATUS_PENDING)
+        executor.return_value.submit.assert_called_once()
+        self.assertEqual(Music.objects.count(), 0)
+
+        # 在当前线程执行任务后，轮询接口返回进度
+        with override_settings(MUSIC_IMPORT_JOB_WORKERS=0):
+            response = self.client.post(url, {'music_folder': self.folder}, HTTP_ACCEPT='application/json')
+        self.assertEqual(response.status_code, 202)
+        data = self.client.get(response.json()['status_url']).json()
+        self.assertEqual(data['status'], 'done')
+        self.assertEqual((data['processed'], data['imported'], data['skipped']), (2, 2, 1))
+        self.assertContains(self.client.get(f'{url}?job={data["id"]}'), '已完成')
+
+    def test_import_stores_audio_facts(self):
+        folder = os.path.join(self.folder, 'tagged')
+        os.makedirs(folder)
+        write_mp3(os.path.join(folder, 'a.mp3'), 417 * 100, '稻香', '周杰伦', '魔杰座')
+        import_folder(folder, workers=1)
+        music = Music.objects.get(name='稻香')
+        self.assertEqual((music.codec, music.tag_source, music.bitrate, music.sample_rate), ('mp3', 'id3', 128000, 44100))
+        self.assertAlmostEqual(music.duration, 100 * 1152 / 44100, places=1)
+        self.assertEqual(music.duration_display, '0:03')
+
+    def test_import_skips_identical_audio(self):
+        folder = os.path.join(self.folder, 'tagged')
+        os.makedirs(os.path.join(folder, 'copy'))
+        write_mp3(os.path.join(folder, 'a.mp3'), 417 * 100, '稻香', '周杰伦', '魔杰座')
+        # 同样的音频数据，标签不同
+        write_mp3(os.path.join(folder, 'copy', 'b.mp3'), 417 * 100, '稻香 (Live)', 'Jay Chou', '')
+        stats = import_folder(folder, workers=1)
+        self.assertEqual((stats.imported, stats.skipped), (1, 1))
+        self.assertTrue(Music.objects.get().fingerprint)
+
+        # 已经在曲库中的内容再导入时同样跳过
+        write_mp3(os.path.join(self.folder, 'c.mp3'), 417 * 100, '稻香 (Remaster)', '周杰伦', '')
+        stats = import_folder(self.folder, workers=1, extract=extract_track_from_filename)
+        self.assertEqual(Music.objects.filter(file_path=os.path.join(self.folder, 'c.mp3')).count(), 0)
+
+    def test_find_duplicates_report(self):
+        a = os.path.join(self.folder, 'a.mp3')
+        write_mp3(a, 417 * 100, '稻香', '周杰伦', '魔杰座')
+        b = os.path.join(self.folder, 'copy', 'b.mp3')
+        write_mp3(b, 417 * 100, '稻香 (Live)', '周杰伦', '')
+        Music.objects.create(name='稻香', singer='周杰伦', file_path=a)
+        Music.objects.create(name='稻香 (Live)', singer='周杰伦', file_path=b)
+        Music.objects.create(name='晴天', singer='周杰伦', file_path=os.path.join(self.folder, '周杰伦-晴天.mp3'))
+
+        out = StringIO()
+        call_command('find_duplicates', workers=1, stdout=out)
+        self.assertIn('Duplicate groups: 1', out.getvalue())
+        self.assertIn('Redundant rows: 1', out.getvalue())
+        self.assertEqual(Music.objects.filter(fingerprint__isnull=True).count(), 0)
+
+    def test_backfill_audio_info_resumes(self):
+        path = os.path.join(self.folder, 'a.mp3')
+        write_mp3(path, 417 * 100, '稻香', '周杰伦', '魔杰座')
+        first = Music.objects.create(name='稻香', singer='周杰伦', file_path=path)
+        Music.objects.create(name='消失', singer='周杰伦', file_path=os.path.join(self.folder, 'missing.mp3'))
+        second = Music.objects.create(name='稻香2', singer='周杰伦', file_path=path)
+
+        # 模拟中断：第一次只处理一条
+        out = StringIO()
+        call_command('backfill_audio_info', workers=1, batch_size=1, limit=1, stdout=out)
+        self.assertIn('Filled: 1', out.getvalue())
+        first.refresh_from_db()
+        self.assertEqual((first.codec, first.tag_source), ('mp3', 'id3'))
+
+        out = StringIO()
+        call_command('backfill_audio_info', workers=1, batch_size=1, stdout=out)
+        self.assertIn('Filled: 1', out.getvalue())
+        self.assertIn('Unreadable / missing: 1', out.getvalue())
+        second.refresh_from_db()
+        self.assertEqual(second.bitrate, 128000)
+
+
+class LibrarySyncTests(TestCase):
+    """sync_music_library 增量同步相关测试"""
+
+    def setUp(self):
+        self.folder = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.folder, ignore_errors=True)
+        self.a = os.path.join(self.folder, 'a.mp3')
+        self.b = os.path.join(self.folder, 'b.mp3')
+        write_mp3(self.a, 4096, '晴天', '周杰伦', '叶惠美')
+        write_mp3(self.b, 8192, '稻香', '周杰伦', '魔杰座')
+
+    def test_inserts_moves_updates_and_deletions(self):
+        call_command('sync_music_library', self.folder, '--once', stdout=StringIO())
+        self.assertEqual(Music.objects.count(), 2)
+        qingtian = Music.objects.get(name='晴天')
+        self.assertEqual(LibraryFile.objects.count(), 2)
+
+        # 移动到子目录：保留原记录，只更新路径
+        moved = os.path.join(self.folder, 'sub', 'c.mp3')
+        os.makedirs(os.path.dirname(moved))
+        os.rename(self.a, moved)
+        stats = LibrarySync().sync(files=[self.a], dirs=[os.path.dirname(moved)])
+        self.assertEqual((stats.moved, stats.created, stats.removed), (1, 0, 0))
+        qingtian.refresh_from_db()
+        self.assertEqual(qingtian.file_path, moved)
+        self.assertTrue(LibraryFile.objects.filter(path=moved).exists())
+
+        # 标签变化：重新解析；文件删除：删除记录
+        write_mp3(self.b, 8192, '七里香', '周杰伦', '七里香')
+        os.remove(moved)
+        stats = LibrarySync().sync(files=[self.b, moved])
+        self.assertEqual((stats.updated, stats.removed), (1, 1))
+        self.assertEqual(list(Music.objects.values_list('name', flat=True)), ['七里香'])
+        self.assertFalse(LibraryFile.objects.filter(path=moved).exists())
+
+    def test_sync_without_upsert_support(self):
+        # MySQL 不支持带 unique_fields 的 bulk_create(update_conflicts=True)
+        features = connection.features
+        with mock.patch.object(features, 'supports_update_conflicts_with_target', False), \
+                mock.patch.object(features, 'supports_update_conflicts', False):
+            LibrarySync().sync(dirs=[self.folder])
+            write_mp3(self.b, 8192, '七里香', '周杰伦', '七里香')
+            os.utime(self.b, (1000, 1000))
+            stats = LibrarySync().sync(files=[self.b])
+        self.assertEqual(stats.updated, 1)
+        self.assertEqual(LibraryFile.objects.get(path=self.b).mtime, 1000)
+        self.assertEqual(LibraryFile.objects.count(), 2)
+
+    def test_unreadable_directory_keeps_rows(self):
+        sub = os.path.join(self.folder, 'sub')
+        os.makedirs(sub)
+        write_mp3(os.path.join(sub, 'c.mp3'), 4096, '七里香', '周杰伦', '七里香')
+        LibrarySync().sync(dirs=[self.folder])
+        self.assertEqual(Music.objects.count(), 3)
+
+        scandir = os.scandir
+
+        def denied(path):
+            if path == sub:
+                raise PermissionError(13, 'Permission denied', path)
+            return scandir(path)
+
+        # 子目录读不到时不能当成里面的文件都被删除；真正删除的文件照常处理
+        os.remove(self.b)
+        with mock.patch('os.scandir', side_effect=denied):
+            stats = LibrarySync().sync(dirs=[self.folder])
+        self.assertEqual((stats.removed, stats.unreadable), (1, 1))
+        self.assertEqual(set(Music.objects.values_list('name', flat=True)), {'晴天', '七里香'})
+
+    def test_watcher_reports_changes(self):
+        watcher = make_watcher([self.folder], interval=0.05)
+        self.addCleanup(watcher.close)
+        write_mp3(os.path.join(self.folder, 'new.mp3'), 4096, '新歌', '歌手', '专辑')
+        os.remove(self.b)
+
+        events = set()
+        deadline = time.monotonic() + 5
+        while time.monotonic() < deadline and len(events) < 2:
+            events.update(watcher.read(0.5))
+        self.assertIn((FILE, os.path.join(self.folder, 'new.mp3')), events)
+        self.assertIn((FILE, self.b), events)
+
+
+class SeekIndexTests(TestCase):
+    """MP3 跳转表相关测试"""
+
+    # 44.1kHz MPEG-1 Layer III：128kbps 帧 417 字节，320kbps 帧 1044 字节，每帧 1152 个采样
+    FRAME_128 = b'\xff\xfb\x90\x00' + b'\x00' * 413
+    FRAME_320 = b'\xff\xfb\xe0\x00' + b'\x00' * 1040
+
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.tmpdir, ignore_errors=True)
+        self.path = os.path.join(self.tmpdir, 'vbr.mp3')
+        # ID3v2 标签 + Xing 帧 + 码率交替变化的音频帧 + 中间一段损坏的数据 + ID3v1 标签
+        xing = self.FRAME_128[:36] + b'Xing' + self.FRAME_128[40:]
+        audio = (self.FRAME_128 * 10 + self.FRAME_320 * 30) * 20
+        with open(self.path, 'wb') as fh:
+            fh.write(b'ID3\x03\x00\x00\x00\x00\x00\x0a' + b'\x00' * 10)
+            fh.write(xing + audio + b'\xff\xfb junk' + audio + b'TAG' + b'\x00' * 125)
+        self.frames = 1600
+        self.music = Music.objects.create(name='晴天', singer='周杰伦', file_path=self.path)
+
+    def test_scan_vbr_file(self):
+        table = scan_mp3(self.path, interval=1.0)
+        self.assertEqual(table.frames, self.frames)
+        self.assertAlmostEqual(table.duration, self.frames * 1152 / 44100, places=5)
+        offsets = unpack_offsets(table.offsets)
+        self.assertEqual(len(offsets), 42)
+        # 第一个点跳过标签和 Xing 帧；每个点都落在帧头上，且在它之前的时长不超过该点的时间
+        self.assertEqual(offsets[0], 20 + len(self.FRAME_128))
+        with open(self.path, 'rb') as fh:
+            data = fh.read()
+        for offset in offsets:
+            self.assertEqual(data[offset:offset + 2], b'\xff\xfb')
+
+    def test_endpoint_builds_and_reuses_table(self):
+        url = reverse('seek_index', args=[self.music.id])
+        response = self.client.get(url, {'t': '10.4'})
+        self.assertEqual(response.status_code, 200)
+        data = response.json()
+        self.assertEqual(data['frames'], self.frames)
+        self.assertEqual(data['seek'], {'time': 10.0, 'offset': data['offsets'][10]})
+        self.assertTrue(SeekIndex.objects.filter(music=self.music).exists())
+        # 无法解析或不是有限数的 t 被忽略
+        for t in ('abc', 'nan', 'inf', '-inf'):
+            ignored = self.client.get(url, {'t': t})
+            self.assertEqual(ignored.status_code, 200)
+            self.assertNotIn('seek', ignored.json())
+
+        with mock.patch('music.views.build_seek_table') as build:
+            self.assertEqual(self.client.get(url).json()['offsets'], data['offsets'])
+            self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=response['ETag']).status_code, 304)
+        build.assert_not_called()
+
+    def test_command_skips_up_to_date_tables(self):
+        self.music.refresh_file_facts()
+        self.music.save()
+        out = StringIO()
+        call_command('build_seek_index', workers=1, stdout=out)
+        self.assertIn('Built: 1', out.getvalue())
+        self.assertEqual(SeekIndex.objects.get(music=self.music).frames, self.frames)
+
+        out = StringIO()
+        call_command('build_seek_index', workers=1, stdout=out)
+        self.assertIn('Built: 0', out.getvalue())
+        self.assertIn('Up to date: 1', out.getvalue())
+
+    def test_rebuild_without_upsert_support(self):
+        # MySQL 不支持带 unique_fields 的 bulk_create(update_conflicts=True)
+        features = connection.features
+        with mock.patch.object(features, 'supports_update_conflicts_with_target', False), \
+                mock.patch.object(features, 'supports_update_conflicts', False):
+            url = reverse('seek_index', args=[self.music.id])
+            self.assertEqual(self.client.get(url).status_code, 200)
+            # 文件变化后覆盖已有的跳转表
+            os.utime(self.path, (1000, 1000))
+            self.assertEqual(self.client.get(url).status_code, 200)
+            self.assertEqual(SeekIndex.objects.get(music=self.music).file_mtime, 1000)
+
+            os.utime(self.path, (2000, 2000))
+            self.music.refresh_file_facts()
+            self.music.save()
+            out = StringIO()
+            call_command('build_seek_index', workers=1, stdout=out)
+            self.assertIn('Built: 1', out.getvalue())
+            self.assertEqual(SeekIndex.objects.get(music=self.music).file_mtime, 2000)
+
+
+class CoverCacheTests(TestCase):
+    """封面提取和磁盘缓存相关测试"""
+
+    IMAGE = b'\x89PNG\r\n\x1a\n' + b'cover' * 20
+
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.tmpdir, ignore_errors=True)
+        for name, value in {'root': os.path.join(self.tmpdir, 'covers'), 'thumb_size': 0, '_bytes': None}.items():
+            patcher = mock.patch.object(cover_cache, name, value)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def track(self, name, image=None):
+        path = os.path.join(self.tmpdir, f'{name}.mp3')
+        write_mp3(path, 417 * 10, name, '周杰伦', '叶惠美', marker=name.encode())
+        if image:
+            tags = ID3(path)
+            tags.add(APIC(encoding=3, mime='image/png', type=3, desc='', data=image))
+            tags.save(path)
+        return Music.objects.create(name=name, singer='周杰伦', file_path=path)
+
+    def test_cover_endpoint_caches_shared_art(self):
+        first = self.track('晴天', self.IMAGE)
+        second = self.track('以父之名', self.IMAGE)
+        response = self.client.get(reverse('music_cover', args=[first.id]))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(b''.join(response.streaming_content), self.IMAGE)
+        self.assertEqual(response['Content-Type'], 'image/png')
+        # 不带版本的地址内容会变，每次都要校验；曲库接口给出的带哈希地址可以长期缓存
+        self.assertEqual(response['Cache-Control'], 'no-cache')
+        etag = response['ETag']
+        covers = dict(self.client.get(reverse('music_catalog'), {'fields': 'id,cover'}).json()['items'])
+        self.assertEqual(covers[first.id], f'{reverse("music_cover", args=[first.id])}?v={etag[1:-1]}')
+        self.assertEqual(covers[second.id], reverse('music_cover', args=[second.id]))
+        response = self.client.get(covers[first.id])
+        self.assertIn('immutable', response['Cache-Control'])
+        close_response(response)
+
+        with mock.patch('music.covers.extract_cover') as extract:
+            response = self.client.get(reverse('music_cover', args=[first.id]), HTTP_IF_NONE_MATCH=etag)
+            self.assertEqual(response.status_code, 304)
+        extract.assert_not_called()
+
+        # 同一张封面只保存一份，ETag 相同
+        self.assertEqual(self.client.get(reverse('music_cover', args=[second.id]))['ETag'], etag)
+        first.refresh_from_db()
+        second.refresh_from_db()
+        self.assertEqual(first.cover, second.cover)
+        self.assertEqual(len(os.listdir(os.path.dirname(cover_cache.path(first.cover)))), 1)
+
+        # 缓存文件被淘汰后重新提取
+        os.remove(cover_cache.path(first.cover))
+        self.assertEqual(self.client.get(reverse('music_cover', args=[first.id])).status_code, 200)
+
+        # 检查存在之后、打开之前被其它进程淘汰
+        get = cover_cache.get
+        evicted = []
+
+        def evicted_after_get(name):
+            path = get(name)
+            if not evicted:
+                evicted.append(path)
+                os.remove(path)
+            return path
+
+        with mock.patch.object(cover_cache, 'get', side_effect=evicted_after_get):
+            response = self.client.get(reverse('music_cover', args=[first.id]))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(b''.join(response.streaming_content), self.IMAGE)
+
+    def test_track_without_art(self):
+        music = self.track('稻香')
+        self.assertEqual(self.client.get(reverse('music_cover', args=[music.id])).status_code, 404)
+        music.refresh_from_db()
+        self.assertEqual(music.cover, '')
+        items = self.client.get(reverse('music_catalog'), {'fields': 'cover'}).json()['items']
+        self.assertEqual(items, [[None]])
+
+    def test_lru_eviction(self):
+        cache = CoverCache(os.path.join(self.tmpdir, 'lru'), max_bytes=250)
+        names = []
+        for i in range(3):
+            names.append(cache.store(bytes([i]) * 100, 'image/jpeg'))
+            os.utime(cache.path(names[-1]), (1000 + i, 1000 + i))
+        # 第三张写入时超过上限，最久没有访问的第一张被删除
+        self.assertIsNone(cache.get(names[0]))
+        self.assertIsNotNone(cache.get(names[2]))
+        self.assertLessEqual(cache.size(), 250)
+
+    def test_warm_command(self):
+        with_art = self.track('晴天', self.IMAGE)
+        without_art = self.track('稻香')
+        out = StringIO()
+        call_command('warm_cover_cache', workers=1, stdout=out)
+        self.assertIn('With cover: 1', out.getvalue())
+        self.assertIn('Without cover: 1', out.getvalue())
+        with_art.refresh_from_db()
+        without_art.refresh_from_db()
+        self.assertTrue(with_art.cover)
+        self.assertEqual(without_art.cover, '')
+        self.assertIsNotNone(cover_cache.get(with_art.cover))
+
+
+class MusicListPaginationTests(TestCase):
+    """列表页游标分页相关测试"""
+
+    def setUp(self):
+        cache.clear()
+        forget_catalog_version()
+        now = timezone.now()
+        # 部分记录的添加时间相同，验证按 id 保持稳定顺序
+        Music.objects.bulk_create([
+            Music(name=f'歌曲{i}', singer='歌手', created_at=now - timedelta(minutes=i // 3))
+            for i in range(120)
+        ])
+        self.expected = list(Music.objects.order_by('-created_at', '-id').values_list('id', flat=True))
+
+    def page_ids(self, response):
+        return [m.id for m in response.context['musics']]
+
+    def test_keyset_navigation(self):
+        response = self.client.get(reverse('music_list'))
+        self.assertEqual(self.page_ids(response), self.expected[:50])
+        self.assertEqual(response.context['paginator'].count, 120)
+
+        page2 = self.client.get(reverse('music_list') + '?' + response.context['musics'].next_query())
+        self.assertEqual(self.page_ids(page2), self.expected[50:100])
+
+        # 深页的查询数与第一页相同，且总数来自缓存
+        with self.assertNumQueries(1):
+            page3 = self.client.get(reverse('music_list') + '?' + page2.context['musics'].next_query())
+        self.assertEqual(self.page_ids(page3), self.expected[100:])
+        self.assertFalse(page3.context['musics'].has_next())
+        self.assertEqual(page3.context['musics'].start_index(), 101)
+
+        back = self.client.get(reverse('music_list') + '?' + page3.context['musics'].previous_query())
+        self.assertEqual(self.page_ids(back), self.expected[50:100])
+
+    def test_page_mode_still_supported(self):
+        response = self.client.get(reverse('music_list') + '?page=3')
+        self.assertEqual(self.page_ids(response), self.expected[100:])
+
+
+class MusicListPageCacheTests(TestCase):
+    """列表页整页缓存和行片段缓存相关测试"""
+
+    def setUp(self):
+        cache.clear()
+        forget_catalog_version()
+        caches['music_pages'].clear()
+        self.music = Music.objects.create(name='晴天', singer='周杰伦')
+
+    def test_warm_hit_skips_orm_and_templates(self):
+        url = reverse('music_list')
+        first = self.client.get(url)
+        with self.assertNumQueries(0), mock.patch('music.views.render') as render:
+            warm = self.client.get(url)
+        render.assert_not_called()
+        self.assertEqual(warm.content, first.content)
+
+        # 其它分页参数使用各自的缓存
+        self.assertEqual(self.client.get(url, {'page': 1}).status_code, 200)
+
+    def test_version_bump_invalidates(self):
+        url = reverse('music_list')
+        self.client.get(url)
+        self.music.name = '稻香'
+        self.music.save()
+        response = self.client.get(url)
+        self.assertContains(response, '稻香')
+        self.assertNotContains(response, '晴天')
+
+        # 批量导入不触发信号，由导入流程递增版本号
+        tmpdir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, tmpdir, ignore_errors=True)
+        open(os.path.join(tmpdir, '周杰伦-七里香.mp3'), 'wb').close()
+        import_folder(tmpdir, workers=1, extract=extract_track_from_filename)
+        self.assertContains(self.client.get(url), '七里香')
+
+    @override_settings(MUSIC_CATALOG_VERSION_TTL=0)
+    def test_changes_from_other_processes_invalidate(self):
+        url = reverse('music_list')
+        self.client.get(url)
+        self.assertEqual(self.client.get(url, {'page': 1}).context['paginator'].count, 1)
+        # 模拟命令行进程：不触发信号，只修改数据库并递增数据库中的版本号
+        Music.objects.filter(id=self.music.id).update(name='稻香')
+        Music.objects.bulk_create([Music(name='七里香', singer='周杰伦')])
+        CatalogVersion.objects.filter(pk=1).update(version=F('version') + 1)
+
+        response = self.client.get(url)
+        # 整页缓存和行片段缓存都不再使用
+        self.assertContains(response, '稻香')
+        self.assertNotContains(response, '晴天')
+        self.assertEqual(self.client.get(url, {'page': 1}).context['paginator'].count, 2)
+
+
+class MusicCatalogApiTests(TestCase):
+    """曲库 JSON 接口相关测试"""
+
+    def setUp(self):
+        cache.clear()
+        forget_catalog_version()
+        now = timezone.now()
+        Music.objects.bulk_create([
+            Music(name=f'歌曲{i}', singer='歌手', created_at=now - timedelta(minutes=i // 4))
+            for i in range(30)
+        ])
+        self.expected = list(Music.objects.order_by('-created_at', '-id').values_list('id', flat=True))
+        self.url = reverse('music_catalog')
+
+    def test_cursor_paging_and_fields(self):
+        data = self.client.get(self.url, {'limit': 12, 'fields': 'id,src,bogus'}).json()
+        self.assertEqual(data['fields'], ['id', 'src'])
+        self.assertEqual(data['count'], 30)
+        ids = [item[0] for item in data['items']]
+        self.assertEqual(data['items'][0][1], reverse('play_music', args=[ids[0]]))
+
+        while data['next']:
+            data = self.client.get(self.url, {'limit': 12, 'fields': 'id,src', 'cursor': data['next']}).json()
+            ids += [item[0] for item in data['items']]
+        self.assertEqual(ids, self.expected)
+
+        data = self.client.get(self.url, {'after': self.expected[9], 'fields': 'id'}).json()
+        self.assertEqual([item[0] for item in data['items']], self.expected[10:])
+
+    def test_etag_revalidation(self):
+        response = self.client.get(self.url, {'limit': 5})
+        etag = response['ETag']
+
+        with self.assertNumQueries(0):
+            cached = self.client.get(self.url, {'limit': 5}, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(cached.status_code, 304)
+
+        # 参数不同 ETag 不同；曲库变化后旧 ETag 失效
+        self.assertNotEqual(self.client.get(self.url, {'limit': 6})['ETag'], etag)
+        Music.objects.filter(id=self.expected[0]).first().save()
+        self.assertEqual(self.client.get(self.url, {'limit': 5}, HTTP_IF_NONE_MATCH=etag).status_code, 200)
+
+    @override_settings(MUSIC_CATALOG_VERSION_TTL=0)
+    def test_etag_follows_bumps_from_other_processes(self):
+        etag = self.client.get(self.url, {'limit': 5})['ETag']
+        # 命令行导入等其它进程只修改数据库中的版本号，不经过本进程
+        CatalogVersion.objects.filter(pk=1).update(version=F('version') + 1)
+        self.assertEqual(self.client.get(self.url, {'limit': 5}, HTTP_IF_NONE_MATCH=etag).status_code, 200)
+
+
+class MusicSearchTests(TestCase):
+    """搜索索引和搜索接口相关测试"""
+
+    def setUp(self):
+        self.qingtian = Music.objects.create(name='晴天', singer='周杰伦', album='叶惠美')
+        self.daoxiang = Music.objects.create(name='稻香', singer='周杰伦', album='魔杰座')
+        self.tian = Music.objects.create(name='天晴了', singer='Jay Chou Ｌｉｖｅ', album='晴天')
+        self.url = reverse('music_search')
+
+    def search(self, q):
+        data = self.client.get(self.url, {'q': q, 'fields': 'id,name'}).json()
+        return [item[0] for item in data['items']]
+
+    def test_cjk_and_prefix_queries(self):
+        self.assertEqual(self.search('周杰伦'), [self.daoxiang.id, self.qingtian.id])
+        self.assertEqual(self.search('周杰伦 晴天'), [self.qingtian.id])
+        self.assertEqual(self.search('晴'), [self.tian.id, self.qingtian.id])
+        self.assertEqual(self.search('天晴了'), [self.tian.id])
+        # 二元组都命中但在原文中不相邻的结果会被排除
+        self.assertEqual(self.search('天晴天'), [])
+        # 最后一个单词按前缀匹配，全角字符按半角处理
+        self.assertEqual(self.search('jay ch'), [self.tian.id])
+        self.assertEqual(self.search('LIV'), [self.tian.id])
+        self.assertEqual(self.search('ch jay'), [])
+
+    def test_index_follows_saves_and_deletes(self):
+        self.qingtian.name = '七里香'
+        self.qingtian.save()
+        self.assertEqual(self.search('晴天'), [self.tian.id])
+        self.assertEqual(self.search('七里'), [self.qingtian.id])
+
+        self.qingtian.delete()
+        self.assertEqual(self.search('七里'), [])
+
+        SearchTerm.objects.all().delete()
+        call_command('rebuild_search_index', stdout=StringIO())
+        self.assertEqual(self.search('稻香'), [self.daoxiang.id])
+
+    def test_large_groups_intersect_without_intersect(self):
+        # 每个条件都超过种子上限时由数据库求交集，模拟不支持 INTERSECT 的 MySQL
+        with mock.patch('music.search.CANDIDATE_LIMIT', 0), \
+                mock.patch.object(connection.features, 'supports_select_intersection', False):
+            self.assertEqual(self.search('周杰伦 晴天'), [self.qingtian.id])
+            self.assertEqual(self.search('晴 天'), [self.tian.id, self.qingtian.id])
+            self.assertEqual(self.search('jay ch'), [self.tian.id])
+
+
+class BenchmarkSuiteTests(TestCase):
+    """基准测试套件（小规模）相关测试"""
+
+    def test_small_suite_and_regression_check(self):
+        workdir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, workdir, ignore_errors=True)
+        report = run_suite(workdir, tracks=120, files=2, file_size=64 * 1024, import_files=5, repeat=1)
+
+        results = report['results']
+        for name in ('music_list.deep_cursor.uncached.p50_ms', 'play_music.range.mb_per_s',
+                     'import.full.files_per_s', 'fix_file_paths.scan.rows_per_s'):
+            self.assertGreater(results[name]['value'], 0)
+        self.assertEqual(Music.objects.count(), 125)
+
+        self.assertEqual(compare_results(report, report, 0.1), [])
+        slower = {'results': {'x': {'value': 2.0, 'unit': 'ms', 'better': 'lower'}}}
+        faster = {'results': {'x': {'value': 1.0, 'unit': 'ms', 'better': 'lower'}}}
+        self.assertEqual(len(compare_results(slower, faster, 0.5)), 1)
+        self.assertEqual(compare_results(faster, slower, 0.5), [])
@@ -0,0 +1,165 @@
+# music/throttle.py
+"""
+音频传输限流（进程内）
+- 每个客户端一个令牌桶限制字节速率：开始传输时按 Content-Length 预扣，
+  响应体关闭时退回没有读出的部分；余额为负时拒绝新的请求，直到按速率补回来
+- 每个客户端、以及整个进程同时打开的音频流数量上限
+超限时直接返回 429（单个客户端超限）或 503（全局已满），带 Retry-After，而不是放慢已有的传输
+"""
+import math
+import threading
+import time
+from django.conf import settings
+from django.http import JsonResponse
+from .metrics import THROTTLED
+
+# 客户端状态超过这个数量时清理空闲的客户端
+MAX_TRACKED_CLIENTS = 10000
+
+
+class _ClientState:
+    __slots__ = ('tokens', 'updated', 'streams')
+
+    def __init__(self, tokens, now):
+        self.tokens = tokens
+        self.updated = now
+        self.streams = 0
+
+
+class StreamLease:
+    """一次获准的传输，响应体关闭时调用 release()"""
+
+    def __init__(self, throttle, client, charged):
+        self._throttle = throttle
+        self.client = client
+        self.charged = charged
+        self._released = False
+
+    def release(self, unsent=0):
+        if not self._released:
+            self._released = True
+            self._throttle._release(self.client, min(max(unsent, 0), self.charged))
+
+    def attach(self, body):
+        """
+        响应体关闭时释放名额，并退回没有读出的字节
+        fileno() 交给了服务器且没有读出过数据时视为经 sendfile 发送，无法得知实际发送量，按全部发送计算
+        """
+        def on_close():
+            if body.fileno_used and not body.bytes_read:
+                self.release()
+            else:
+                self.release(self.charged - body.bytes_read)
+        body.add_close_callback(on_close)
+        return body
+
+
+class StreamThrottle:
+    """
+    rate：每个客户端每秒字节数（0 不限）；burst：令牌桶容量（字节）
+    client_streams / max_streams：每个客户端 / 全局同时传输的流数量（0 不限）
+    retry_after：因为流数量被拒绝时建议的重试间隔（秒）
+    """
+
+    def __init__(self, rate=0, burst=0, client_streams=0, max_streams=0, retry_after=5):
+        self.rate = rate
+        self.burst = burst or rate
+        self.client_streams = client_streams
+        self.max_streams = max_streams
+        self.retry_after = retry_after
+        self.active = 0
+        self._clients = {}
+        self._lock = threading.Lock()
+
+    @property
+    def enabled(self):
+        return bool(self.rate or self.client_streams or self.max_streams)
+
+    def _state(self, client, now):
+        state = self._clients.get(client)
+        if state is None:
+            if len(self._clients) >= MAX_TRACKED_CLIENTS:
+                self._prune(now)
+            state = self._clients[client] = _ClientState(self.burst, now)
+        elif self.rate:
+            state.tokens = min(self.burst, state.tokens + (now - state.updated) * self.rate)
+        state.updated = now
+        return state
+
+    def _prune(self, now):
+        for client, state in list(self._clients.items()):
+            if not state.streams and state.tokens + (now - state.updated) * self.rate >= self.burst:
+                del self._clients[client]
+
+    def acquire(self, client, nbytes):
+        """
+        申请传输 nbytes 字节
+        返回 (StreamLease, None)；被拒绝时返回 (None, (状态码, Retry-After 秒数, 原因))
+        """
+        with self._lock:
+            now = time.monotonic()
+            if self.max_streams and self.active >= self.max_streams:
+                return None, (503, self.retry_after, 'streams')
+            state = self._state(client, now)
+            if self.client_streams and state.streams >= self.client_streams:
+                return None, (429, self.retry_after, 'client_streams')
+            charged = 0
+            if self.rate:
+                # 余额不为负就放行（大文件可以透支），透支的部分要等补回来才能开始下一次传输
+                if state.tokens < 0:
+                    return None, (429, max(math.ceil(-state.tokens / self.rate), 1), 'bandwidth')
+                charged = nbytes
+                state.tokens -= nbytes
+            state.streams += 1
+            self.active += 1
+        return StreamLease(self, client, charged), None
+
+    def _release(self, client, refund):
+        with self._lock:
+            self.active -= 1
+            state = self._clients.get(client)
+            if state is None:
+                return
+            state.streams -= 1
+            if self.rate:
+                now = time.monotonic()
+                state.tokens = min(self.burst, state.tokens + (now - state.updated) * self.rate + refund)
+                state.updated = now
+
+
+stream_throttle = StreamThrottle(
+    rate=getattr(settings, 'MUSIC_THROTTLE_CLIENT_RATE', 0),
+    burst=getattr(settings, 'MUSIC_THROTTLE_CLIENT_BURST', 0),
+    client_streams=getattr(settings, 'MUSIC_THROTTLE_CLIENT_STREAMS', 0),
+    max_streams=getattr(settings, 'MUSIC_THROTTLE_MAX_STREAMS', 0),
+    retry_after=getattr(settings, 'MUSIC_THROTTLE_RETRY_AFTER', 5),
+)
+
+
+def client_id(request):
+    """
+    客户端标识：REMOTE_ADDR
+    请求来自 MUSIC_THROTTLE_TRUSTED_PROXIES 中的代理（例如本机运行的 ngrok）时，
+    改用 X-Forwarded-For 中最后一个地址（由代理追加，客户端无法伪造）
+    """
+    remote = request.META.get('REMOTE_ADDR', '')
+    trusted = getattr(settings, 'MUSIC_THROTTLE_TRUSTED_PROXIES', ['127.0.0.1', '::1'])
+    forwarded = request.META.get('HTTP_X_FORWARDED_FOR', '')
+    if forwarded and remote in trusted:
+        return forwarded.split(',')[-1].strip() or remote
+    return remote
+
+
+def throttle_stream(request, nbytes):
+    """音频传输前调用：返回 (StreamLease 或 None, 拒绝时的响应或 None)；限流关闭时两者都是 None"""
+    if not stream_throttle.enabled:
+        return None, None
+    lease, rejected = stream_throttle.acquire(client_id(request), nbytes)
+    if lease is not None:
+        return lease, None
+    status, retry_after, reason = rejected
+    THROTTLED.inc(reason)
+    message = '服务器繁忙，请稍后再试' if status == 503 else '请求过于频繁，请稍后再试'
+    response = JsonResponse({'error': message, 'reason': reason}, status=status)
+    response['Retry-After'] = str(retry_after)
+    return None, response
@@ -1,9 +1,22 @@
 from django.urls import path
+from django.conf import settings
 from . import views
 
+# ASGI 部署时开启 MUSIC_ASYNC_STREAMING，播放地址改用异步视图
+play_view = views.play_music_async if getattr(settings, 'MUSIC_ASYNC_STREAMING', False) else views.play_music
+
 urlpatterns = [
     path('', views.music_list, name='music_list'),  # 音乐列表页
     path('import/', views.import_music, name='import_music'),  # 批量导入
-    path('play/<int:music_id>/', views.play_music, name='play_music'),
+    path('api/import-jobs/<int:job_id>/', views.import_job_status, name='import_job_status'),  # 导入进度
+    path('play/<int:music_id>/', play_view, name='play_music'),
+    path('play-async/<int:music_id>/', views.play_music_async, name='play_music_async'),
+    path('api/music/', views.music_catalog, name='music_catalog'),  # 曲库 JSON 接口
+    path('api/search/', views.music_search, name='music_search'),  # 搜索接口
     path('check-file/<int:music_id>/', views.check_file_exists, name='check_file_exists'),
+    path('check-files/', views.check_files_exist, name='check_files_exist'),  # 批量检查
+    path('api/music/<int:music_id>/seek-index/', views.seek_index, name='seek_index'),  # MP3 跳转表
+    path('cover/<int:music_id>/', views.music_cover, name='music_cover'),  # 歌曲封面
+    path('readahead/', views.readahead, name='readahead'),  # 下一首预读
+    path('metrics', views.metrics, name='metrics'),  # Prometheus 指标
 ]
\ No newline at end of file
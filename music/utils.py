@@ -1,40 +1,175 @@
 # music/utils.py
 import os
 import mimetypes
+import stat
+import threading
+import time
+from collections import OrderedDict, namedtuple
 from django.conf import settings
+from .metrics import PATH_CACHE_LOOKUPS, PATH_RESOLUTION
 
-def get_music_file_path(music):
-    """获取音乐文件的真实路径"""
-    if not music.file_path:
+# 解析结果：真实路径、文件大小（字节）、修改时间
+ResolvedFile = namedtuple('ResolvedFile', ['path', 'size', 'mtime'])
+
+
+class PathResolutionCache:
+    """
+    进程内的路径解析缓存，key 为数据库中存储的 file_path
+    - 命中的结果在 ttl 秒内有效，找不到的文件按 negative_ttl 缓存（负缓存）
+    - 超过 max_size 条时按 LRU 淘汰
+    """
+
+    def __init__(self, max_size=10000, ttl=300, negative_ttl=30):
+        self.max_size = max_size
+        self.ttl = ttl
+        self.negative_ttl = negative_ttl
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        """返回 (是否命中, ResolvedFile 或 None)"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return False, None
+            expires_at, value = entry
+            if expires_at < time.monotonic():
+                del self._entries[key]
+                return False, None
+            self._entries.move_to_end(key)
+            return True, value
+
+    def set(self, key, value):
+        ttl = self.ttl if value is not None else self.negative_ttl
+        if ttl <= 0 or self.max_size <= 0:
+            return
+        with self._lock:
+            self._entries[key] = (time.monotonic() + ttl, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def invalidate(self, *keys):
+        """删除指定 key 的缓存；不传参数时清空全部"""
+        with self._lock:
+            if not keys:
+                self._entries.clear()
+            for key in keys:
+                self._entries.pop(key, None)
+
+    def __len__(self):
+        return len(self._entries)
+
+
+path_cache = PathResolutionCache(
+    max_size=getattr(settings, 'MUSIC_PATH_CACHE_SIZE', 10000),
+    ttl=getattr(settings, 'MUSIC_PATH_CACHE_TTL', 300),
+    negative_ttl=getattr(settings, 'MUSIC_PATH_CACHE_NEGATIVE_TTL', 30),
+)
+
+
+def invalidate_music_file_path(*file_paths):
+    """file_path 被修改（fix_file_paths、导入等）后调用；不传参数时清空全部缓存"""
+    path_cache.invalidate(*file_paths)
+
+
+def _stat_file(path):
+    """返回 ResolvedFile，文件不存在时返回 None（一次 stat 同时拿到存在性、大小和修改时间）"""
+    try:
+        st = os.stat(path)
+    except (OSError, ValueError):
         return None
-    
-    # file_path是绝对路径
-    file_path = music.file_path
-    
+    if not stat.S_ISREG(st.st_mode):
+        return None
+    return ResolvedFile(path, st.st_size, st.st_mtime)
+
+
+def resolve_file_path(file_path):
+    """不经过缓存，直接在文件系统上解析 file_path"""
+    resolved = _stat_file(file_path)
+    if resolved:
+        return resolved
+
     # 如果路径不存在，尝试一些常见的修复
-    if not os.path.exists(file_path):
-        # 尝试在MEDIA_ROOT下查找
-        if settings.MEDIA_ROOT and not os.path.isabs(music.file_path):
-            possible_path = os.path.join(settings.MEDIA_ROOT, music.file_path)
-            if os.path.exists(possible_path):
-                return possible_path
-        
-        # 如果是Windows路径但使用了错误的分隔符
-        if '\\' in file_path:
-            file_path = file_path.replace('\\', '/')
-        elif '/' in file_path and ':' in file_path:
-            # 尝试修复Windows路径
-            if file_path.startswith('/'):
-                # 类似 /D:/music/xxx.mp3 的格式
-                drive = file_path[1:3]  # 获取 D:
-                rest = file_path[3:]
-                file_path = f"{drive}{rest}"
-        
-        # 再次检查
-        if not os.path.exists(file_path):
-            return None
-    
-    return file_path
+    # 尝试在MEDIA_ROOT下查找
+    if settings.MEDIA_ROOT and not os.path.isabs(file_path):
+        resolved = _stat_file(os.path.join(settings.MEDIA_ROOT, file_path))
+        if resolved:
+            return resolved
+
+    # 如果是Windows路径但使用了错误的分隔符
+    fixed_path = file_path
+    if '\\' in fixed_path:
+        fixed_path = fixed_path.replace('\\', '/')
+    elif '/' in fixed_path and ':' in fixed_path:
+        # 尝试修复Windows路径
+        if fixed_path.startswith('/'):
+            # 类似 /D:/music/xxx.mp3 的格式
+            drive = fixed_path[1:3]  # 获取 D:
+            rest = fixed_path[3:]
+            fixed_path = f"{drive}{rest}"
+
+    # 再次检查
+    if fixed_path != file_path:
+        return _stat_file(fixed_path)
+    return None
+
+
+def _timed_resolve(file_path):
+    """解析路径并记录耗时"""
+    started = time.perf_counter()
+    resolved = resolve_file_path(file_path)
+    PATH_RESOLUTION.observe(time.perf_counter() - started)
+    return resolved
+
+
+def get_music_file_info(music):
+    """获取音乐文件的解析结果（ResolvedFile），文件不存在时返回 None，结果会被缓存"""
+    if not music.file_path:
+        return None
+
+    hit, resolved = path_cache.get(music.file_path)
+    if hit:
+        PATH_CACHE_LOOKUPS.inc('hit')
+    else:
+        PATH_CACHE_LOOKUPS.inc('miss')
+        resolved = _timed_resolve(music.file_path)
+        path_cache.set(music.file_path, resolved)
+    return resolved
+
+
+def get_music_file_infos(musics, executor=None):
+    """
+    批量获取解析结果，返回 {music.pk: ResolvedFile 或 None}
+    缓存命中的直接使用；未命中的按 file_path 去重后交给 executor（线程池）并发解析，结果写回缓存
+    """
+    results = {}
+    pending = {}
+    for music in musics:
+        if not music.file_path:
+            results[music.pk] = None
+            continue
+        hit, resolved = path_cache.get(music.file_path)
+        PATH_CACHE_LOOKUPS.inc('hit' if hit else 'miss')
+        if hit:
+            results[music.pk] = resolved
+        else:
+            pending.setdefault(music.file_path, []).append(music.pk)
+
+    if pending:
+        paths = list(pending)
+        resolved_all = executor.map(_timed_resolve, paths) if executor else map(_timed_resolve, paths)
+        for file_path, resolved in zip(paths, resolved_all):
+            path_cache.set(file_path, resolved)
+            for pk in pending[file_path]:
+                results[pk] = resolved
+    return results
+
+
+def get_music_file_path(music):
+    """获取音乐文件的真实路径"""
+    resolved = get_music_file_info(music)
+    return resolved.path if resolved else None
 
 def get_content_type(filename):
     """根据文件名获取Content-Type"""
@@ -1,44 +1,98 @@
 # Create your views here.
 from django.shortcuts import render, get_object_or_404
-from django.http import HttpResponseRedirect, HttpResponse, FileResponse, Http404, JsonResponse
+from django.http import HttpResponseRedirect, HttpResponse, FileResponse, StreamingHttpResponse, Http404, JsonResponse
 from django.urls import reverse
 from django.contrib import messages
+import math
+import mimetypes
 import os
-from django.core.paginator import Paginator, EmptyPage, PageNotAnInteger
-from .models import Music
-from .utils import get_music_file_path, get_content_type
+import uuid
+from django.core.paginator import EmptyPage, PageNotAnInteger
+from django.db import IntegrityError, transaction
+from .models import ImportJob, Music, SeekIndex
+from .pagination import CachedCountPaginator, KeysetPage, decode_cursor, get_music_count
+from .catalog import catalog_etag, catalog_page, get_catalog_version, parse_fields, parse_limit
+from .search import DEFAULT_SEARCH_LIMIT, MAX_SEARCH_LIMIT, search_music
+from .pagecache import get_cached_page, get_page_cache_timeout, list_page_key, store_page
+from .metrics import record_audio, render_metrics, track_stream
+from .jobs import job_status, start_import_job
+from .readahead import readahead_scheduler
+from .throttle import throttle_stream
+from .metadata import extract_track_from_filename
+from .covers import cover_cache, cover_version
+from .seektable import SEEKABLE_FORMATS, build_seek_table, offset_for_time, unpack_offsets
+from .utils import get_music_file_path, get_music_file_infos, get_content_type, invalidate_music_file_path
+from .streaming import (
+    RangeFileWrapper, get_chunk_size, make_etag, if_range_matches,
+    parse_range_header, multipart_byteranges, offload_response,
+    AsyncBody, get_io_executor, run_in_io_executor, stream_view,
+)
 from django.conf import settings
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date
 
 # 支持的音频格式
 SUPPORTED_FORMATS = ['mp3', 'wav', 'flac', 'ogg', 'm4a', 'aac', 'wma']
 
 def music_list(request):
-    # 1. 查询所有音乐数据（按添加时间倒序）
-    music_list = Music.objects.all().order_by('-created_at')
-    
-    # 2. 初始化分页器：每页50条
-    paginator = Paginator(music_list, 50)
-    
-    # 3. 获取当前页码（从请求参数中获取，默认第1页）
-    page = request.GET.get('page', 1)
-    
-    try:
-        # 4. 获取当前页的音乐数据
-        musics = paginator.page(page)
-    except PageNotAnInteger:
-        # 如果页码不是整数，返回第一页
-        musics = paginator.page(1)
-    except EmptyPage:
-        # 如果页码超出范围，返回最后一页
-        musics = paginator.page(paginator.num_pages)
+    # 1. 分页方式：默认使用游标分页（翻页代价固定）；带 page 参数时使用页码分页
+    pagination_mode = getattr(settings, 'MUSIC_LIST_PAGINATION', 'cursor')
+    cursor_mode = pagination_mode == 'cursor' and 'page' not in request.GET
+
+    # 2. 整页缓存：没有待显示的提示消息时，直接返回缓存的 HTML，不查询数据库也不渲染模板
+    page_key = None
+    if not messages.get_messages(request):
+        page_key = list_page_key(request, cursor_mode)
+        content = get_cached_page(page_key)
+        if content is not None:
+            return HttpResponse(content)
+
+    # 查询所有音乐数据（按添加时间倒序，id 保证顺序稳定）
+    music_list = Music.objects.all().order_by('-created_at', '-id')
+
+    if cursor_mode:
+        # 3. 游标分页：总数来自缓存，不再每次执行 COUNT(*)
+        cursor = decode_cursor(request.GET.get('cursor', ''))
+        before = decode_cursor(request.GET.get('before', ''))
+        try:
+            number = int(request.GET.get('p', 1))
+        except ValueError:
+            number = 1
+        musics = KeysetPage(music_list, 50, cursor=cursor, before=before, number=number, count=get_music_count())
+        if not musics and (cursor or before):
+            # 游标失效（记录被删除等），回到第一页
+            musics = KeysetPage(music_list, 50, count=get_music_count())
+        paginator = musics.paginator
+    else:
+        # 3. 页码分页：每页50条，总数同样来自缓存
+        paginator = CachedCountPaginator(music_list, 50)
+        page = request.GET.get('page', 1)
+        
+        try:
+            # 4. 获取当前页的音乐数据
+            musics = paginator.page(page)
+        except PageNotAnInteger:
+            # 如果页码不是整数，返回第一页
+            musics = paginator.page(1)
+        except EmptyPage:
+            # 如果页码超出范围，返回最后一页
+            musics = paginator.page(paginator.num_pages)
     
     context = {
         'musics': musics,
-        'paginator': paginator
+        'paginator': paginator,
+        'cursor_mode': cursor_mode,
+        # 行片段缓存（{% cache %}）使用的版本号、缓存别名和有效期
+        'catalog_version': get_catalog_version(),
+        'page_cache_alias': getattr(settings, 'MUSIC_PAGE_CACHE', 'default'),
+        'page_cache_timeout': get_page_cache_timeout(),
     }
     
-    # 5. 传递分页数据到模板
-    return render(request, 'music/music_list.html', context)
+    # 5. 传递分页数据到模板，渲染结果写入整页缓存
+    response = render(request, 'music/music_list.html', context)
+    if page_key:
+        store_page(page_key, response.content)
+    return response
 
 def play_music(request, music_id):
     """
@@ -56,148 +110,443 @@ def play_music(request, music_id):
     if not file_path:
         return JsonResponse({'error': '文件不存在或路径无效'}, status=404)
 
-    # 获取文件大小
-    file_size = os.path.getsize(file_path)
+    response = _serve_audio(request, file_path)
+    if response is None:
+        # 缓存的路径已失效（文件被移动或删除）
+        invalidate_music_file_path(music.file_path)
+        return JsonResponse({'error': '文件不存在或路径无效'}, status=404)
+    return response
+
+@stream_view
+async def play_music_async(request, music_id):
+    """
+    播放音乐文件（ASGI 异步版本）
+    响应体是异步迭代器，文件读取在有界线程池中完成，一个进程可以同时挂住大量慢速连接
+    """
+    try:
+        music = await Music.objects.aget(id=music_id)
+    except Music.DoesNotExist:
+        raise Http404("音乐不存在")
+
+    # 路径解析和 stat 都会访问文件系统，放到线程池里执行
+    file_path = await run_in_io_executor(get_music_file_path, music)
+
+    if not file_path:
+        return JsonResponse({'error': '文件不存在或路径无效'}, status=404)
+
+    response = await run_in_io_executor(_serve_audio, request, file_path, True)
+    if response is None:
+        # 缓存的路径已失效（文件被移动或删除）
+        invalidate_music_file_path(music.file_path)
+        return JsonResponse({'error': '文件不存在或路径无效'}, status=404)
+    return response
+
+def _serve_audio(request, file_path, async_stream=False):
+    """
+    根据请求头生成音频响应（条件请求、交付方式、Range），同步和异步视图共用
+    文件已经不存在时返回 None
+    """
+    # 获取文件大小和修改时间，用于生成缓存校验信息（ETag / Last-Modified）
+    try:
+        stat = os.stat(file_path)
+    except OSError:
+        return None
+    file_size = stat.st_size
+    etag = make_etag(stat)
+    # 块缓存的 key：文件被替换（修改时间或大小变化）后不会读到旧数据
+    file_key = (file_path, stat.st_mtime_ns, file_size)
+    last_modified = int(stat.st_mtime)
 
     # 根据文件名获取 MIME 类型
     content_type = get_content_type(file_path)
-    
+
+    # 条件请求：If-None-Match / If-Modified-Since 命中时直接返回 304，不再重复传输
+    response = get_conditional_response(request, etag=etag, last_modified=last_modified)
+    if response is not None:
+        record_audio('not_modified')
+        return _set_validators(response, etag, last_modified)
+
+    # 配置了前端服务器交付时，由 nginx / Apache 负责传输文件和处理 Range
+    response = offload_response(file_path, content_type)
+    if response is not None:
+        record_audio('offload')
+        response['Content-Disposition'] = f'inline; filename="{os.path.basename(file_path)}"'
+        return _set_validators(response, etag, last_modified)
+
     # 处理范围请求（支持进度条和跳转）
     range_header = request.headers.get('Range', '').strip()
+    # If-Range 校验失败说明文件已变化，忽略 Range 返回完整文件
+    if not if_range_matches(request.headers.get('If-Range'), etag, last_modified):
+        range_header = ''
     range_bytes = range_header.startswith('bytes=')
 
     if range_bytes:
-        # 解析范围请求，支持单段 range（不支持多段）并处理后缀范围
+        # 解析范围请求，支持多段 range 和后缀范围
         try:
-            raw = range_header[6:]
-            # 不支持多段 Range
-            if ',' in raw:
-                return HttpResponse('Multiple ranges not supported', status=400)
-
-            start_str, end_str = raw.split('-', 1)
-
-            if start_str == '' and end_str:
-                # 后缀范围 bytes=-N 表示最后 N 个字节
-                suffix_len = int(end_str)
-                if suffix_len <= 0:
-                    return HttpResponse(status=416)
-                if suffix_len >= file_size:
-                    range_start = 0
-                else:
-                    range_start = file_size - suffix_len
-                range_end = file_size - 1
-            else:
-                # 正常范围 start-end，其中 end 可省略
-                range_start = int(start_str) if start_str else 0
-                range_end = int(end_str) if end_str else file_size - 1
-
-            # 验证范围
-            if range_start >= file_size or range_start < 0:
-                return HttpResponse(status=416)
-            if range_end >= file_size:
-                range_end = file_size - 1
-            if range_start > range_end:
-                return HttpResponse(status=416)
-
+            ranges = parse_range_header(range_header, file_size)
         except ValueError:
             # Range 格式错误
             return HttpResponse('Invalid Range header', status=400)
 
+        if not ranges:
+            response = HttpResponse(status=416)
+            response['Content-Range'] = f'bytes */{file_size}'
+            return response
+
+    # 限流：按要传输的字节数申请名额，超限时直接返回 429 / 503，不开始传输；HEAD 不传输数据，不扣字节
+    nbytes = sum(end - start + 1 for start, end in ranges) if range_bytes else file_size
+    if request.method == 'HEAD':
+        nbytes = 0
+    lease, rejected = throttle_stream(request, nbytes)
+    if rejected is not None:
+        return rejected
+
+    try:
+        body, status, response_type, content_length, content_range, kind = _open_body(
+            file_path, file_key, file_size, content_type, ranges if range_bytes else None
+        )
+    except BaseException:
+        if lease is not None:
+            lease.release()
+        raise
+    if lease is not None:
+        lease.attach(body)
+
+    # 统计请求类型、字节数和当前打开的音频流
+    record_audio(kind, content_length)
+    track_stream(body)
+
+    if async_stream:
+        # ASGI 下使用异步迭代器，慢速客户端不会占住线程
+        # 客户端提前断开时异步迭代器不会执行到结尾，由响应关闭时调用 AsyncBody.close()
+        response = StreamingHttpResponse(AsyncBody(body), status=status, content_type=response_type)
+    elif isinstance(body, RangeFileWrapper):
+        # FileResponse 能更高效地流式传输（支持 wsgi.file_wrapper / sendfile）并正确关闭文件句柄
+        # 经过块缓存时 fileno() 不可用，服务器会退回按块迭代
+        response = FileResponse(body, status=status, content_type=response_type)
+        response.block_size = get_chunk_size()
+    else:
+        response = StreamingHttpResponse(body, status=status, content_type=response_type)
+
+    response['Content-Length'] = str(content_length)
+    if content_range:
+        response['Content-Range'] = content_range
+    response['Accept-Ranges'] = 'bytes'
+    response['Content-Disposition'] = f'inline; filename="{os.path.basename(file_path)}"'
+    return _set_validators(response, etag, last_modified)
+
+def _open_body(file_path, file_key, file_size, content_type, ranges):
+    """
+    打开响应体，ranges 为 None 时返回完整文件
+    返回 (响应体, 状态码, Content-Type, Content-Length, Content-Range, 请求类型)
+    """
+    content_range = None
+    if ranges and len(ranges) == 1:
+        range_start, range_end = ranges[0]
         length = range_end - range_start + 1
 
-        # 打开文件并跳转到指定位置
-        with open(file_path, 'rb') as fh:
-            fh.seek(range_start)
-            chunk = fh.read(length)
+        # 只包装区间内的字节，按块流式读取，避免整段读入内存
+        body = RangeFileWrapper(file_path, range_start, length, file_key=file_key)
+        status, response_type, content_length = 206, content_type, length
+        content_range = f'bytes {range_start}-{range_end}/{file_size}'
+        kind = 'range'
+    elif ranges:
+        # 多段范围：multipart/byteranges 响应，每段按块流式输出
+        boundary = uuid.uuid4().hex
+        body, content_length = multipart_byteranges(
+            file_path, ranges, file_size, content_type, boundary, file_key
+        )
+        status, response_type = 206, f'multipart/byteranges; boundary={boundary}'
+        kind = 'multipart'
+    else:
+        # 完整文件响应
+        body = RangeFileWrapper(file_path, 0, file_size, file_key=file_key)
+        status, response_type, content_length = 200, content_type, file_size
+        kind = 'full'
+    return body, status, response_type, content_length, content_range, kind
+
+def _set_validators(response, etag, last_modified):
+    """给响应加上 ETag 和 Last-Modified，浏览器再次请求时可以走 304"""
+    response['ETag'] = etag
+    response['Last-Modified'] = http_date(last_modified)
+    return response
+
+def music_catalog(request):
+    """
+    曲库 JSON 接口（播放器按需分段加载整个曲库）
+    - cursor：上一段返回的 next；after：从某首歌之后开始（按列表顺序）
+    - limit：每段条数（默认 200，最多 1000）
+    - fields：逗号分隔的字段，可选 id,name,singer,album,src,created_at,size,available,duration,bitrate,codec
+    返回 {"fields": [...], "items": [[...], ...], "next": 游标或 null, "count": 总数}
+    ETag 由曲库版本号和参数生成，命中 If-None-Match 时不查询数据库直接返回 304
+    """
+    fields = parse_fields(request.GET.get('fields'))
+    limit = parse_limit(request.GET.get('limit'))
+    cursor_token = request.GET.get('cursor', '')
+    after = request.GET.get('after', '')
+    cursor = decode_cursor(cursor_token) if cursor_token else None
+    if cursor is None:
+        cursor_token = f'after:{after}' if after.isdigit() else ''
 
-        # 创建部分响应
-        response = HttpResponse(
-            chunk,
-            status=206,
-            content_type=content_type
+    etag = catalog_etag(get_catalog_version(), fields, limit, cursor_token)
+    response = get_conditional_response(request, etag=etag)
+    if response is None:
+        if cursor is None and after.isdigit():
+            cursor = Music.objects.filter(id=int(after)).values_list('created_at', 'id').first()
+        items, next_cursor = catalog_page(Music.objects.all(), fields, limit, cursor)
+        response = JsonResponse(
+            {'fields': fields, 'items': items, 'next': next_cursor, 'count': get_music_count()},
+            json_dumps_params={'ensure_ascii': False, 'separators': (',', ':')},
         )
-        response['Content-Length'] = str(length)
-        response['Content-Range'] = f'bytes {range_start}-{range_end}/{file_size}'
-        response['Accept-Ranges'] = 'bytes'
-        response['Content-Disposition'] = f'inline; filename="{os.path.basename(file_path)}"'
+    response['ETag'] = etag
+    # 允许浏览器缓存，但每次使用前都要用 ETag 重新校验
+    response['Cache-Control'] = 'no-cache'
+    return response
+
+def music_search(request):
+    """
+    搜索接口：q 在歌曲名、歌手、专辑中查找（中文按二元组索引，最后一个单词按前缀匹配）
+    - limit：返回条数（默认 20，最多 100）
+    - fields：同曲库接口
+    返回 {"query": q, "fields": [...], "items": [[...], ...]}
+    """
+    query = request.GET.get('q', '').strip()
+    fields = parse_fields(request.GET.get('fields'))
+    try:
+        limit = min(max(int(request.GET.get('limit', DEFAULT_SEARCH_LIMIT)), 1), MAX_SEARCH_LIMIT)
+    except ValueError:
+        limit = DEFAULT_SEARCH_LIMIT
+
+    items = search_music(query, fields, limit) if query else []
+    return JsonResponse(
+        {'query': query, 'fields': fields, 'items': items},
+        json_dumps_params={'ensure_ascii': False, 'separators': (',', ':')},
+    )
+
+def seek_index(request, music_id):
+    """
+    MP3 跳转表接口：返回 {"id", "duration", "interval", "frames", "size", "offsets": [...]}
+    offsets[i] 是 i * interval 秒所在帧的起始字节，播放器据此发出一次精确的 Range 请求；
+    带 ?t=秒数 时额外返回 {"seek": {"time", "offset"}}
+    还没有生成或文件已变化时当场扫描这一首（通常只要几十毫秒）并保存；批量生成见 build_seek_index 命令
+    """
+    music = get_object_or_404(Music.objects.only('id', 'file_path', 'resolved_path', *Music.FILE_FACT_FIELDS), id=music_id)
+    file_path = get_music_file_path(music)
+    if not file_path:
+        return JsonResponse({'error': '文件不存在'}, status=404)
+    if os.path.splitext(file_path)[1].lower() not in SEEKABLE_FORMATS:
+        return JsonResponse({'error': '只支持 MP3 文件'}, status=404)
+    try:
+        stat = os.stat(file_path)
+    except OSError:
+        return JsonResponse({'error': '文件不存在'}, status=404)
+    interval = float(getattr(settings, 'MUSIC_SEEK_INTERVAL', 1.0))
+
+    etag = f'"seek-{music_id}-{stat.st_size}-{stat.st_mtime_ns}-{interval}"'
+    response = get_conditional_response(request, etag=etag)
+    if response is None:
+        index = SeekIndex.objects.filter(music_id=music_id).first()
+        if index is None or not index.matches(stat.st_size, stat.st_mtime, interval):
+            _, table, size, mtime = build_seek_table(file_path, interval)
+            if table is None:
+                return JsonResponse({'error': '没有找到 MP3 音频帧'}, status=404)
+            index = SeekIndex.from_table(music_id, table, size, mtime)
+            # 先删除旧表再插入：MySQL 不支持带 unique_fields 的 bulk_create(update_conflicts=True)
+            try:
+                with transaction.atomic():
+                    SeekIndex.objects.filter(music_id=music_id).delete()
+                    SeekIndex.objects.bulk_create([index])
+            except IntegrityError:
+                # 并发的请求刚刚保存了同一首的跳转表
+                pass
+        offsets = unpack_offsets(bytes(index.offsets))
+        data = {
+            'id': music_id,
+            'duration': index.duration,
+            'interval': index.interval,
+            'frames': index.frames,
+            'size': index.file_size,
+            'offsets': offsets,
+        }
+        try:
+            seconds = float(request.GET['t'])
+        except (KeyError, ValueError):
+            seconds = None
+        # nan / inf 能被 float() 解析，但算不出位置，和格式错误的 t 一样忽略
+        if seconds is not None and math.isfinite(seconds):
+            offset, point = offset_for_time(offsets, index.interval, seconds)
+            data['seek'] = {'time': point, 'offset': offset}
+        response = JsonResponse(data, json_dumps_params={'separators': (',', ':')})
+    response['ETag'] = etag
+    response['Cache-Control'] = 'no-cache'
+    return response
+
+def music_cover(request, music_id):
+    """
+    歌曲封面：第一次请求时从音频文件提取并写入磁盘缓存，之后直接返回缓存文件
+    ETag 是封面内容的哈希（强校验），命中 If-None-Match 时不访问磁盘；没有内嵌封面时返回 404
+    同一地址的内容会变（重新提取、文件替换），所以默认要求浏览器每次校验；
+    地址带 ?v=<封面哈希>（曲库接口的 cover 字段）且与当前封面一致时才允许长期缓存
+    """
+    music = get_object_or_404(Music.objects.only('id', 'file_path', 'resolved_path', 'cover', *Music.FILE_FACT_FIELDS), id=music_id)
+    if music.cover == '':
+        raise Http404('没有封面')
+    if music.cover:
+        response = get_conditional_response(request, etag=_cover_etag(music.cover))
+        if response is not None:
+            return _cover_headers(request, response, music.cover)
+    path = cover_cache.get(music.cover) if music.cover else None
+    if path is None:
+        # 还没有提取过，或者已经被淘汰
+        path = _store_cover(music)
+
+    response = offload_response(path, mimetypes.guess_type(path)[0] or 'application/octet-stream')
+    if response is None:
+        try:
+            fh = open(path, 'rb')
+        except OSError:
+            # get() 之后缓存文件被其它进程淘汰了，重新提取一次
+            path = _store_cover(music)
+            try:
+                fh = open(path, 'rb')
+            except OSError:
+                raise Http404('无法读取封面')
+        response = FileResponse(fh, content_type=mimetypes.guess_type(path)[0] or 'application/octet-stream')
+    return _cover_headers(request, response, music.cover)
+
+def _store_cover(music):
+    """从音频文件提取封面写入缓存并记录到 music.cover，返回缓存文件路径；没有封面或无法读取时抛出 Http404"""
+    file_path = get_music_file_path(music)
+    if not file_path:
+        raise Http404('文件不存在')
+    try:
+        name = cover_cache.store_from(file_path)
+    except Exception:
+        raise Http404('无法读取封面')
+    if name != music.cover:
+        Music.objects.filter(pk=music.pk).update(cover=name)
+    if not name:
+        raise Http404('没有封面')
+    music.cover = name
+    return cover_cache.path(name)
+
+def _cover_etag(name):
+    return f'"{cover_version(name)}"'
+
+def _cover_headers(request, response, name):
+    response['ETag'] = _cover_etag(name)
+    if request.GET.get('v') == cover_version(name):
+        # 地址中带着内容哈希，封面变了地址也会变
+        response['Cache-Control'] = f"public, max-age={getattr(settings, 'MUSIC_COVER_MAX_AGE', 30 * 24 * 3600)}, immutable"
     else:
-        # 完整文件响应：使用 FileResponse 能更高效地流式传输并正确关闭文件句柄
-        file = open(file_path, 'rb')
-        response = FileResponse(file, content_type=content_type)
-        response['Content-Length'] = str(file_size)
-        response['Accept-Ranges'] = 'bytes'
-        response['Content-Disposition'] = f'inline; filename="{os.path.basename(file_path)}"'
-    
+        response['Cache-Control'] = 'no-cache'
     return response
 
+def metrics(request):
+    """Prometheus 文本格式的指标（进程内统计）"""
+    return HttpResponse(render_metrics(), content_type='text/plain; version=0.0.4; charset=utf-8')
+
 def check_file_exists(request, music_id):
     """检查文件是否存在（AJAX调用）"""
     try:
         music = Music.objects.get(id=music_id)
         file_path = get_music_file_path(music)
-        exists = bool(file_path and os.path.exists(file_path))
+        exists = bool(file_path)
         return JsonResponse({'exists': exists, 'path': file_path or ''})
     except Music.DoesNotExist:
         return JsonResponse({'exists': False}, status=404)
 
+# 批量检查一次最多接受的 id 数量
+MAX_CHECK_FILES = 1000
+
+def _parse_ids(request):
+    """解析查询参数或 POST 表单中逗号分隔的 ids（去重并保持顺序），格式错误时返回 None"""
+    raw = request.POST.get('ids') if request.method == 'POST' else request.GET.get('ids')
+    try:
+        return list(dict.fromkeys(int(i) for i in (raw or '').split(',') if i.strip()))
+    except ValueError:
+        return None
+
+def check_files_exist(request):
+    """
+    批量检查文件是否存在（播放队列校验）
+    ids 通过查询参数或 POST 表单传入，逗号分隔，例如 ?ids=1,2,3
+    一次 in_bulk 查询取出记录，缓存未命中的路径在线程池中并发解析
+    返回 {"files": {"1": true, "2": false}, "unknown": [3]}，unknown 为不存在的记录
+    """
+    ids = _parse_ids(request)
+    if ids is None:
+        return JsonResponse({'error': 'ids 格式错误'}, status=400)
+    if len(ids) > MAX_CHECK_FILES:
+        return JsonResponse({'error': f'一次最多检查 {MAX_CHECK_FILES} 首'}, status=400)
+
+    musics = Music.objects.only('id', 'file_path').in_bulk(ids)
+    resolved = get_music_file_infos(musics.values(), get_io_executor())
+    return JsonResponse({
+        'files': {str(pk): resolved[pk] is not None for pk in musics},
+        'unknown': [pk for pk in ids if pk not in musics],
+    })
+
+# 一次最多预告的歌曲数量
+MAX_READAHEAD_IDS = 5
+
+def readahead(request):
+    """
+    播放器预告接下来要播放的歌曲（?ids=12,13），后台线程提前读取文件开头
+    只把任务放进有界队列就返回，不等待磁盘；返回 {"scheduled": 加入队列的数量}
+    """
+    ids = _parse_ids(request)
+    if ids is None:
+        return JsonResponse({'error': 'ids 格式错误'}, status=400)
+    ids = ids[:MAX_READAHEAD_IDS]
+
+    musics = Music.objects.only('id', 'file_path').in_bulk(ids)
+    scheduled = readahead_scheduler.schedule(musics[pk] for pk in ids if pk in musics)
+    return JsonResponse({'scheduled': scheduled}, status=202)
+
 def import_music(request):
-    """批量导入本地音乐文件"""
+    """
+    批量导入本地音乐文件
+    POST 只创建后台导入任务并立即返回：表单提交跳转到带 ?job= 的导入页查看进度，
+    Accept: application/json 的请求返回 202 和任务状态
+    """
     if request.method == 'POST':
         music_folder = request.POST.get('music_folder', '')
         
-        if not os.path.exists(music_folder):
+        if not os.path.isdir(music_folder):
+            if _wants_json(request):
+                return JsonResponse({'error': '文件夹路径不存在'}, status=400)
             messages.error(request, '文件夹路径不存在！')
             return HttpResponseRedirect(reverse('import_music'))
         
-        imported_count = 0
-        skipped_count = 0
-        
-        for filename in os.listdir(music_folder):
-            file_path = os.path.join(music_folder, filename)
-            
-            if os.path.isdir(file_path):
-                continue
-            
-            # 获取文件扩展名
-            ext = os.path.splitext(filename)[1].lower()
-            if ext not in ['.mp3', '.wav', '.flac', '.ogg', '.m4a', '.aac', '.wma']:
-                skipped_count += 1
-                continue
-            
-            # 解析文件名
-            name_without_ext = os.path.splitext(filename)[0]
-            name_parts = name_without_ext.split('-', 1)
-            
-            if len(name_parts) == 2:
-                singer = name_parts[0].strip()
-                name = name_parts[1].strip()
-            else:
-                singer = '未知歌手'
-                name = name_without_ext.strip()
-            
-            # 检查是否已存在
-            if Music.objects.filter(singer=singer, name=name).exists():
-                skipped_count += 1
-                continue
-            
-            try:
-                # 直接存储绝对路径
-                music = Music(
-                    name=name,
-                    singer=singer,
-                    album='未知专辑',
-                    file_path=file_path  # 存储绝对路径
-                )
-                music.save()
-                
-                imported_count += 1
-                
-            except Exception as e:
-                print(f"导入文件 {filename} 时出错: {e}")
-                skipped_count += 1
-                continue
-        
-        messages.success(request, f'导入成功！新增 {imported_count} 首，跳过 {skipped_count} 首')
-        return HttpResponseRedirect(reverse('music_list'))
+        # 增量导入：对照扫描清单，只处理新增或变化的文件（按“歌手-歌曲名”解析文件名）
+        job = start_import_job(
+            music_folder,
+            workers=1,
+            incremental=True,
+            extract=extract_track_from_filename,
+            formats=['.' + ext for ext in SUPPORTED_FORMATS],
+            recursive=False,
+        )
+        if _wants_json(request):
+            data = job_status(job)
+            data['status_url'] = reverse('import_job_status', args=[job.pk])
+            return JsonResponse(data, status=202)
+        return HttpResponseRedirect(f"{reverse('import_music')}?job={job.pk}")
     
-    return render(request, 'music/import_music.html')
\ No newline at end of file
+    job = None
+    job_id = request.GET.get('job', '')
+    if job_id.isdigit():
+        job = ImportJob.objects.filter(pk=job_id).first()
+    return render(request, 'music/import_music.html', {
+        'job': job,
+        'recent_jobs': ImportJob.objects.all()[:5],
+    })
+
+def _wants_json(request):
+    return request.headers.get('Accept', '').startswith('application/json')
+
+def import_job_status(request, job_id):
+    """导入任务进度（JSON），导入页每秒轮询一次"""
+    job = get_object_or_404(ImportJob, pk=job_id)
+    return JsonResponse(job_status(job))
\ No newline at end of file
@@ -0,0 +1,171 @@
+# music/watcher.py
+"""
+监视媒体目录的变化，供 sync_music_library 命令使用
+- Linux 上用 inotify（通过 ctypes 调用 libc，不需要额外依赖），空闲时不占 CPU
+- 其它平台或 inotify 不可用时，定期扫描目录并和上一次的快照比较
+
+read(timeout) 返回一批事件 [(kind, path), ...]：
+- FILE：这个文件可能新增、修改或删除了
+- DIR：这个目录下的内容整体可能变化了（目录被创建、移入、移出、删除，或事件溢出）
+"""
+import ctypes
+import ctypes.util
+import errno
+import os
+import select
+import struct
+import time
+from .importer import ImportStats, SUPPORTED_FORMATS, scan_audio_files
+
+FILE = 'file'
+DIR = 'dir'
+
+# inotify 事件掩码（见 <sys/inotify.h>）
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_FROM = 0x00000040
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_DELETE = 0x00000200
+IN_DELETE_SELF = 0x00000400
+IN_MOVE_SELF = 0x00000800
+IN_Q_OVERFLOW = 0x00004000
+IN_IGNORED = 0x00008000
+IN_ONLYDIR = 0x01000000
+IN_ISDIR = 0x40000000
+
+WATCH_MASK = (
+    IN_CLOSE_WRITE | IN_MOVED_FROM | IN_MOVED_TO | IN_CREATE | IN_DELETE
+    | IN_DELETE_SELF | IN_MOVE_SELF | IN_ONLYDIR
+)
+_EVENT = struct.Struct('iIII')
+
+
+class InotifyWatcher:
+    """基于 inotify 的目录监视，每个子目录一个 watch"""
+
+    def __init__(self, roots):
+        libc_name = ctypes.util.find_library('c')
+        self._libc = ctypes.CDLL(libc_name, use_errno=True)
+        if not hasattr(self._libc, 'inotify_init1'):
+            raise OSError('inotify is not available')
+        self.roots = [os.path.abspath(root) for root in roots]
+        self._fd = self._libc.inotify_init1(os.O_NONBLOCK | os.O_CLOEXEC)
+        if self._fd < 0:
+            raise OSError(ctypes.get_errno(), 'inotify_init1 failed')
+        self._paths = {}
+        try:
+            for root in self.roots:
+                self._watch_tree(root)
+        except OSError:
+            self.close()
+            raise
+
+    def _watch_tree(self, top):
+        """给目录及其所有子目录加 watch；已经加过的 inode 会返回同一个 wd，顺便更新路径"""
+        stack = [top]
+        while stack:
+            path = stack.pop()
+            wd = self._libc.inotify_add_watch(self._fd, os.fsencode(path), WATCH_MASK)
+            if wd < 0:
+                if ctypes.get_errno() == errno.ENOSPC:
+                    # 超过 fs.inotify.max_user_watches
+                    raise OSError(errno.ENOSPC, 'inotify watch limit reached (raise fs.inotify.max_user_watches)')
+                continue
+            self._paths[wd] = path
+            try:
+                with os.scandir(path) as it:
+                    stack.extend(entry.path for entry in it if entry.is_dir(follow_symlinks=False))
+            except OSError:
+                continue
+
+    def read(self, timeout=None):
+        readable, _, _ = select.select([self._fd], [], [], timeout)
+        if not readable:
+            return []
+        try:
+            data = os.read(self._fd, 64 * 1024)
+        except BlockingIOError:
+            return []
+
+        events = []
+        offset = 0
+        while offset + _EVENT.size <= len(data):
+            wd, mask, _cookie, length = _EVENT.unpack_from(data, offset)
+            offset += _EVENT.size
+            name = os.fsdecode(data[offset:offset + length].rstrip(b'\0'))
+            offset += length
+
+            if mask & IN_Q_OVERFLOW:
+                # 事件丢失，只能整体重新对比
+                events.extend((DIR, root) for root in self.roots)
+                continue
+            if mask & IN_IGNORED:
+                self._paths.pop(wd, None)
+                continue
+            parent = self._paths.get(wd)
+            if parent is None:
+                continue
+            if mask & (IN_DELETE_SELF | IN_MOVE_SELF):
+                if parent in self.roots:
+                    events.append((DIR, parent))
+                continue
+            path = os.path.join(parent, name)
+            if mask & IN_ISDIR:
+                if mask & (IN_CREATE | IN_MOVED_TO):
+                    self._watch_tree(path)
+                events.append((DIR, path))
+            elif not mask & IN_CREATE:
+                # 文件在 IN_CLOSE_WRITE（写完）或移入时才处理，复制到一半的文件不解析
+                events.append((FILE, path))
+        return events
+
+    def close(self):
+        os.close(self._fd)
+
+
+class PollingWatcher:
+    """定期扫描目录，和上一次的 (大小, 修改时间) 快照比较"""
+
+    def __init__(self, roots, interval=10.0, formats=SUPPORTED_FORMATS):
+        self.roots = [os.path.abspath(root) for root in roots]
+        self.interval = interval
+        self.formats = formats
+        self._snapshot = self._scan()
+        self._next_scan = time.monotonic() + interval
+
+    def _scan(self):
+        stats = ImportStats()
+        snapshot = {}
+        for root in self.roots:
+            for path, size, mtime in scan_audio_files(root, stats, self.formats):
+                snapshot[path] = (size, mtime)
+        return snapshot
+
+    def read(self, timeout=None):
+        wait = max(self._next_scan - time.monotonic(), 0)
+        if timeout is not None and timeout < wait:
+            time.sleep(timeout)
+            return []
+        time.sleep(wait)
+        self._next_scan = time.monotonic() + self.interval
+
+        snapshot = self._scan()
+        old = self._snapshot
+        self._snapshot = snapshot
+        changed = [path for path, facts in snapshot.items() if old.get(path) != facts]
+        removed = [path for path in old if path not in snapshot]
+        return [(FILE, path) for path in changed + removed]
+
+    def close(self):
+        pass
+
+
+def make_watcher(roots, polling=False, interval=10.0):
+    """优先使用 inotify，不可用时退回定期扫描"""
+    if not polling:
+        try:
+            return InotifyWatcher(roots)
+        except (OSError, AttributeError, TypeError):
+            # 非 Linux 平台找不到 libc 或其中没有 inotify
+            pass
+    return PollingWatcher(roots, interval)
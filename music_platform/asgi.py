@@ -9,8 +9,13 @@ https://docs.djangoproject.com/en/6.0/howto/deployment/asgi/
 
 import os
 
-from django.core.asgi import get_asgi_application
+import django
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'music_platform.settings')
 
-application = get_asgi_application()
+django.setup(set_prefix=False)
+
+# 与 get_asgi_application() 相同，只是音频流请求不再每个连接占一个同步线程
+from music.streaming import StreamingASGIHandler  # noqa: E402
+
+application = StreamingASGIHandler()
@@ -42,6 +42,8 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    # 请求耗时、数据库查询次数等指标，放在最前面以便计入其它中间件的耗时（见 /metrics）
+    'music.metrics.MetricsMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -129,4 +131,96 @@ STATICFILES_DIRS = [os.path.join(BASE_DIR, 'static')]  # 根目录下共用的
 
 
 MEDIA_ROOT = os.path.join('D:\\', 'music') # 媒体文件路径
-MEDIA_URL = '/media/' # 媒体文件访问的路径
\ No newline at end of file
+MEDIA_URL = '/media/' # 媒体文件访问的路径
+
+# 音频流式传输时每次读取的块大小（字节），单个连接的内存占用与文件大小无关
+MUSIC_STREAM_CHUNK_SIZE = 64 * 1024
+
+# 音频交付方式：
+#   'django'           由 Django 进程内流式传输（默认）
+#   'x-accel-redirect' 交给 nginx，需要配置 internal location
+#   'x-sendfile'       交给 Apache mod_xsendfile / lighttpd
+MUSIC_DELIVERY_MODE = 'django'
+# 媒体库根目录 -> 前端服务器内部地址的映射，不在这些目录下的文件仍由 Django 传输
+# nginx 示例：location /protected-music/ { internal; alias D:/music/; }
+MUSIC_OFFLOAD_ROOTS = {
+    MEDIA_ROOT: '/protected-music/',
+}
+
+# 使用 ASGI（uvicorn / daphne）部署时开启，播放地址改用异步流式视图
+MUSIC_ASYNC_STREAMING = False
+# 异步流式传输时读取文件的线程池大小
+MUSIC_ASYNC_IO_WORKERS = 16
+
+# get_music_file_path 的进程内缓存：最多缓存条数、命中结果有效期（秒）、找不到文件的负缓存有效期（秒）
+MUSIC_PATH_CACHE_SIZE = 10000
+MUSIC_PATH_CACHE_TTL = 300
+MUSIC_PATH_CACHE_NEGATIVE_TTL = 30
+
+# 音频数据块缓存（进程内，所有连接共享）：总大小上限（字节，0 关闭）、块大小、
+# 每个文件开头多少字节第一次读取就缓存（其余块要被读取两次才缓存）
+# 开启后音频不再走 sendfile，热门曲目和曲目开头直接从内存发送
+MUSIC_BLOCK_CACHE_SIZE = 64 * 1024 * 1024
+MUSIC_BLOCK_CACHE_BLOCK_SIZE = 256 * 1024
+MUSIC_BLOCK_CACHE_HEAD_BYTES = 1024 * 1024
+
+# MP3 跳转表（build_seek_index 命令 / 跳转表接口）相邻两点的时间间隔（秒）
+MUSIC_SEEK_INTERVAL = 1.0
+
+# 封面缓存：从音频文件提取的内嵌封面按内容哈希保存在这个目录（可以配置到 MUSIC_OFFLOAD_ROOTS 中交给 nginx）
+# 缓存大小上限（字节，按最近访问淘汰，0 不限）、缩略图最大边长（像素，需要 Pillow，0 保存原图）、
+# 浏览器缓存时间（秒，只用于带 ?v=<封面哈希> 的地址，见曲库接口的 cover 字段；不带版本的地址每次都要校验）
+MUSIC_COVER_CACHE_DIR = os.path.join(BASE_DIR, 'cache', 'covers')
+MUSIC_COVER_CACHE_SIZE = 256 * 1024 * 1024
+MUSIC_COVER_SIZE = 300
+MUSIC_COVER_MAX_AGE = 30 * 24 * 3600
+
+# 音频传输限流（进程内，只作用于 Django 自己传输的音频；交给 nginx 时请用 limit_rate / limit_conn）
+# 每个客户端的速率（字节/秒）和突发容量（字节），超出后新请求返回 429；0 表示不限
+MUSIC_THROTTLE_CLIENT_RATE = 0
+MUSIC_THROTTLE_CLIENT_BURST = 0
+# 每个客户端 / 整个进程同时传输的音频流数量，超出时返回 429 / 503；0 表示不限
+MUSIC_THROTTLE_CLIENT_STREAMS = 0
+MUSIC_THROTTLE_MAX_STREAMS = 0
+# 因流数量被拒绝时的 Retry-After（秒）
+MUSIC_THROTTLE_RETRY_AFTER = 5
+# 这些地址转发的请求按 X-Forwarded-For 区分客户端（ngrok 等内网穿透工具在本机运行）
+MUSIC_THROTTLE_TRUSTED_PROXIES = ['127.0.0.1', '::1']
+
+# 网页导入在后台线程池中执行，同时运行的导入任务数（0 表示在请求中直接执行，仅用于调试）
+MUSIC_IMPORT_JOB_WORKERS = 1
+
+# 下一首预读：播放器预告接下来的歌曲后，后台线程提前读取文件开头
+# 线程数（0 关闭）、最多排队的歌曲数、每首预读的字节数
+MUSIC_READAHEAD_WORKERS = 2
+MUSIC_READAHEAD_QUEUE_SIZE = 32
+MUSIC_READAHEAD_BYTES = 2 * 1024 * 1024
+
+# 曲库版本号保存在数据库中，网页进程读取后在进程内保留的秒数（0 表示每次请求都查询）
+# 命令行导入、同步等其它进程的修改最多延迟这么久反映到 ETag 和列表页缓存
+MUSIC_CATALOG_VERSION_TTL = 1.0
+
+# 列表页分页方式：'cursor' 游标分页（翻页代价固定，默认）；'page' 页码分页
+# 带 ?page= 参数的旧链接始终按页码分页
+MUSIC_LIST_PAGINATION = 'cursor'
+
+# 缓存：default 保存音乐总数等小数据；music_pages 保存渲染好的列表页和行片段
+# 两者都按 MAX_ENTRIES 限制条数，超出后淘汰。缓存 key 都包含曲库版本号（保存在数据库中，见 MUSIC_CATALOG_VERSION_TTL），
+# 进程内缓存也能感知其它进程的修改；多进程部署时可以改用文件缓存共享以提高命中率，例如：
+#   'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache', 'LOCATION': os.path.join(BASE_DIR, 'cache', 'pages'),
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'music-default',
+    },
+    'music_pages': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'music-pages',
+        'OPTIONS': {'MAX_ENTRIES': 2000},
+    },
+}
+
+# 列表页整页缓存和行片段缓存使用的缓存别名和有效期（秒），有效期为 0 时关闭
+# 缓存 key 中包含曲库版本号，导入或增删改记录后自动失效
+MUSIC_PAGE_CACHE = 'music_pages'
+MUSIC_PAGE_CACHE_TIMEOUT = 300
@@ -0,0 +1,17 @@
+# 性能基准测试使用的配置：python manage.py run_benchmarks --settings=music_platform.settings_benchmark
+# 使用 SQLite，基准测试本身在独立的测试数据库中运行
+import tempfile
+from .settings import *  # noqa: F401,F403
+
+DEBUG = False
+
+DATABASES = {
+    'default': {
+        'ENGINE': 'django.db.backends.sqlite3',
+        'NAME': os.path.join(tempfile.gettempdir(), 'music_platform_benchmark.sqlite3'),
+        'TEST': {
+            # 使用磁盘上的数据库文件，结果更接近实际部署
+            'NAME': os.path.join(tempfile.gettempdir(), 'music_platform_benchmark_test.sqlite3'),
+        },
+    }
+}
@@ -16,6 +16,17 @@ class MusicPlayer {
         this.isSeeking = false;
         this.autoHideTimer = null;
 
+        // 曲库 JSON 接口：播放到当前页末尾时继续分段加载后面的歌曲
+        this.catalogUrl = '/api/music/';
+        this.catalogLimit = 200;
+        this.catalogNext = null;
+        this.catalogDone = false;
+        this.catalogLoading = null;
+
+        // 下一首预读：开始播放后告诉服务器接下来要播放的歌曲
+        this.readaheadUrl = '/readahead/';
+        this.readaheadCount = 2;
+
         // 确保只有一个播放器实例
         if (window.musicPlayerInstance) {
             console.warn('音乐播放器已存在，返回现有实例');
@@ -61,6 +72,60 @@ class MusicPlayer {
         console.log(`加载了 ${this.playlist.length} 首歌曲到播放列表`);
     }
 
+    // 从曲库接口加载下一段歌曲并追加到播放列表，返回新增的条数
+    loadMoreFromCatalog() {
+        if (this.catalogDone) {
+            return Promise.resolve(0);
+        }
+        if (this.catalogLoading) {
+            return this.catalogLoading;
+        }
+
+        const params = new URLSearchParams({
+            limit: this.catalogLimit,
+            fields: 'id,name,singer,album,src,available'
+        });
+        if (this.catalogNext) {
+            params.set('cursor', this.catalogNext);
+        } else if (this.playlist.length > 0) {
+            // 第一次加载：从当前页最后一首之后开始
+            params.set('after', this.playlist[this.playlist.length - 1].id);
+        }
+
+        this.catalogLoading = fetch(`${this.catalogUrl}?${params}`, {
+            headers: { 'Accept': 'application/json' }
+        }).then(response => {
+            if (!response.ok) {
+                throw new Error(`HTTP ${response.status}`);
+            }
+            return response.json();
+        }).then(data => {
+            const known = new Set(this.playlist.map(item => item.id));
+            let added = 0;
+            data.items.forEach(values => {
+                const music = {};
+                data.fields.forEach((field, i) => music[field] = values[i]);
+                music.id = String(music.id);
+                if (known.has(music.id)) return;
+                music.album = music.album || '未知专辑';
+                music.element = null;
+                music.index = this.playlist.length;
+                this.playlist.push(music);
+                added++;
+            });
+            this.catalogNext = data.next;
+            this.catalogDone = !data.next;
+            console.log(`从曲库接口追加了 ${added} 首歌曲`);
+            return added;
+        }).catch(error => {
+            console.error('加载曲库失败:', error);
+            return 0;
+        }).finally(() => {
+            this.catalogLoading = null;
+        });
+        return this.catalogLoading;
+    }
+
     bindEvents() {
         console.log('绑定事件监听器');
 
@@ -156,7 +221,7 @@ class MusicPlayer {
 
         // 检查文件是否存在标记
         const row = document.querySelector(`[data-music-id="${musicId}"]`);
-        if (row && row.dataset.fileExists === 'false') {
+        if ((row && row.dataset.fileExists === 'false') || musicData.available === false) {
             this.showError('文件不存在，无法播放');
             return false;
         }
@@ -222,6 +287,7 @@ class MusicPlayer {
                 this.isPlaying = true;
                 this.updatePlayButton();
                 console.log('播放成功');
+                this.announceUpcoming();
                 return true;
             }).catch(error => {
                 console.error('播放失败:', error);
@@ -252,6 +318,26 @@ class MusicPlayer {
         }
     }
 
+    // 预告接下来要播放的几首（与 playNext 顺序一致），失败不影响播放
+    announceUpcoming() {
+        if (this.playlist.length < 2 || this.currentIndex === -1) {
+            return;
+        }
+        const ids = [];
+        for (let i = 1; i <= this.readaheadCount && i < this.playlist.length; i++) {
+            const music = this.playlist[(this.currentIndex + i) % this.playlist.length];
+            if (music.available !== false) {
+                ids.push(music.id);
+            }
+        }
+        if (ids.length === 0) {
+            return;
+        }
+        fetch(`${this.readaheadUrl}?ids=${ids.join(',')}`).catch(error => {
+            console.warn('预读请求失败:', error);
+        });
+    }
+
     // 通过ID查找索引
     findIndexById(musicId) {
         return this.playlist.findIndex(item => item.id === musicId);
@@ -342,13 +428,18 @@ class MusicPlayer {
             return;
         }
 
-        let nextIndex;
-        if (this.currentIndex === -1 || this.currentIndex === this.playlist.length - 1) {
-            nextIndex = 0; // 循环到第一首
-        } else {
-            nextIndex = this.currentIndex + 1;
+        if (this.currentIndex !== -1 && this.currentIndex === this.playlist.length - 1) {
+            // 已到播放列表末尾：先从曲库接口加载后面的歌曲，全部播完才循环到第一首
+            const lastIndex = this.currentIndex;
+            this.loadMoreFromCatalog().then(added => {
+                const nextIndex = added > 0 ? lastIndex + 1 : 0;
+                console.log(`播放下一首，从索引 ${lastIndex} 到 ${nextIndex}`);
+                this.playMusic(this.playlist[nextIndex], nextIndex);
+            });
+            return;
         }
 
+        const nextIndex = this.currentIndex === -1 ? 0 : this.currentIndex + 1;
         console.log(`播放下一首，从索引 ${this.currentIndex} 到 ${nextIndex}`);
         this.playMusic(this.playlist[nextIndex], nextIndex);
     }